@@ -0,0 +1,184 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+Databases created by the old ``Base.metadata.create_all`` call already have
+these tables; mark them as migrated with ``alembic stamp 0001``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String()),
+        sa.Column("phone", sa.String()),
+        sa.Column("role", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "user_profiles",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), unique=True),
+        sa.Column("age", sa.Integer()),
+        sa.Column("gender", sa.String()),
+        sa.Column("height", sa.Float()),
+        sa.Column("weight", sa.Float()),
+        sa.Column("activity_level", sa.String()),
+        sa.Column("medical_conditions", sa.JSON()),
+        sa.Column("allergies", sa.JSON()),
+        sa.Column("medications", sa.JSON()),
+        sa.Column("fitness_level", sa.String()),
+        sa.Column("mobility_issues", sa.JSON()),
+        sa.Column("primary_goal", sa.String()),
+        sa.Column("target_weight", sa.Float()),
+        sa.Column("target_date", sa.DateTime()),
+        sa.Column("dietary_preferences", sa.JSON()),
+        sa.Column("cultural_background", sa.String()),
+        sa.Column("cuisine_preferences", sa.JSON()),
+        sa.Column("equipment_access", sa.JSON()),
+        sa.Column("workout_time_preference", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_user_profiles_id", "user_profiles", ["id"])
+
+    op.create_table(
+        "nutrition_plans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("title", sa.String()),
+        sa.Column("description", sa.Text()),
+        sa.Column("plan_data", sa.JSON()),
+        sa.Column("nutritional_summary", sa.JSON()),
+        sa.Column("duration_days", sa.Integer()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_nutrition_plans_id", "nutrition_plans", ["id"])
+
+    op.create_table(
+        "fitness_plans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("title", sa.String()),
+        sa.Column("description", sa.Text()),
+        sa.Column("plan_data", sa.JSON()),
+        sa.Column("difficulty_level", sa.String()),
+        sa.Column("duration_weeks", sa.Integer()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_fitness_plans_id", "fitness_plans", ["id"])
+
+    op.create_table(
+        "progress_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("log_type", sa.String()),
+        sa.Column("metric_name", sa.String()),
+        sa.Column("metric_value", sa.Float()),
+        sa.Column("metric_unit", sa.String()),
+        sa.Column("additional_data", sa.JSON()),
+        sa.Column("notes", sa.Text()),
+        sa.Column("logged_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_progress_logs_id", "progress_logs", ["id"])
+
+    op.create_table(
+        "trainer_clients",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("trainer_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("assigned_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("notes", sa.Text()),
+    )
+    op.create_index("ix_trainer_clients_id", "trainer_clients", ["id"])
+
+    op.create_table(
+        "educational_content",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("content_type", sa.String()),
+        sa.Column("content", sa.Text()),
+        sa.Column("summary", sa.Text()),
+        sa.Column("tags", sa.JSON()),
+        sa.Column("source", sa.String()),
+        sa.Column("target_audience", sa.JSON()),
+        sa.Column("is_featured", sa.Boolean()),
+        sa.Column("view_count", sa.Integer()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_educational_content_id", "educational_content", ["id"])
+
+    op.create_table(
+        "food_database",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("food_name", sa.String(), nullable=False),
+        sa.Column("food_code", sa.String(), unique=True),
+        sa.Column("category", sa.String()),
+        sa.Column("nutritional_data", sa.JSON()),
+        sa.Column("cultural_tags", sa.JSON()),
+        sa.Column("allergen_info", sa.JSON()),
+        sa.Column("substitutes", sa.JSON()),
+        sa.Column("source", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_food_database_id", "food_database", ["id"])
+    op.create_index("ix_food_database_food_name", "food_database", ["food_name"])
+
+    op.create_table(
+        "exercise_database",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("exercise_name", sa.String(), nullable=False),
+        sa.Column("category", sa.String()),
+        sa.Column("muscle_groups", sa.JSON()),
+        sa.Column("equipment_needed", sa.JSON()),
+        sa.Column("difficulty_level", sa.String()),
+        sa.Column("instructions", sa.Text()),
+        sa.Column("safety_notes", sa.Text()),
+        sa.Column("modifications", sa.JSON()),
+        sa.Column("contraindications", sa.JSON()),
+        sa.Column("calories_per_minute", sa.Float()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_exercise_database_id", "exercise_database", ["id"])
+    op.create_index("ix_exercise_database_exercise_name", "exercise_database", ["exercise_name"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("exercise_database")
+    op.drop_table("food_database")
+    op.drop_table("educational_content")
+    op.drop_table("trainer_clients")
+    op.drop_table("progress_logs")
+    op.drop_table("fitness_plans")
+    op.drop_table("nutrition_plans")
+    op.drop_table("user_profiles")
+    op.drop_table("users")
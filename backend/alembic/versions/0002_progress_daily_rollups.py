@@ -0,0 +1,40 @@
+"""progress daily rollups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:05:00
+
+Populate existing history afterwards with ``python -m app.cli backfill-rollups``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "progress_daily_rollups",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("metric_name", sa.String(), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("value_sum", sa.Float(), nullable=False),
+        sa.Column("value_min", sa.Float()),
+        sa.Column("value_max", sa.Float()),
+        sa.Column("last_value", sa.Float()),
+        sa.Column("last_logged_at", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("progress_daily_rollups")
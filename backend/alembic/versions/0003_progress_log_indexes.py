@@ -0,0 +1,48 @@
+"""progress log access-pattern indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:10:00
+
+Verify the planner picks them up with ``python -m app.cli check-query-plans``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_progress_logs_user_metric_logged_at", "progress_logs",
+        ["user_id", "metric_name", sa.text("logged_at DESC")]
+    )
+    op.create_index(
+        "ix_progress_logs_user_type_logged_at", "progress_logs",
+        ["user_id", "log_type", sa.text("logged_at DESC")]
+    )
+    op.create_index(
+        "ix_progress_logs_user_logged_at", "progress_logs",
+        ["user_id", sa.text("logged_at DESC"), sa.text("id DESC")]
+    )
+    op.create_index(
+        "ix_progress_logs_workouts_user_logged_at", "progress_logs",
+        ["user_id", sa.text("logged_at DESC")],
+        postgresql_where=sa.text("log_type = 'workout'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_progress_logs_workouts_user_logged_at", table_name="progress_logs")
+    op.drop_index("ix_progress_logs_user_logged_at", table_name="progress_logs")
+    op.drop_index("ix_progress_logs_user_type_logged_at", table_name="progress_logs")
+    op.drop_index("ix_progress_logs_user_metric_logged_at", table_name="progress_logs")
@@ -0,0 +1,35 @@
+"""progress log client reference for idempotent bulk ingestion
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("progress_logs", sa.Column("client_ref", sa.String()))
+    op.create_index(
+        "uq_progress_logs_user_client_ref", "progress_logs",
+        ["user_id", "client_ref"],
+        unique=True,
+        postgresql_where=sa.text("client_ref IS NOT NULL")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_progress_logs_user_client_ref", table_name="progress_logs")
+    op.drop_column("progress_logs", "client_ref")
@@ -0,0 +1,48 @@
+"""plan generation job queue
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 10:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "plan_generation_jobs",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("plan_type", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("profile_data", sa.JSON()),
+        sa.Column("request_data", sa.JSON()),
+        sa.Column("use_cache", sa.Boolean()),
+        sa.Column("plan_id", sa.Integer()),
+        sa.Column("error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index(
+        "ix_plan_generation_jobs_user_type_status", "plan_generation_jobs",
+        ["user_id", "plan_type", "status"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_plan_generation_jobs_user_type_status", table_name="plan_generation_jobs")
+    op.drop_table("plan_generation_jobs")
@@ -0,0 +1,43 @@
+"""one active plan generation job per user and plan type
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 10:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep the newest active job per user/type before enforcing uniqueness
+    op.execute("""
+        UPDATE plan_generation_jobs SET status = 'failed', error = 'Superseded by a newer request'
+        WHERE status IN ('queued', 'running')
+        AND id NOT IN (
+            SELECT DISTINCT ON (user_id, plan_type) id FROM plan_generation_jobs
+            WHERE status IN ('queued', 'running')
+            ORDER BY user_id, plan_type, created_at DESC
+        )
+    """)
+    op.create_index(
+        "uq_plan_generation_jobs_user_type_active", "plan_generation_jobs",
+        ["user_id", "plan_type"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_plan_generation_jobs_user_type_active", table_name="plan_generation_jobs")
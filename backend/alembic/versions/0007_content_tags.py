@@ -0,0 +1,50 @@
+"""content tag catalog
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 14:20:00
+
+Populate counts for existing content afterwards with
+``python -m app.cli backfill-content-tags``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TAXONOMY = {
+    "nutrition": ["meal_planning", "macro_tracking", "cultural_nutrition", "special_diets"],
+    "fitness": ["strength_training", "cardio", "flexibility", "adaptive_exercise"],
+    "health": ["weight_management", "chronic_conditions", "mental_health", "sleep"],
+    "lifestyle": ["stress_management", "habit_formation", "motivation", "goal_setting"]
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    content_tags = op.create_table(
+        "content_tags",
+        sa.Column("tag", sa.String(), nullable=False),
+        sa.Column("category", sa.String(), nullable=True),
+        sa.Column("content_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("tag")
+    )
+    op.create_index(op.f("ix_content_tags_category"), "content_tags", ["category"], unique=False)
+    op.bulk_insert(content_tags, [
+        {"tag": tag, "category": category, "content_count": 0}
+        for category, tags in TAXONOMY.items()
+        for tag in tags
+    ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_content_tags_category"), table_name="content_tags")
+    op.drop_table("content_tags")
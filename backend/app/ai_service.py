@@ -2,287 +2,372 @@ import openai
 from langchain.llms import OpenAI
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import Chroma
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple, AsyncIterator
+import copy
+import hashlib
 import json
-from .config import OPENAI_API_KEY
+from .cache import LRUCache, RedisCache, DiskCache
+from .json_stream import JSONArrayItemExtractor
+from .prompts import prompt_registry, compact_json
+from .singleflight import SingleFlight
+from .food_catalog import food_catalog
+from .meal_optimizer import optimize_meal_plan
+from .config import (
+    OPENAI_API_KEY, AI_CACHE_ENABLED, AI_CACHE_TTL, AI_CACHE_MAX_SIZE,
+    AI_CACHE_SHARED_BACKEND, AI_CACHE_DIR, AI_CACHE_DISK_MAX_ENTRIES, NUTRITION_PLAN_ENGINE
+)
 
 openai.api_key = OPENAI_API_KEY
 
+def _normalize_cache_input(value: Any) -> Any:
+    """Canonical form of prompt inputs: trimmed lowercase strings, no empty values, sorted scalar lists"""
+    if isinstance(value, dict):
+        normalized = {key: _normalize_cache_input(item) for key, item in value.items()}
+        return {key: item for key, item in normalized.items() if item not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        items = [_normalize_cache_input(item) for item in value]
+        items = [item for item in items if item not in (None, "", [], {})]
+        if all(isinstance(item, (str, int, float, bool)) for item in items):
+            return sorted(set(items), key=lambda item: (type(item).__name__, item))
+        return items
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
 class AIService:
     def __init__(self):
         self.llm = OpenAI(temperature=0.7, openai_api_key=OPENAI_API_KEY)
-        self.embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
         
-    async def generate_nutrition_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> Dict[str, Any]:
+        # One chain per registered prompt, built once instead of on every call
+        self._chains = {spec.name: LLMChain(llm=self.llm, prompt=spec.prompt) for spec in prompt_registry}
+        
+        # Content-addressed response cache: in-process LRU in front of an optional shared tier
+        self.model_settings = {
+            "model": getattr(self.llm, "model_name", None),
+            "temperature": getattr(self.llm, "temperature", None),
+            # Bumping a prompt version retires responses generated from the old template
+            "prompts": {spec.name: spec.version for spec in prompt_registry}
+        }
+        self._response_cache = LRUCache(max_size=AI_CACHE_MAX_SIZE, ttl=AI_CACHE_TTL)
+        if AI_CACHE_SHARED_BACKEND == "redis":
+            self._shared_cache = RedisCache("ai_responses", ttl=AI_CACHE_TTL)
+        elif AI_CACHE_SHARED_BACKEND == "disk":
+            self._shared_cache = DiskCache("ai_responses", AI_CACHE_DIR, ttl=AI_CACHE_TTL, max_entries=AI_CACHE_DISK_MAX_ENTRIES)
+        else:
+            self._shared_cache = None
+        self._cache_metrics: Dict[str, Dict[str, int]] = {}
+        # Identical concurrent calls share one LLM request
+        self._inflight = SingleFlight()
+    
+    def cache_key(self, method: str, inputs: Dict[str, Any]) -> str:
+        """Hash of the normalized prompt inputs plus the model settings and prompt versions"""
+        canonical = json.dumps(
+            {"method": method, "inputs": _normalize_cache_input(inputs), "model": self.model_settings},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    
+    async def _cached(
+        self,
+        method: str,
+        inputs: Dict[str, Any],
+        generate: Callable[[], Awaitable[Tuple[Any, bool]]],
+        use_cache: bool = True
+    ) -> Any:
+        """Serve ``method`` from the response cache, calling ``generate`` on a miss.
+        
+        ``generate`` returns ``(result, cacheable)``; fallbacks produced when the
+        LLM output cannot be parsed are returned but never cached. Concurrent
+        misses for the same key wait on a single ``generate`` call.
+        """
+        metrics = self._cache_metrics.setdefault(method, {"hits": 0, "misses": 0, "bypassed": 0})
+        key = self.cache_key(method, inputs)
+        
+        if not (use_cache and AI_CACHE_ENABLED):
+            metrics["bypassed"] += 1
+            result, _ = await self._inflight.do(("bypass", key), generate)
+            return copy.deepcopy(result)
+        
+        cached = await self._cache_get(key)
+        if cached is not None:
+            metrics["hits"] += 1
+            return cached
+        
+        metrics["misses"] += 1
+        result = await self._inflight.do(key, lambda: self._generate_and_store(key, generate))
+        return copy.deepcopy(result)
+    
+    async def _generate_and_store(self, key: str, generate: Callable[[], Awaitable[Tuple[Any, bool]]]) -> Any:
+        result, cacheable = await generate()
+        if cacheable:
+            await self._cache_set(key, result)
+        return result
+    
+    async def _cache_get(self, key: str) -> Any:
+        cached = self._response_cache.get(key)
+        if cached is None and self._shared_cache is not None:
+            cached = await self._shared_cache.get(key)
+            if cached is not None:
+                self._response_cache.set(key, cached)
+        # Callers may post-process the result; never hand out the cached object itself
+        return copy.deepcopy(cached) if cached is not None else None
+    
+    async def _cache_set(self, key: str, result: Any):
+        self._response_cache.set(key, copy.deepcopy(result))
+        if self._shared_cache is not None:
+            await self._shared_cache.set(key, result)
+    
+    async def _stream_plan(
+        self,
+        method: str,
+        inputs: Dict[str, Any],
+        prompt: PromptTemplate,
+        prompt_inputs: Dict[str, Any],
+        items_key: str,
+        item_event: str,
+        fallback: Callable[[], Dict[str, Any]],
+        use_cache: bool = True
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream LLM tokens through an incremental parser, yielding ``(item_event, item)``
+        for each completed element of ``items_key`` and finally ``("plan", plan)``.
+        
+        Shares cache entries with the non-streaming method: a hit replays the
+        cached items at once. If the full response does not parse, the final
+        plan is the fallback and is not cached.
+        """
+        metrics = self._cache_metrics.setdefault(method, {"hits": 0, "misses": 0, "bypassed": 0})
+        use_cache = use_cache and AI_CACHE_ENABLED
+        key = self.cache_key(method, inputs)
+        
+        if use_cache:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                metrics["hits"] += 1
+                for item in cached.get(items_key, []):
+                    yield item_event, item
+                yield "plan", cached
+                return
+            metrics["misses"] += 1
+        else:
+            metrics["bypassed"] += 1
+        
+        extractor = JSONArrayItemExtractor(items_key)
+        chunks = []
+        async for chunk in self.llm.astream(prompt.format(**prompt_inputs)):
+            chunks.append(chunk)
+            for item in extractor.feed(chunk):
+                yield item_event, item
+        
+        try:
+            plan = json.loads("".join(chunks))
+        except json.JSONDecodeError:
+            yield "plan", fallback()
+            return
+        
+        if use_cache:
+            await self._cache_set(key, plan)
+        yield "plan", plan
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        methods = {}
+        for method, metrics in self._cache_metrics.items():
+            lookups = metrics["hits"] + metrics["misses"]
+            methods[method] = {**metrics, "hit_rate": metrics["hits"] / lookups if lookups else 0.0}
+        return {
+            "enabled": AI_CACHE_ENABLED,
+            "memory": self._response_cache.stats(),
+            "shared": self._shared_cache.stats() if self._shared_cache is not None else None,
+            "coalesced": self._inflight.stats(),
+            "methods": methods
+        }
+        
+    async def generate_nutrition_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
         """Generate personalized nutrition plan using AI"""
         
-        # Construct context for AI
-        context = self._build_nutrition_context(user_profile, request_data)
-        
-        # Create prompt template
-        nutrition_prompt = PromptTemplate(
-            input_variables=["context", "user_profile", "requirements"],
-            template="""
-            You are an expert nutritionist creating a personalized meal plan. 
-            
-            User Profile: {user_profile}
-            Requirements: {requirements}
-            Context: {context}
-            
-            Create a detailed {duration_days}-day meal plan that:
-            1. Meets the user's caloric and macro needs
-            2. Respects dietary preferences and allergies
-            3. Incorporates cultural and regional food preferences
-            4. Follows evidence-based nutrition guidelines (USDA, NHS, WHO)
-            5. Provides practical meal preparation instructions
-            
-            Return the response as a JSON object with the following structure:
-            {{
-                "title": "Plan title",
-                "description": "Plan description",
-                "daily_plans": [
-                    {{
-                        "day": 1,
-                        "meals": [
-                            {{
-                                "meal_type": "breakfast|lunch|dinner|snack",
-                                "items": [
-                                    {{
-                                        "food_name": "Food name",
-                                        "quantity": 100,
-                                        "unit": "g|ml|piece",
-                                        "calories": 200,
-                                        "macros": {{"protein": 10, "carbs": 30, "fat": 8, "fiber": 5}}
-                                    }}
-                                ],
-                                "total_calories": 200,
-                                "total_macros": {{"protein": 10, "carbs": 30, "fat": 8, "fiber": 5}},
-                                "preparation_time": 15,
-                                "instructions": "Cooking instructions"
-                            }}
-                        ],
-                        "daily_totals": {{"calories": 2000, "protein": 150, "carbs": 200, "fat": 80, "fiber": 25}}
-                    }}
-                ],
-                "nutritional_summary": {{
-                    "avg_daily_calories": 2000,
-                    "avg_daily_macros": {{"protein": 150, "carbs": 200, "fat": 80, "fiber": 25}},
-                    "key_nutrients": ["vitamin_c", "iron", "calcium"],
-                    "health_benefits": ["Weight management", "Heart health"]
-                }}
-            }}
-            """
+        if NUTRITION_PLAN_ENGINE == "optimizer":
+            plan = optimize_meal_plan(food_catalog, user_profile, request_data)
+            if plan is not None:
+                return plan
+        
+        inputs = {"user_profile": user_profile, "request_data": request_data}
+        return await self._cached(
+            "generate_nutrition_plan", inputs,
+            lambda: self._generate_nutrition_plan(user_profile, request_data),
+            use_cache
         )
+    
+    async def stream_nutrition_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any], use_cache: bool = True) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream a nutrition plan as ("day", daily plan) events followed by ("plan", full plan)"""
+        
+        if NUTRITION_PLAN_ENGINE == "optimizer":
+            plan = optimize_meal_plan(food_catalog, user_profile, request_data)
+            if plan is not None:
+                for day in plan["daily_plans"]:
+                    yield "day", day
+                yield "plan", plan
+                return
+        
+        nutrition_prompt, prompt_inputs = self._nutrition_prompt(user_profile, request_data)
+        async for event in self._stream_plan(
+            "generate_nutrition_plan", {"user_profile": user_profile, "request_data": request_data},
+            nutrition_prompt, prompt_inputs, "daily_plans", "day",
+            lambda: self._create_fallback_nutrition_plan(user_profile, request_data),
+            use_cache
+        ):
+            yield event
+    
+    async def _generate_nutrition_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        _, prompt_inputs = self._nutrition_prompt(user_profile, request_data)
         
         # Generate the plan
-        chain = LLMChain(llm=self.llm, prompt=nutrition_prompt)
-        response = await chain.arun(
-            context=context,
-            user_profile=json.dumps(user_profile),
-            requirements=json.dumps(request_data),
-            duration_days=request_data.get('duration_days', 7)
-        )
+        response = await self._chains["nutrition_plan"].arun(**prompt_inputs)
         
         try:
-            return json.loads(response)
+            return json.loads(response), True
         except json.JSONDecodeError:
             # Fallback to structured response if JSON parsing fails
-            return self._create_fallback_nutrition_plan(user_profile, request_data)
+            return self._create_fallback_nutrition_plan(user_profile, request_data), False
+    
+    def _nutrition_prompt(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> Tuple[PromptTemplate, Dict[str, Any]]:
+        values = prompt_registry.render("nutrition_plan", {
+            "context": self._build_nutrition_context(user_profile, request_data),
+            "user_profile": compact_json(user_profile),
+            "requirements": compact_json(request_data),
+            "duration_days": request_data.get('duration_days', 7)
+        })
+        return prompt_registry.get("nutrition_plan").prompt, values
     
-    async def generate_fitness_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_fitness_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
         """Generate personalized fitness plan using AI"""
         
-        context = self._build_fitness_context(user_profile, request_data)
-        
-        fitness_prompt = PromptTemplate(
-            input_variables=["context", "user_profile", "requirements"],
-            template="""
-            You are an expert fitness trainer creating a personalized workout plan.
-            
-            User Profile: {user_profile}
-            Requirements: {requirements}
-            Context: {context}
-            
-            Create a detailed workout plan that:
-            1. Matches the user's fitness level and goals
-            2. Accommodates available equipment and time constraints
-            3. Considers any medical conditions or mobility issues
-            4. Follows evidence-based exercise principles (ACSM, WHO guidelines)
-            5. Includes progressive overload and recovery periods
-            6. Adapts to mood, fatigue, and injury status
-            
-            Return the response as a JSON object with the following structure:
-            {{
-                "title": "Plan title",
-                "description": "Plan description",
-                "workout_sessions": [
-                    {{
-                        "day": 1,
-                        "session_type": "strength|cardio|flexibility|recovery",
-                        "exercises": [
-                            {{
-                                "name": "Exercise name",
-                                "sets": 3,
-                                "reps": 10,
-                                "duration": 30,
-                                "rest_time": 60,
-                                "weight": 10.0,
-                                "notes": "Form cues and tips",
-                                "modifications": ["easier version", "harder version"]
-                            }}
-                        ],
-                        "estimated_duration": 45,
-                        "difficulty_level": "beginner|intermediate|advanced",
-                        "warm_up": ["5 min light cardio", "dynamic stretching"],
-                        "cool_down": ["static stretching", "breathing exercises"]
-                    }}
-                ],
-                "weekly_structure": {{
-                    "frequency": 3,
-                    "rest_days": [3, 6, 7],
-                    "progression_notes": "How to progress each week"
-                }}
-            }}
-            """
+        inputs = {"user_profile": user_profile, "request_data": request_data}
+        return await self._cached(
+            "generate_fitness_plan", inputs,
+            lambda: self._generate_fitness_plan(user_profile, request_data),
+            use_cache
         )
+    
+    async def stream_fitness_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any], use_cache: bool = True) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream a fitness plan as ("session", workout session) events followed by ("plan", full plan)"""
         
-        chain = LLMChain(llm=self.llm, prompt=fitness_prompt)
-        response = await chain.arun(
-            context=context,
-            user_profile=json.dumps(user_profile),
-            requirements=json.dumps(request_data)
-        )
+        fitness_prompt, prompt_inputs = self._fitness_prompt(user_profile, request_data)
+        async for event in self._stream_plan(
+            "generate_fitness_plan", {"user_profile": user_profile, "request_data": request_data},
+            fitness_prompt, prompt_inputs, "workout_sessions", "session",
+            lambda: self._create_fallback_fitness_plan(user_profile, request_data),
+            use_cache
+        ):
+            yield event
+    
+    async def _generate_fitness_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        _, prompt_inputs = self._fitness_prompt(user_profile, request_data)
+        
+        response = await self._chains["fitness_plan"].arun(**prompt_inputs)
         
         try:
-            return json.loads(response)
+            return json.loads(response), True
         except json.JSONDecodeError:
-            return self._create_fallback_fitness_plan(user_profile, request_data)
+            return self._create_fallback_fitness_plan(user_profile, request_data), False
+    
+    def _fitness_prompt(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> Tuple[PromptTemplate, Dict[str, Any]]:
+        values = prompt_registry.render("fitness_plan", {
+            "context": self._build_fitness_context(user_profile, request_data),
+            "user_profile": compact_json(user_profile),
+            "requirements": compact_json(request_data)
+        })
+        return prompt_registry.get("fitness_plan").prompt, values
     
-    async def suggest_ingredient_substitutions(self, ingredient: str, dietary_restrictions: List[str], cultural_preferences: str) -> List[Dict[str, str]]:
+    async def suggest_ingredient_substitutions(self, ingredient: str, dietary_restrictions: List[str], cultural_preferences: str, use_cache: bool = True) -> List[Dict[str, str]]:
         """Suggest ingredient substitutions based on dietary needs"""
         
-        substitution_prompt = PromptTemplate(
-            input_variables=["ingredient", "restrictions", "cultural_preferences"],
-            template="""
-            Suggest healthy ingredient substitutions for: {ingredient}
-            
-            Dietary restrictions: {restrictions}
-            Cultural preferences: {cultural_preferences}
-            
-            Provide 3-5 alternatives that:
-            1. Maintain similar nutritional value
-            2. Respect dietary restrictions
-            3. Align with cultural preferences
-            4. Are readily available
-            
-            Return as JSON array:
-            [
-                {{
-                    "substitute": "Alternative ingredient",
-                    "reason": "Why it's a good substitute",
-                    "nutritional_benefit": "Key nutritional advantage",
-                    "cultural_note": "Cultural relevance if applicable"
-                }}
-            ]
-            """
-        )
-        
-        chain = LLMChain(llm=self.llm, prompt=substitution_prompt)
-        response = await chain.arun(
-            ingredient=ingredient,
-            restrictions=", ".join(dietary_restrictions),
-            cultural_preferences=cultural_preferences
+        inputs = {"ingredient": ingredient, "dietary_restrictions": dietary_restrictions, "cultural_preferences": cultural_preferences}
+        return await self._cached(
+            "suggest_ingredient_substitutions", inputs,
+            lambda: self._suggest_ingredient_substitutions(ingredient, dietary_restrictions, cultural_preferences),
+            use_cache
         )
+    
+    async def _suggest_ingredient_substitutions(self, ingredient: str, dietary_restrictions: List[str], cultural_preferences: str) -> Tuple[List[Dict[str, str]], bool]:
+        values = prompt_registry.render("ingredient_substitutions", {
+            "ingredient": ingredient,
+            "restrictions": ", ".join(dietary_restrictions),
+            "cultural_preferences": cultural_preferences
+        })
+        response = await self._chains["ingredient_substitutions"].arun(**values)
         
         try:
-            return json.loads(response)
+            return json.loads(response), True
         except json.JSONDecodeError:
-            return [{"substitute": "Consult nutritionist", "reason": "Unable to process request", "nutritional_benefit": "N/A", "cultural_note": "N/A"}]
+            return [{"substitute": "Consult nutritionist", "reason": "Unable to process request", "nutritional_benefit": "N/A", "cultural_note": "N/A"}], False
     
-    async def curate_educational_content(self, topic: str, target_audience: List[str], sources: List[str]) -> Dict[str, Any]:
+    async def curate_educational_content(self, topic: str, target_audience: List[str], sources: List[str], use_cache: bool = True) -> Dict[str, Any]:
         """Curate educational content on health topics"""
         
-        education_prompt = PromptTemplate(
-            input_variables=["topic", "audience", "sources"],
-            template="""
-            Create educational content about: {topic}
-            
-            Target audience: {audience}
-            Evidence sources: {sources}
-            
-            Create comprehensive yet accessible content that:
-            1. Is scientifically accurate and evidence-based
-            2. Is appropriate for the target audience level
-            3. Includes practical actionable advice
-            4. References credible health organizations
-            5. Is culturally sensitive and inclusive
-            
-            Return as JSON:
-            {{
-                "title": "Article title",
-                "summary": "Brief summary (2-3 sentences)",
-                "content": "Full article content with sections",
-                "key_takeaways": ["Point 1", "Point 2", "Point 3"],
-                "evidence_level": "high|medium|low",
-                "sources_cited": ["Source 1", "Source 2"],
-                "tags": ["tag1", "tag2", "tag3"],
-                "related_topics": ["topic1", "topic2"]
-            }}
-            """
-        )
-        
-        chain = LLMChain(llm=self.llm, prompt=education_prompt)
-        response = await chain.arun(
-            topic=topic,
-            audience=", ".join(target_audience),
-            sources=", ".join(sources)
+        inputs = {"topic": topic, "target_audience": target_audience, "sources": sources}
+        return await self._cached(
+            "curate_educational_content", inputs,
+            lambda: self._curate_educational_content(topic, target_audience, sources),
+            use_cache
         )
+    
+    async def _curate_educational_content(self, topic: str, target_audience: List[str], sources: List[str]) -> Tuple[Dict[str, Any], bool]:
+        values = prompt_registry.render("educational_content", {
+            "topic": topic,
+            "audience": ", ".join(target_audience),
+            "sources": ", ".join(sources)
+        })
+        response = await self._chains["educational_content"].arun(**values)
         
         try:
-            return json.loads(response)
+            return json.loads(response), True
         except json.JSONDecodeError:
-            return {"title": topic, "summary": "Content creation in progress", "content": "Please check back later", "key_takeaways": [], "evidence_level": "medium", "sources_cited": sources, "tags": [topic], "related_topics": []}
+            return {"title": topic, "summary": "Content creation in progress", "content": "Please check back later", "key_takeaways": [], "evidence_level": "medium", "sources_cited": sources, "tags": [topic], "related_topics": []}, False
     
-    def _build_nutrition_context(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> str:
-        """Build context for nutrition AI prompts"""
+    def _build_nutrition_context(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> List[str]:
+        """Build context lines for nutrition AI prompts, most important first so budget trimming drops guidelines before user specifics"""
         context_parts = []
         
-        # Add relevant nutrition guidelines
-        context_parts.append("NUTRITION GUIDELINES:")
-        context_parts.append("- USDA Dietary Guidelines: Emphasize fruits, vegetables, whole grains, lean proteins")
-        context_parts.append("- NHS Eat Well Guide: Balance energy intake with physical activity")
-        context_parts.append("- WHO Healthy Diet: Limit free sugars, saturated fats, and sodium")
+        # Add medical considerations
+        if user_profile.get('medical_conditions'):
+            context_parts.append(f"MEDICAL CONSIDERATIONS: Account for {', '.join(user_profile['medical_conditions'])}")
         
         # Add cultural considerations
         if user_profile.get('cultural_background'):
             context_parts.append(f"CULTURAL CONTEXT: Consider {user_profile['cultural_background']} cuisine traditions")
         
-        # Add medical considerations
-        if user_profile.get('medical_conditions'):
-            context_parts.append(f"MEDICAL CONSIDERATIONS: Account for {', '.join(user_profile['medical_conditions'])}")
+        # Add relevant nutrition guidelines
+        context_parts.append("NUTRITION GUIDELINES:")
+        context_parts.append("- USDA Dietary Guidelines: Emphasize fruits, vegetables, whole grains, lean proteins")
+        context_parts.append("- NHS Eat Well Guide: Balance energy intake with physical activity")
+        context_parts.append("- WHO Healthy Diet: Limit free sugars, saturated fats, and sodium")
         
-        return "\n".join(context_parts)
+        return context_parts
     
-    def _build_fitness_context(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> str:
-        """Build context for fitness AI prompts"""
+    def _build_fitness_context(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> List[str]:
+        """Build context lines for fitness AI prompts, most important first"""
         context_parts = []
         
+        # Add safety considerations
+        if user_profile.get('medical_conditions') or user_profile.get('mobility_issues'):
+            context_parts.append("SAFETY CONSIDERATIONS: Prioritize low-impact, modified exercises")
+        
         # Add fitness guidelines
         context_parts.append("FITNESS GUIDELINES:")
         context_parts.append("- ACSM Guidelines: 150 min moderate or 75 min vigorous activity per week")
         context_parts.append("- WHO Physical Activity: Include muscle-strengthening activities 2+ days/week")
         context_parts.append("- Progressive overload principle for strength gains")
         
-        # Add safety considerations
-        if user_profile.get('medical_conditions') or user_profile.get('mobility_issues'):
-            context_parts.append("SAFETY CONSIDERATIONS: Prioritize low-impact, modified exercises")
-        
-        return "\n".join(context_parts)
+        return context_parts
     
     def _create_fallback_nutrition_plan(self, user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a basic nutrition plan when AI generation fails"""
+        # Prefer a real multi-day plan solved from the food catalog when it is loaded
+        plan = optimize_meal_plan(food_catalog, user_profile, request_data)
+        if plan is not None:
+            return plan
+        
         return {
             "title": "Basic Nutrition Plan",
             "description": "A simple, balanced meal plan",
@@ -1,17 +1,66 @@
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from .config import SECRET_KEY, ALGORITHM
-from .database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, TOKEN_CACHE_SIZE, USER_CACHE_SIZE, USER_CACHE_TTL, CACHE_BACKEND
+from .cache import LRUCache, create_cache
+from .database import get_async_db
 from .models import User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Verified JWT claims keyed by the raw token; each entry expires with the token itself
+_token_cache = LRUCache(max_size=TOKEN_CACHE_SIZE)
+# Short-lived snapshot of the user row keyed by username
+_user_cache = LRUCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# username -> time of the last role/active change; tokens issued before it lose the claims fast path.
+# Shared through Redis when CACHE_BACKEND=redis so every worker sees the change.
+_auth_revocations = create_cache("auth_revoked", max_size=USER_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# A per-process revocation store would let other workers honor stale claims, so role and
+# active checks only trust token claims when revocations are shared
+CLAIMS_FAST_PATH = CACHE_BACKEND == "redis"
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Detached snapshot of a User row, safe to cache across requests"""
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    phone: Optional[str]
+    role: str
+    is_active: bool
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, user: User) -> "AuthenticatedUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            phone=user.phone,
+            role=user.role,
+            is_active=user.is_active,
+            created_at=user.created_at
+        )
+
+@dataclass(frozen=True)
+class TokenPrincipal:
+    """Identity and authorization data carried in the access token claims"""
+    id: int
+    username: str
+    role: str
+    is_active: bool
+    full_name: Optional[str] = None
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -20,45 +69,109 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def user_token_claims(user: User) -> Dict[str, Any]:
+    """Claims that let role checks run without a database lookup"""
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "role": user.role,
+        "active": user.is_active,
+        "name": user.full_name
+    }
+
+def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    token = credentials.credentials
+    payload = _token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise credentials_exception
-        return username
-    except JWTError:
+        if payload.get("sub") is None:
+            raise credentials_exception
+        if payload.get("exp"):
+            _token_cache.set(token, payload, ttl=max(payload["exp"] - time.time(), 0.001))
+    elif payload.get("exp") and payload["exp"] <= time.time():
+        _token_cache.delete(token)
         raise credentials_exception
+    return payload
+
+def verify_token(claims: Dict[str, Any] = Depends(get_token_claims)):
+    return claims["sub"]
 
-def get_current_user(db: Session = Depends(get_db), username: str = Depends(verify_token)):
-    user = db.query(User).filter(User.username == username).first()
+async def invalidate_user_auth(username: str):
+    """Drop cached auth state after a user is deactivated or changes role"""
+    _user_cache.delete(username)
+    await _auth_revocations.set(username, time.time())
+
+def auth_cache_stats() -> Dict[str, Any]:
+    return {
+        "tokens": _token_cache.stats(),
+        "users": _user_cache.stats()
+    }
+
+async def _load_user(db: AsyncSession, username: str) -> AuthenticatedUser:
+    user = _user_cache.get(username)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
+        result = await db.execute(select(User).where(User.username == username))
+        db_user = result.scalars().first()
+        if db_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        user = AuthenticatedUser.from_model(db_user)
+        _user_cache.set(username, user)
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_user(db: AsyncSession = Depends(get_async_db), username: str = Depends(verify_token)):
+    return await _load_user(db, username)
+
+def get_current_active_user(current_user: AuthenticatedUser = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def require_trainer_role(current_user: User = Depends(get_current_active_user)):
+async def get_token_principal(
+    claims: Dict[str, Any] = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_async_db)
+) -> Union[TokenPrincipal, AuthenticatedUser]:
+    """Authorize from token claims, falling back to the user row for old or revoked tokens"""
+    if CLAIMS_FAST_PATH and "uid" in claims and "role" in claims:
+        errors = getattr(_auth_revocations, "errors", 0)
+        revoked_at = await _auth_revocations.get(claims["sub"])
+        # An unreachable revocation store is not proof the token is still valid
+        reachable = getattr(_auth_revocations, "errors", 0) == errors
+        if reachable and (revoked_at is None or claims.get("iat", 0) > revoked_at):
+            return TokenPrincipal(
+                id=claims["uid"],
+                username=claims["sub"],
+                role=claims["role"],
+                is_active=claims.get("active", True),
+                full_name=claims.get("name")
+            )
+    return await _load_user(db, claims["sub"])
+
+def get_active_principal(principal: Union[TokenPrincipal, AuthenticatedUser] = Depends(get_token_principal)):
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+def require_trainer_role(current_user: TokenPrincipal = Depends(get_active_principal)):
     if current_user.role not in ["trainer", "admin"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -66,7 +179,7 @@ def require_trainer_role(current_user: User = Depends(get_current_active_user)):
         )
     return current_user
 
-def require_admin_role(current_user: User = Depends(get_current_active_user)):
+def require_admin_role(current_user: TokenPrincipal = Depends(get_active_principal)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config import CACHE_BACKEND, REDIS_URL, DASHBOARD_CACHE_TTL, DASHBOARD_CACHE_MAX_SIZE, EDUCATION_CONTENT_CACHE_TTL
+
+_MISSING = object()
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size
+        }
+
+class MemoryCache:
+    """Async cache interface over an in-process LRUCache.
+
+    Used directly when no Redis is configured, and as the drop-in stand-in
+    for RedisCache in tests.
+    """
+
+    def __init__(self, namespace: str, max_size: int = 1024, ttl: Optional[float] = None):
+        self.namespace = namespace
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+
+    async def get(self, key):
+        return self._cache.get(key)
+
+    async def set(self, key, value, ttl: Optional[float] = None):
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, key):
+        self._cache.delete(key)
+
+    async def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"namespace": self.namespace, **self._cache.stats()}
+
+class RedisCache:
+    """Async cache stored in Redis as JSON; Redis failures degrade to cache misses"""
+
+    def __init__(self, namespace: str, url: str = REDIS_URL, ttl: Optional[float] = None, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+        self.namespace = namespace
+        self.ttl = ttl
+        self._client = client
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key):
+        try:
+            raw = await self._client.get(self._key(key))
+        except Exception:
+            self.errors += 1
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            await self._client.set(self._key(key), json.dumps(value), ex=int(ttl) if ttl else None)
+        except Exception:
+            self.errors += 1
+
+    async def delete(self, key):
+        try:
+            await self._client.delete(self._key(key))
+        except Exception:
+            self.errors += 1
+
+    async def clear(self):
+        try:
+            async for key in self._client.scan_iter(match=f"{self.namespace}:*"):
+                await self._client.delete(key)
+        except Exception:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class DiskCache:
+    """Async cache of JSON files under a directory.
+
+    Entries expire by file age; once more than ``max_entries`` files exist
+    the oldest are pruned.
+    """
+
+    def __init__(self, namespace: str, directory: Path, ttl: Optional[float] = None, max_entries: int = 10000):
+        self.namespace = namespace
+        self.directory = Path(directory) / namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+    def _path(self, key) -> Path:
+        return self.directory / f"{hashlib.sha256(str(key).encode()).hexdigest()}.json"
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                return None
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key, value):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(value))
+        tmp_path.replace(path)
+
+        # Listing the directory is O(n), so only check the size cap periodically
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def _prune(self):
+        files = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for path in files[:max(len(files) - self.max_entries, 0)]:
+            path.unlink(missing_ok=True)
+
+    async def get(self, key):
+        value = await asyncio.to_thread(self._read, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key, value, ttl: Optional[float] = None):
+        try:
+            await asyncio.to_thread(self._write, key, value)
+        except OSError:
+            pass
+
+    async def delete(self, key):
+        await asyncio.to_thread(self._path(key).unlink, missing_ok=True)
+
+    async def clear(self):
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "backend": "disk",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+def create_cache(namespace: str, max_size: int = 1024, ttl: Optional[float] = None):
+    """Build the configured cache backend (CACHE_BACKEND=memory|redis)"""
+    if CACHE_BACKEND == "redis":
+        return RedisCache(namespace, ttl=ttl)
+    return MemoryCache(namespace, max_size=max_size, ttl=ttl)
+
+# Per-user progress dashboard payloads, invalidated by progress/nutrition/fitness writes
+dashboard_cache = create_cache("dashboard", max_size=DASHBOARD_CACHE_MAX_SIZE, ttl=DASHBOARD_CACHE_TTL)
+
+# Article/video payloads keyed by "<content_type>:<id>"; view counts in them lag by up to the TTL
+education_content_cache = create_cache("education_content", ttl=EDUCATION_CONTENT_CACHE_TTL)
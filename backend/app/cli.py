@@ -0,0 +1,89 @@
+import argparse
+import sys
+
+from .config import USDA_IMPORT_BATCH_SIZE
+from .content_tags import backfill_content_tags
+from .database import SessionLocal
+from .rollups import backfill_rollups
+from .query_plans import check_progress_query_plans
+from .usda_import import DEFAULT_DATA_TYPES, import_usda
+
+def backfill_rollups_command(args):
+    db = SessionLocal()
+    try:
+        rows = backfill_rollups(db, user_id=args.user_id)
+    finally:
+        db.close()
+    print(f"Rebuilt {rows} daily rollup rows")
+
+def backfill_content_tags_command(args):
+    db = SessionLocal()
+    try:
+        tags = backfill_content_tags(db)
+    finally:
+        db.close()
+    print(f"Recounted {tags} content tags")
+
+def check_query_plans_command(args):
+    db = SessionLocal()
+    try:
+        report = check_progress_query_plans(db, args.user_id, force_index=args.force_index)
+    finally:
+        db.close()
+
+    for entry in report:
+        scans = ", ".join(
+            f"{scan['node_type']}" + (f" using {scan['index']}" if scan["index"] else "")
+            for scan in entry["scans"]
+        )
+        print(f"{'OK  ' if entry['uses_index'] else 'FAIL'} {entry['query']}: {scans}")
+
+    if not all(entry["uses_index"] for entry in report):
+        sys.exit(1)
+
+def import_usda_command(args):
+    def report(status):
+        print(f"{status['rows']} rows imported ({status['rows_per_second']:.0f} rows/s)", flush=True)
+
+    result = import_usda(
+        args.source,
+        batch_size=args.batch_size,
+        data_types=args.data_types.split(","),
+        restart=args.restart,
+        progress=report
+    )
+    resumed = f", resumed after row {result['resumed_from']}" if result["resumed_from"] else ""
+    print(
+        f"Imported {result['rows'] - result['resumed_from']} foods in {result['seconds']}s "
+        f"({result['rows_per_second']:.0f} rows/s{resumed}). Running APIs pick up new foods within "
+        f"FOOD_CATALOG_REFRESH_INTERVAL and updated ones after FOOD_CATALOG_TTL."
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="AI Health Platform maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser("backfill-rollups", help="Rebuild progress_daily_rollups from raw progress logs")
+    backfill.add_argument("--user-id", type=int, help="Only rebuild rollups for this user")
+    backfill.set_defaults(handler=backfill_rollups_command)
+
+    tags = subparsers.add_parser("backfill-content-tags", help="Recount content_tags from educational_content tags")
+    tags.set_defaults(handler=backfill_content_tags_command)
+
+    plans = subparsers.add_parser("check-query-plans", help="Verify dashboard/milestones queries use progress_logs indexes")
+    plans.add_argument("--user-id", type=int, default=1, help="User id to plan the queries for")
+    plans.add_argument("--force-index", action="store_true", help="Disable seq scans (for small development databases)")
+    plans.set_defaults(handler=check_query_plans_command)
+
+    usda = subparsers.add_parser("import-usda", help="Upsert a FoodData Central download into food_database")
+    usda.add_argument("source", help="Extracted CSV download directory or JSON download file")
+    usda.add_argument("--batch-size", type=int, default=USDA_IMPORT_BATCH_SIZE, help="Rows per upsert/commit")
+    usda.add_argument("--data-types", default=",".join(DEFAULT_DATA_TYPES), help="CSV data_type values to import")
+    usda.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted import")
+    usda.set_defaults(handler=import_usda_command)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
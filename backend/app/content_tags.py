@@ -0,0 +1,74 @@
+from collections import Counter
+from typing import Any, Dict, List
+
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import ContentTag, EducationalContent
+
+tag_table = ContentTag.__table__
+
+def content_tag_set(tags: Any) -> set:
+    """Distinct non-empty tags of one content row"""
+    if not isinstance(tags, (list, tuple)):
+        return set()
+    return {tag.strip() for tag in tags if isinstance(tag, str) and tag.strip()}
+
+def tag_deltas(old_tags: Any, new_tags: Any) -> Dict[str, int]:
+    """Per-tag count changes when a content row's tags go from ``old_tags`` to ``new_tags``"""
+    old, new = content_tag_set(old_tags), content_tag_set(new_tags)
+    return {**{tag: -1 for tag in old - new}, **{tag: 1 for tag in new - old}}
+
+def upsert_tag_counts_statement(deltas: Dict[str, int]):
+    """INSERT .. ON CONFLICT statement that adds count deltas to the tag catalog"""
+    stmt = insert(ContentTag).values([
+        {"tag": tag, "content_count": max(delta, 0)} for tag, delta in sorted(deltas.items())
+    ])
+    # The inserted value is only used for new tags; existing rows take the signed delta
+    return stmt.on_conflict_do_update(
+        index_elements=[tag_table.c.tag],
+        set_={"content_count": tag_table.c.content_count + case(deltas, value=tag_table.c.tag, else_=0)}
+    )
+
+async def apply_tag_changes(db: AsyncSession, old_tags: Any, new_tags: Any) -> None:
+    """Update the tag catalog for one created or edited content row inside the caller's transaction"""
+    deltas = tag_deltas(old_tags, new_tags)
+    if deltas:
+        await db.execute(upsert_tag_counts_statement(deltas))
+
+async def fetch_tag_catalog(db: AsyncSession) -> Dict[str, Any]:
+    """Taxonomy and tag counts read from content_tags (one row per tag, independent of content volume)"""
+    result = await db.execute(select(ContentTag).order_by(ContentTag.tag))
+
+    categories: Dict[str, List[str]] = {}
+    counts: Dict[str, int] = {}
+    for row in result.scalars().all():
+        if row.category:
+            categories.setdefault(row.category, []).append(row.tag)
+        if row.content_count > 0:
+            counts[row.tag] = row.content_count
+
+    return {
+        "categories": categories,
+        "all_tags": sorted(counts),
+        "tag_counts": counts
+    }
+
+def backfill_content_tags(db: Session) -> int:
+    """Recount every tag from educational_content; taxonomy categories are kept"""
+    counts: Counter = Counter()
+    for tags in db.execute(select(EducationalContent.tags).execution_options(yield_per=1000)).scalars():
+        counts.update(content_tag_set(tags))
+
+    db.execute(update(ContentTag).values(content_count=0))
+    if counts:
+        stmt = insert(ContentTag).values([{"tag": tag, "content_count": count} for tag, count in counts.items()])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[tag_table.c.tag],
+            set_={"content_count": stmt.excluded.content_count}
+        ))
+    db.commit()
+
+    return len(counts)
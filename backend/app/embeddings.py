@@ -0,0 +1,299 @@
+import asyncio
+import os
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import EMBEDDING_BACKEND, EMBEDDING_DIMENSIONS, EMBEDDING_INDEX_PATH, OPENAI_API_KEY
+from .models import EducationalContent
+from .search_index import tokenize
+
+# Characters of an article passed to the embedder: the opening carries the topic,
+# and API embedders have input limits
+MAX_EMBEDDING_CHARS = 4000
+
+# Corpus statistics are refitted (and every article re-embedded) once the
+# library has grown to this multiple of the size they were fitted on
+REFIT_GROWTH = 2
+
+def content_text(content: Any) -> str:
+    """Text an article is embedded from: title, summary and tags first, then the body"""
+    parts = [content.title, content.summary, " ".join(content.tags or []), content.content]
+    return "\n".join(str(part) for part in parts if part)[:MAX_EMBEDDING_CHARS]
+
+class Embedder:
+    """Maps texts to L2-normalized float32 vectors; ``name`` identifies the vector space.
+
+    Embedders that depend on corpus statistics return a fitted copy from
+    ``fit`` and round-trip those statistics through ``state``/``with_state``.
+    """
+
+    name = "base"
+
+    def fit(self, texts: List[str]) -> "Embedder":
+        return self
+
+    def needs_refit(self, documents: int) -> bool:
+        return False
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def with_state(self, state: Dict[str, np.ndarray]) -> "Embedder":
+        return self
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+class HashingEmbedder(Embedder):
+    """Offline TF-IDF embedder: words are feature-hashed (signed) into a fixed
+    number of dimensions and weighted by sublinear term frequency times the
+    inverse document frequency fitted on the content library."""
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS, frequencies: Optional[Dict[str, int]] = None, documents: int = 0):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+        self.frequencies = frequencies or {}
+        self.documents = documents
+
+    def fit(self, texts: List[str]) -> "HashingEmbedder":
+        frequencies: Counter = Counter()
+        for text in texts:
+            frequencies.update(set(tokenize(text)))
+        return HashingEmbedder(self.dimensions, dict(frequencies), len(texts))
+
+    def needs_refit(self, documents: int) -> bool:
+        return documents > REFIT_GROWTH * self.documents
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {
+            "vocabulary": np.array(list(self.frequencies), dtype=str),
+            "frequencies": np.array(list(self.frequencies.values()), dtype=np.int64),
+            "documents": np.array(self.documents),
+        }
+
+    def with_state(self, state: Dict[str, np.ndarray]) -> "HashingEmbedder":
+        frequencies = dict(zip(state["vocabulary"].tolist(), state["frequencies"].tolist()))
+        return HashingEmbedder(self.dimensions, frequencies, int(state["documents"]))
+
+    def _vector(self, text: str) -> np.ndarray:
+        counts = Counter(tokenize(text))
+        digests = np.fromiter((zlib.crc32(word.encode()) for word in counts), dtype=np.int64, count=len(counts))
+        frequencies = np.fromiter((self.frequencies.get(word, 0) for word in counts), dtype=np.float64, count=len(counts))
+        tf = 1 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+        idf = np.log((1 + self.documents) / (1 + frequencies)) + 1
+        signs = np.where(digests & 0x80000000, 1.0, -1.0)
+        vector = np.bincount(digests % self.dimensions, weights=signs * tf * idf, minlength=self.dimensions).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.array([self._vector(text) for text in texts], dtype=np.float32).reshape(len(texts), self.dimensions)
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings API through langchain; one network round trip per call"""
+
+    def __init__(self):
+        from langchain.embeddings import OpenAIEmbeddings
+        self._client = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+        self.name = f"openai-{getattr(self._client, 'model', 'default')}"
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        vectors = np.array(self._client.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+def create_embedder(backend: str = EMBEDDING_BACKEND) -> Embedder:
+    if backend == "openai":
+        return OpenAIEmbedder()
+    return HashingEmbedder()
+
+class ContentVectorIndex:
+    """Nearest-neighbour index over educational content embeddings.
+
+    Vectors are computed once, when content is created or curated, and kept
+    as one normalized float32 matrix persisted with the embedder's corpus
+    statistics to EMBEDDING_INDEX_PATH (.npz, written atomically). A query
+    is a single matrix-vector product plus argpartition. The first use loads
+    the file and embeds any content it is missing; other processes pick up
+    a newer file by its mtime. A file written by a different embedder is
+    discarded, and the whole library is re-embedded when the embedder's
+    statistics go stale.
+    """
+
+    def __init__(self, path: str = EMBEDDING_INDEX_PATH, embedder: Optional[Embedder] = None):
+        self.path = path
+        self._lock = asyncio.Lock()
+        self.ready = False
+        self.errors = 0
+        self.__dict__.update(self._state(embedder or create_embedder(), [], [], None))
+
+    @staticmethod
+    def _state(embedder: Embedder, ids: List[int], content_types: List[str], vectors: Optional[np.ndarray], mtime: Optional[float] = None) -> Dict[str, Any]:
+        return {
+            "embedder": embedder,
+            "ids": np.array(ids, dtype=np.int64),
+            "content_types": np.array(content_types, dtype=str),
+            "vectors": np.zeros((0, 0), dtype=np.float32) if vectors is None or not len(ids) else np.asarray(vectors, dtype=np.float32),
+            "positions": {content_id: position for position, content_id in enumerate(ids)},
+            "mtime": mtime,
+        }
+
+    def _current(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in ("embedder", "ids", "content_types", "vectors", "positions", "mtime")}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _file_changed(self) -> bool:
+        return os.path.exists(self.path) and (self.mtime is None or os.path.getmtime(self.path) > self.mtime)
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        """State saved on disk, or None when there is no usable file"""
+        if not os.path.exists(self.path):
+            return None
+        mtime = os.path.getmtime(self.path)
+        with np.load(self.path, allow_pickle=False) as data:
+            if str(data["embedder"]) != self.embedder.name:
+                return None
+            embedder = self.embedder.with_state({
+                key[len("embedder_"):]: data[key] for key in data.files if key.startswith("embedder_")
+            })
+            return self._state(embedder, data["ids"].tolist(), data["content_types"].tolist(), data["vectors"], mtime)
+
+    def _write(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as handle:
+            np.savez(
+                handle, ids=state["ids"], content_types=state["content_types"], vectors=state["vectors"],
+                embedder=np.array(state["embedder"].name),
+                **{f"embedder_{key}": value for key, value in state["embedder"].state().items()}
+            )
+        os.replace(temporary, self.path)
+        state["mtime"] = os.path.getmtime(self.path)
+        return state
+
+    def _rebuild(self, contents: List[Any]) -> Dict[str, Any]:
+        """Refit the embedder on the whole library and embed every article"""
+        texts = [content_text(content) for content in contents]
+        embedder = self.embedder.fit(texts)
+        vectors = embedder.embed_documents(texts)
+        return self._write(self._state(
+            embedder, [content.id for content in contents],
+            [(content.content_type or "").lower() for content in contents], vectors
+        ))
+
+    def _with_contents(self, state: Dict[str, Any], contents: List[Any]) -> Dict[str, Any]:
+        """``state`` plus new or re-embedded ``contents``, written to disk"""
+        ids, content_types = state["ids"].tolist(), state["content_types"].tolist()
+        rows = list(state["vectors"]) if ids else []
+        vectors = state["embedder"].embed_documents([content_text(content) for content in contents])
+        for content, vector in zip(contents, vectors):
+            content_type = (content.content_type or "").lower()
+            position = state["positions"].get(content.id)
+            if position is None:
+                ids.append(content.id)
+                content_types.append(content_type)
+                rows.append(vector)
+            else:
+                content_types[position] = content_type
+                rows[position] = vector
+        return self._write(self._state(state["embedder"], ids, content_types, np.array(rows, dtype=np.float32)))
+
+    async def _rebuild_from(self, db: AsyncSession) -> Dict[str, Any]:
+        result = await db.execute(select(EducationalContent))
+        return await asyncio.to_thread(self._rebuild, list(result.scalars().all()))
+
+    async def ensure_ready(self, db: AsyncSession) -> "ContentVectorIndex":
+        """Load the persisted index, embed content it is missing, and follow saves from other processes"""
+        if self.ready and not self._file_changed():
+            return self
+        async with self._lock:
+            if not self.ready:
+                state = await asyncio.to_thread(self._read)
+                result = await db.execute(select(EducationalContent.id))
+                content_ids = set(result.scalars().all())
+                if state is None or state["embedder"].needs_refit(len(content_ids)):
+                    state = await self._rebuild_from(db)
+                elif content_ids - set(state["positions"]):
+                    result = await db.execute(select(EducationalContent).where(
+                        EducationalContent.id.in_(sorted(content_ids - set(state["positions"])))
+                    ))
+                    state = await asyncio.to_thread(self._with_contents, state, list(result.scalars().all()))
+                self.__dict__.update(state)
+                self.ready = True
+            elif self._file_changed():
+                state = await asyncio.to_thread(self._read)
+                if state is not None:
+                    self.__dict__.update(state)
+        return self
+
+    async def add_content(self, db: AsyncSession, content: Any) -> bool:
+        """Embed new or edited content and persist the index.
+
+        Called after the content is committed, so a failure (embedder, disk)
+        is only counted: the index is marked unloaded and the next
+        ``ensure_ready`` embeds whatever content it is missing.
+        """
+        try:
+            await self.ensure_ready(db)
+            async with self._lock:
+                # Start from the latest file so vectors saved by other processes are kept
+                state = (await asyncio.to_thread(self._read) if self._file_changed() else None) or self._current()
+                if content.id not in state["positions"] and state["embedder"].needs_refit(len(state["ids"]) + 1):
+                    state = await self._rebuild_from(db)
+                else:
+                    state = await asyncio.to_thread(self._with_contents, state, [content])
+                self.__dict__.update(state)
+        except Exception:
+            self.errors += 1
+            self.ready = False
+            return False
+        return True
+
+    def _nearest(self, vector: np.ndarray, limit: int, content_type: Optional[str], exclude: Optional[int]) -> List[Tuple[int, float]]:
+        ids, vectors, positions = self.ids, self.vectors, self.positions
+        if not len(ids) or not vector.any():
+            return []
+        scores = vectors @ vector
+        allowed = np.ones(len(scores), dtype=bool)
+        if content_type:
+            allowed &= self.content_types == content_type.lower()
+        if exclude is not None and exclude in positions:
+            allowed[positions[exclude]] = False
+        # Orthogonal or opposite vectors share nothing with the query
+        allowed &= scores > 0
+        candidates = np.flatnonzero(allowed)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return list(zip(ids[candidates].tolist(), np.round(scores[candidates], 4).tolist()))
+
+    def search(self, query: str, limit: int = 10, content_type: Optional[str] = None) -> List[Tuple[int, float]]:
+        """(content id, cosine similarity) of the content closest to a free-text query"""
+        return self._nearest(self.embedder.embed_query(query), limit, content_type, None)
+
+    def related(self, content_id: int, limit: int = 5, content_type: Optional[str] = None) -> List[Tuple[int, float]]:
+        """(content id, cosine similarity) of the content closest to an indexed article"""
+        position = self.positions.get(content_id)
+        if position is None:
+            return []
+        return self._nearest(self.vectors[position], limit, content_type, content_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "embedder": self.embedder.name,
+            "documents": len(self.ids),
+            "dimensions": int(self.vectors.shape[1]) if len(self.ids) else 0,
+            "errors": self.errors
+        }
+
+content_vector_index = ContentVectorIndex()
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import EXERCISE_LIBRARY_TTL
+from .models import ExerciseDatabase
+from .tags import flatten_tags, normalize_tag
+
+# Equipment values that mean "bodyweight only"
+NO_EQUIPMENT = {"none", "bodyweight", "body_weight", "no_equipment"}
+
+# Words that say nothing about which body part a condition affects
+GENERIC_CONDITION_WORDS = {
+    "pain", "injury", "injuries", "injured", "recent", "chronic", "acute", "severe", "mild",
+    "issue", "issues", "problem", "problems", "condition", "history", "of", "and", "or", "the", "a"
+}
+
+def condition_terms(condition: str) -> Set[str]:
+    """Body parts/keywords of a condition ("knee pain" -> {"knee"}), or the whole tag if it has none"""
+    words = set(normalize_tag(condition).split("_")) - GENERIC_CONDITION_WORDS - {""}
+    return words or {normalize_tag(condition)}
+
+def _bitset(positions: List[int], size: int) -> int:
+    mask = np.zeros(size, dtype=bool)
+    mask[positions] = True
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+class ExerciseLibrary:
+    """In-memory index of exercise_database for filtering without table scans.
+
+    Exercises are held in name order; every category, equipment item,
+    difficulty, muscle group and contraindication keyword maps to a bitset
+    (a Python int, bit i = exercise i), so a multi-filter query is a handful
+    of ANDs/ORs over machine words. Each exercise's JSON is encoded once at
+    build time and pages are assembled from those bytes. ``etag`` is a hash
+    of the whole library, so clients can revalidate any query cheaply. The
+    index is rebuilt after EXERCISE_LIBRARY_TTL seconds or on ``invalidate``.
+    """
+
+    def __init__(self, ttl: float = EXERCISE_LIBRARY_TTL):
+        self.ttl = ttl
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.__dict__.update(self._build([]))
+
+    @staticmethod
+    def _build(rows: Iterable[Any]) -> Dict[str, Any]:
+        rows = sorted(rows, key=lambda row: (row.exercise_name.lower(), row.id))
+        exercises = [{
+            "id": row.id,
+            "name": row.exercise_name,
+            "category": row.category,
+            "muscle_groups": row.muscle_groups or [],
+            "equipment_needed": row.equipment_needed or [],
+            "difficulty_level": row.difficulty_level,
+            "instructions": row.instructions,
+            "safety_notes": row.safety_notes,
+            "modifications": row.modifications or [],
+            "contraindications": row.contraindications or [],
+            "calories_per_minute": row.calories_per_minute
+        } for row in rows]
+
+        postings: Dict[str, Dict[str, List[int]]] = {
+            "category": {}, "equipment": {}, "difficulty": {}, "muscle_group": {}, "contraindication": {}
+        }
+        for position, row in enumerate(rows):
+            values = {
+                "category": [normalize_tag(row.category)] if row.category else [],
+                "equipment": flatten_tags(row.equipment_needed),
+                "difficulty": [normalize_tag(row.difficulty_level)] if row.difficulty_level else [],
+                "muscle_group": flatten_tags(row.muscle_groups),
+                "contraindication": [
+                    term for condition in flatten_tags(row.contraindications) for term in condition_terms(condition)
+                ],
+            }
+            for dimension, tags in values.items():
+                for tag in set(tags):
+                    postings[dimension].setdefault(tag, []).append(position)
+
+        size = len(rows)
+        encoded = [json.dumps(exercise, separators=(",", ":"), default=str).encode() for exercise in exercises]
+        return {
+            "exercises": exercises,
+            "encoded": encoded,
+            "by_id": {exercise["id"]: position for position, exercise in enumerate(exercises)},
+            "by_name": {normalize_tag(exercise["name"]): position for position, exercise in enumerate(exercises)},
+            "bitsets": {
+                dimension: {tag: _bitset(positions, size) for tag, positions in tags.items()}
+                for dimension, tags in postings.items()
+            },
+            "all_bits": (1 << size) - 1,
+            "etag": '"%s"' % hashlib.sha256(b"\n".join(encoded)).hexdigest()[:20],
+        }
+
+    def __len__(self):
+        return len(self.exercises)
+
+    async def ensure_loaded(self, db: AsyncSession) -> "ExerciseLibrary":
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return self
+        async with self._lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl:
+                result = await db.execute(select(ExerciseDatabase))
+                state = await asyncio.to_thread(self._build, result.scalars().all())
+                self.__dict__.update(state)
+                self.loaded_at = time.monotonic()
+        return self
+
+    def load_rows(self, rows: Iterable[Any]):
+        self.__dict__.update(self._build(rows))
+        self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def _union(self, dimension: str, values: Iterable[str]) -> int:
+        bitsets = self.bitsets[dimension]
+        bits = 0
+        for value in values:
+            bits |= bitsets.get(normalize_tag(value), 0)
+        return bits
+
+    def contraindicated(self, conditions: Iterable[str]) -> int:
+        """Exercises contraindicated for any of the conditions ("knee pain" matches "knee injury")"""
+        return self._union("contraindication", [term for condition in conditions for term in condition_terms(condition)])
+
+    def select(
+        self,
+        category: Iterable[str] = (),
+        equipment: Iterable[str] = (),
+        difficulty: Iterable[str] = (),
+        muscle_groups: Iterable[str] = (),
+        available_equipment: Optional[Iterable[str]] = None,
+        exclude_conditions: Iterable[str] = ()
+    ) -> int:
+        """Bitset of exercises passing every filter; values within one filter are alternatives.
+
+        ``equipment`` keeps exercises using any of the items, while
+        ``available_equipment`` keeps those that need nothing else.
+        """
+        bits = self.all_bits
+        for dimension, values in (
+            ("category", category), ("equipment", equipment),
+            ("difficulty", difficulty), ("muscle_group", muscle_groups)
+        ):
+            values = list(values)
+            if values:
+                bits &= self._union(dimension, values)
+        if available_equipment is not None:
+            available = {normalize_tag(item) for item in available_equipment} | NO_EQUIPMENT
+            for item, item_bits in self.bitsets["equipment"].items():
+                if item not in available:
+                    bits &= ~item_bits
+        conditions = list(exclude_conditions)
+        if conditions:
+            bits &= ~self.contraindicated(conditions)
+        return bits
+
+    def positions(self, bits: int) -> np.ndarray:
+        """Positions (name order) of the set bits"""
+        size = len(self.exercises)
+        raw = np.frombuffer(bits.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder="little")[:size])
+
+    def page(self, bits: int, offset: int = 0, limit: int = 50) -> Tuple[int, List[int]]:
+        return bin(bits).count("1"), self.positions(bits)[offset:offset + limit].tolist()
+
+    def render_page(self, bits: int, offset: int = 0, limit: int = 50) -> bytes:
+        """JSON response body for one page, joined from the pre-encoded exercises"""
+        total, positions = self.page(bits, offset, limit)
+        exercises = b",".join(self.encoded[position] for position in positions)
+        return b'{"exercises":[%s],"total":%d,"offset":%d,"limit":%d}' % (exercises, total, offset, limit)
+
+    def find(self, name: str) -> Optional[int]:
+        return self.by_name.get(normalize_tag(name))
+
+exercise_library = ExerciseLibrary()
@@ -0,0 +1,265 @@
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exercise_library import ExerciseLibrary, condition_terms
+from .schemas import WorkoutSession
+from .tags import flatten_tags, normalize_tag
+
+DIFFICULTY_LEVELS = ["beginner", "intermediate", "advanced"]
+
+# (highest fatigue level on the 1-10 scale, share of planned volume kept)
+FATIGUE_VOLUME = [(5, 1.0), (6, 0.9), (8, 0.7), (10, 0.5)]
+# Sessions are made one level easier from this fatigue level up
+DOWNGRADE_FATIGUE = 7
+# Moods that take a further share off the volume
+LOW_MOODS = {"low", "sad", "down", "stressed", "anxious", "tired", "unmotivated"}
+LOW_MOOD_VOLUME = 0.9
+# Rest periods grow as volume shrinks, up to this factor
+MAX_REST_INCREASE = 1.5
+# Loads are eased when less than this share of volume is kept
+LOAD_VOLUME_THRESHOLD = 0.8
+LOAD_FACTOR = 0.9
+
+MAX_REPLACEMENT_CANDIDATES = 256
+
+def _number(value: Any, default: Optional[float] = None) -> Optional[float]:
+    if isinstance(value, bool):
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    # "nan"/"inf" parse as floats but cannot be scaled or clamped
+    return number if math.isfinite(number) else default
+
+def _list(value: Any) -> List[str]:
+    """Conditions as given: a single string, a comma separated string or a list"""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [str(item).strip() for item in value if item and str(item).strip() and normalize_tag(str(item)) not in ("none", "no")]
+
+def volume_factor(fatigue_level: int, mood: str) -> float:
+    factor = next(share for level, share in FATIGUE_VOLUME if fatigue_level <= level)
+    if normalize_tag(mood) in LOW_MOODS:
+        factor *= LOW_MOOD_VOLUME
+    return round(factor, 2)
+
+def _scaled_sets(sets: float, factor: float, per_set: Optional[float]) -> Tuple[int, float]:
+    """(new set count, multiplier for reps/duration per set) so their product keeps ``factor`` of the volume.
+
+    The cut is shared between sets and reps (or duration) instead of being
+    applied to both, which would square it.
+    """
+    if not per_set:
+        return max(1, round(sets * factor)), 1.0
+    scaled = max(1, round(sets * math.sqrt(factor)))
+    return scaled, sets * factor / scaled
+
+def _difficulty(value: Any, downgrade: bool) -> str:
+    level = normalize_tag(value) if value else "beginner"
+    index = DIFFICULTY_LEVELS.index(level) if level in DIFFICULTY_LEVELS else 0
+    return DIFFICULTY_LEVELS[max(0, index - 1) if downgrade else index]
+
+def _is_set(bits: int, position: int) -> bool:
+    return (bits >> position) & 1 == 1
+
+class WorkoutAdapter:
+    """Rule-based adaptation of a stored fitness plan to today's condition.
+
+    Volume (sets, reps, durations) is scaled by fatigue and mood, rest is
+    lengthened to match and loads are eased on heavy-fatigue days.
+    Exercises contraindicated by the injury status or mobility issues are
+    swapped for the library exercise sharing most muscle groups within the
+    same category, then for one of their ``modifications``, and dropped only
+    when neither is safe. Every library lookup is a bitset operation, so a
+    whole week adapts in a few milliseconds.
+    """
+
+    def __init__(self, library: ExerciseLibrary, conditions: List[str], equipment: Optional[List[str]]):
+        self.library = library
+        self.conditions = conditions
+        self.terms = {term for condition in conditions for term in condition_terms(condition)}
+        self.equipment = equipment
+        self.unsafe_for = {condition: library.contraindicated([condition]) for condition in conditions}
+        self.unsafe = 0
+        for bits in self.unsafe_for.values():
+            self.unsafe |= bits
+        self.report: Dict[str, List[Dict[str, Any]]] = {"replaced": [], "modified": [], "removed": [], "unverified": []}
+
+    def _mentions_condition(self, name: str) -> bool:
+        return bool(self.terms & set(normalize_tag(name).split("_")))
+
+    def _replacement(self, exercise: Dict[str, Any], difficulty: str, used: int) -> Optional[int]:
+        """Safe library exercise closest to ``exercise``, relaxing difficulty and then category"""
+        library = self.library
+        muscles = flatten_tags(exercise["muscle_groups"])
+        allowed = DIFFICULTY_LEVELS[:DIFFICULTY_LEVELS.index(difficulty) + 1]
+        categories = [exercise["category"]] if exercise["category"] else []
+        for category, difficulties in ((categories, allowed), (categories, []), ([], allowed)):
+            bits = library.select(category, (), difficulties, muscles, self.equipment, self.conditions) & ~used
+            if bits:
+                break
+        else:
+            return None
+
+        # Most shared muscle groups wins; name order breaks ties
+        muscle_bits = [library.bitsets["muscle_group"].get(normalize_tag(muscle), 0) for muscle in muscles]
+        best, best_score = None, -1
+        for position in library.positions(bits)[:MAX_REPLACEMENT_CANDIDATES].tolist():
+            score = sum(_is_set(bits_of, position) for bits_of in muscle_bits)
+            if score > best_score:
+                best, best_score = position, score
+        return best
+
+    def _modification(self, item: Dict[str, Any], known: Optional[Dict[str, Any]]) -> Optional[str]:
+        """First listed modification that is safe in the library, or unknown and not naming the condition"""
+        options = list(item.get("modifications") or []) + list((known or {}).get("modifications") or [])
+        fallback = None
+        for option in (str(option) for option in options if option):
+            position = self.library.find(option)
+            if position is not None:
+                if not _is_set(self.unsafe, position):
+                    return option
+            elif fallback is None and not self._mentions_condition(option):
+                fallback = option
+        return fallback
+
+    def _swap(self, item: Dict[str, Any], session: int, difficulty: str, used: int) -> Optional[Dict[str, Any]]:
+        library = self.library
+        name = str(item.get("name", ""))
+        position = library.find(name)
+        if position is None:
+            if self.conditions and self._mentions_condition(name):
+                self.report["removed"].append({"session": session, "exercise": name, "reason": "names an injured area"})
+                return None
+            if self.conditions:
+                self.report["unverified"].append({"session": session, "exercise": name})
+            return dict(item)
+        if not _is_set(self.unsafe, position):
+            return dict(item)
+
+        known = library.exercises[position]
+        reason = "contraindicated for " + ", ".join(
+            condition for condition, bits in self.unsafe_for.items() if _is_set(bits, position)
+        )
+        replacement = self._replacement(known, difficulty, used)
+        if replacement is not None:
+            exercise = library.exercises[replacement]
+            self.report["replaced"].append({"session": session, "exercise": name, "replacement": exercise["name"], "reason": reason})
+            return {
+                **item,
+                "name": exercise["name"],
+                "weight": None,
+                "notes": f"Replaces {name} ({reason}). {exercise['safety_notes'] or exercise['instructions'] or ''}".strip(),
+                "modifications": [str(option) for option in exercise["modifications"]]
+            }
+
+        option = self._modification(item, known)
+        if option is not None:
+            self.report["modified"].append({"session": session, "exercise": name, "replacement": option, "reason": reason})
+            return {
+                **item,
+                "name": option,
+                "weight": None,
+                "notes": f"Modified version of {name} ({reason}); stop if it causes pain.",
+                "modifications": []
+            }
+
+        self.report["removed"].append({"session": session, "exercise": name, "reason": reason})
+        return None
+
+    def adapt_session(self, session: Dict[str, Any], index: int, factor: float, downgrade: bool) -> Dict[str, Any]:
+        difficulty = _difficulty(session.get("difficulty_level"), downgrade)
+        rest_factor = min(1.0 / factor, MAX_REST_INCREASE)
+        items = [item for item in session.get("exercises") or [] if isinstance(item, dict)]
+        # Replacements never duplicate an exercise already in the session
+        used = 0
+        for item in items:
+            position = self.library.find(str(item.get("name", "")))
+            if position is not None:
+                used |= 1 << position
+
+        exercises = []
+        for item in items:
+            item = self._swap(item, index, difficulty, used)
+            if item is None:
+                continue
+            position = self.library.find(item["name"])
+            if position is not None:
+                used |= 1 << position
+
+            sets = _number(item.get("sets"), 1.0)
+            reps = _number(item.get("reps"))
+            duration = _number(item.get("duration"))
+            weight = _number(item.get("weight"))
+            scaled_sets, per_set = _scaled_sets(sets, factor, reps or duration)
+            exercises.append({
+                "name": item["name"],
+                "sets": scaled_sets,
+                "reps": max(1, round(reps * per_set)) if reps else None,
+                "duration": max(1, round(duration * per_set)) if duration else None,
+                "rest_time": round(_number(item.get("rest_time"), 60.0) * rest_factor),
+                "weight": round(weight * LOAD_FACTOR, 1) if weight and factor < LOAD_VOLUME_THRESHOLD else weight,
+                "notes": item.get("notes"),
+                "modifications": [str(option) for option in item.get("modifications") or []]
+            })
+
+        adapted = WorkoutSession(
+            session_type=str(session.get("session_type") or "strength"),
+            exercises=exercises,
+            estimated_duration=max(5, round(_number(session.get("estimated_duration"), 30.0) * factor)),
+            difficulty_level=difficulty,
+            warm_up=list(session.get("warm_up") or []),
+            cool_down=list(session.get("cool_down") or [])
+        ).model_dump()
+        if "day" in session:
+            adapted = {"day": session["day"], **adapted}
+        return adapted
+
+def adapt_fitness_plan(
+    library: ExerciseLibrary,
+    plan_data: List[Dict[str, Any]],
+    adaptations: Dict[str, Any],
+    profile: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Adapt the sessions of a stored plan to today's fatigue, mood and injuries.
+
+    Returns the adapted sessions (valid ``WorkoutSession`` data, with the
+    original ``day`` kept) and a report of the rules that were applied.
+    """
+    fatigue = int(min(max(_number(adaptations.get("fatigue_level"), 5.0), 1), 10))
+    mood = str(adaptations.get("mood") or "neutral")
+    conditions = _list(adaptations.get("injury_status"))
+    conditions += [condition for condition in _list(profile.get("mobility_issues")) if condition not in conditions]
+    equipment = flatten_tags(profile.get("equipment_access")) or None
+
+    factor = volume_factor(fatigue, mood)
+    downgrade = fatigue >= DOWNGRADE_FATIGUE
+    adapter = WorkoutAdapter(library, conditions, equipment)
+    sessions = [
+        adapter.adapt_session(session, index, factor, downgrade)
+        for index, session in enumerate(plan_data or [])
+        if isinstance(session, dict)
+    ]
+    report = {
+        "fatigue_level": fatigue,
+        "mood": mood,
+        "volume_factor": factor,
+        "difficulty_reduced": downgrade,
+        "conditions": conditions,
+        **adapter.report
+    }
+    return sessions, report
+
+def summarize_adaptation(report: Dict[str, Any]) -> str:
+    parts = []
+    if report["volume_factor"] < 1:
+        parts.append(f"volume reduced to {round(report['volume_factor'] * 100)}% for fatigue {report['fatigue_level']}/10")
+    if report["difficulty_reduced"]:
+        parts.append("difficulty lowered one level")
+    for key, label in (("replaced", "replaced"), ("modified", "modified"), ("removed", "removed")):
+        if report[key]:
+            parts.append(f"{len(report[key])} exercise(s) {label} for {', '.join(report['conditions'])}")
+    return ("Plan adapted: " + "; ".join(parts)) if parts else "No changes needed for current conditions"
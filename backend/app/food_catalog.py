@@ -0,0 +1,251 @@
+import asyncio
+import re
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import FOOD_CATALOG_TTL, FOOD_CATALOG_REFRESH_INTERVAL
+from .models import FoodDatabase
+from .tags import normalize_tag, normalize_tags
+
+# Per-100g nutrient vector layout shared by every catalog consumer
+NUTRIENT_KEYS = ("calories", "protein", "carbs", "fat", "fiber")
+NUTRIENT_ALIASES = {
+    "calories": ("calories", "energy", "energy_kcal", "kcal"),
+    "protein": ("protein", "protein_g"),
+    "carbs": ("carbs", "carbohydrates", "carbohydrate", "carbs_g"),
+    "fat": ("fat", "total_fat", "fat_g"),
+    "fiber": ("fiber", "fibre", "dietary_fiber", "fiber_g"),
+}
+
+# Diets expressed as the allergens/categories a compatible food must not have
+DIET_EXCLUSIONS = {
+    "vegan": {"dairy", "milk", "eggs", "egg", "meat", "poultry", "fish", "shellfish", "honey", "gelatin"},
+    "vegetarian": {"meat", "poultry", "fish", "shellfish", "gelatin"},
+    "pescatarian": {"meat", "poultry"},
+    "gluten_free": {"gluten", "wheat"},
+    "dairy_free": {"dairy", "milk", "lactose"},
+    "lactose_free": {"lactose", "dairy", "milk"},
+    "nut_free": {"nuts", "tree_nuts", "peanuts"},
+    "keto": {"sugar", "grains"},
+}
+
+# Allergy names (as users write them) -> every allergen/category tag that means them.
+# Importer tags are plural ("eggs", "peanuts", "tree_nuts") and dairy is tagged "milk".
+ALLERGEN_SYNONYMS = {
+    "dairy": {"dairy", "milk", "lactose"},
+    "milk": {"dairy", "milk", "lactose"},
+    "lactose": {"dairy", "milk", "lactose"},
+    "egg": {"egg", "eggs"},
+    "nut": {"nuts", "tree_nuts", "peanuts"},
+    "tree_nut": {"nuts", "tree_nuts"},
+    "peanut": {"peanuts"},
+    "gluten": {"gluten", "wheat"},
+    "wheat": {"wheat", "gluten"},
+    "soya": {"soy"},
+    "seafood": {"fish", "shellfish"},
+    "shellfish": {"shellfish"},
+}
+
+def allergen_tags(allergen: str) -> Set[str]:
+    """Tags a food must not carry for someone allergic to ``allergen`` ("Eggs" -> {"egg", "eggs"})"""
+    tag = normalize_tag(allergen)
+    plural = tag.endswith("s") and not tag.endswith("ss")
+    singular = tag[:-1] if plural else tag
+    return {tag, singular if plural else tag + "s"} | ALLERGEN_SYNONYMS.get(tag, set()) | ALLERGEN_SYNONYMS.get(singular, set())
+
+def normalize_food_name(name: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9 ]+", " ", name.lower()).split())
+
+def nutrient_vector(data: Optional[Dict[str, Any]]) -> np.ndarray:
+    """Per-100g nutrient vector in NUTRIENT_KEYS order; missing values are 0"""
+    data = data or {}
+    # Accept both flat records and the {"calories": .., "macros": {...}} shape used by meal plans
+    flat = {**data, **data["macros"]} if isinstance(data.get("macros"), dict) else data
+    vector = np.zeros(len(NUTRIENT_KEYS))
+    for position, key in enumerate(NUTRIENT_KEYS):
+        for alias in NUTRIENT_ALIASES[key]:
+            value = flat.get(alias)
+            if isinstance(value, (int, float)):
+                vector[position] = value
+                break
+    return vector
+
+CATALOG_COLUMNS = (
+    FoodDatabase.id, FoodDatabase.food_code, FoodDatabase.food_name, FoodDatabase.category,
+    FoodDatabase.nutritional_data, FoodDatabase.allergen_info,
+    FoodDatabase.cultural_tags, FoodDatabase.substitutes
+)
+
+class FoodCatalog:
+    """In-memory, read-mostly snapshot of food_database.
+
+    Rows are held column-wise: parallel Python lists for names and tags and
+    one float matrix of per-100g nutrients, so lookups and similarity ranking
+    never touch the database. Rows added since the last load are appended
+    every FOOD_CATALOG_REFRESH_INTERVAL seconds; the whole snapshot is
+    reloaded after FOOD_CATALOG_TTL seconds or when ``invalidate`` is called
+    after an update. Snapshots are built off the event loop and swapped in
+    at once, so readers never see a half-built catalog.
+    """
+
+    def __init__(self, ttl: float = FOOD_CATALOG_TTL, refresh_interval: float = FOOD_CATALOG_REFRESH_INTERVAL):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.loaded_at: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+        # Bumped on every full load; appends keep the version
+        self.version = 0
+        self._lock = asyncio.Lock()
+        self.__dict__.update(self._build([]))
+
+    def _build(self, rows: Iterable[Any], extend: bool = False) -> Dict[str, Any]:
+        """Catalog attributes for ``rows``, appended to the current ones when ``extend``"""
+        rows = list(rows)
+        columns = {
+            "ids": [row.id for row in rows],
+            "codes": [row.food_code for row in rows],
+            "names": [row.food_name for row in rows],
+            "categories": [normalize_tag(row.category) if row.category else "" for row in rows],
+            "allergens": [set(normalize_tags(row.allergen_info)) for row in rows],
+            "cultural_tags": [set(normalize_tags(row.cultural_tags)) for row in rows],
+            "substitutes": [[str(name) for name in (row.substitutes or [])] for row in rows],
+        }
+        nutrients = (
+            np.vstack([nutrient_vector(row.nutritional_data) for row in rows])
+            if rows else np.zeros((0, len(NUTRIENT_KEYS)))
+        )
+        offset = 0
+        by_name: Dict[str, int] = {}
+        by_code: Dict[str, int] = {}
+        if extend:
+            offset = len(self.ids)
+            # New lists rather than in-place appends: readers keep a consistent view
+            columns = {key: getattr(self, key) + values for key, values in columns.items()}
+            nutrients = np.vstack([self.nutrients, nutrients])
+            by_name = dict(self.by_name)
+            by_code = dict(self.by_code)
+
+        state = dict(columns, nutrients=nutrients)
+        category_codes: Dict[str, int] = {}
+        state["category_codes"] = np.array(
+            [category_codes.setdefault(category, len(category_codes)) if category else -1 for category in columns["categories"]],
+            dtype=np.int64
+        )
+        # Nutrients divided by their catalog-wide spread, so calories (in the
+        # hundreds) do not drown out grams of fibre in similarity comparisons
+        scale = nutrients.std(axis=0) if len(nutrients) else np.ones(len(NUTRIENT_KEYS))
+        scale[scale == 0] = 1.0
+        state["scaled_nutrients"] = nutrients / scale
+        for position in range(offset, len(columns["ids"])):
+            by_name.setdefault(normalize_food_name(columns["names"][position]), position)
+            if columns["codes"][position]:
+                by_code.setdefault(columns["codes"][position], position)
+        state["by_name"] = by_name
+        state["by_code"] = by_code
+        state["_exclusion_masks"] = {}
+        state["_cultural_masks"] = {}
+        return state
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def max_id(self) -> int:
+        return self.ids[-1] if self.ids else 0
+
+    def load_rows(self, rows: Iterable[Any]):
+        self.__dict__.update(self._build(rows))
+        self.loaded_at = self.refreshed_at = time.monotonic()
+        self.version += 1
+
+    def append_rows(self, rows: Iterable[Any]):
+        self.__dict__.update(self._build(rows, extend=True))
+        self.refreshed_at = time.monotonic()
+
+    def is_current(self) -> bool:
+        now = time.monotonic()
+        return (
+            self.loaded_at is not None
+            and now - self.loaded_at < self.ttl
+            and now - self.refreshed_at < self.refresh_interval
+        )
+
+    async def ensure_loaded(self, db: AsyncSession) -> "FoodCatalog":
+        if self.is_current():
+            return self
+        async with self._lock:
+            now = time.monotonic()
+            if self.loaded_at is None or now - self.loaded_at >= self.ttl:
+                result = await db.execute(select(*CATALOG_COLUMNS).order_by(FoodDatabase.id))
+                state = await asyncio.to_thread(self._build, result.all())
+                self.__dict__.update(state)
+                self.loaded_at = self.refreshed_at = time.monotonic()
+                self.version += 1
+            elif now - self.refreshed_at >= self.refresh_interval:
+                # Ids only grow, so new rows are the ones past the highest loaded id
+                result = await db.execute(
+                    select(*CATALOG_COLUMNS).where(FoodDatabase.id > self.max_id).order_by(FoodDatabase.id)
+                )
+                rows = result.all()
+                if rows:
+                    self.__dict__.update(await asyncio.to_thread(self._build, rows, True))
+                self.refreshed_at = time.monotonic()
+        return self
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def find_code(self, food_code: str) -> Optional[int]:
+        return self.by_code.get(food_code)
+
+    def find(self, name: str) -> Optional[int]:
+        """Catalog position of a food by name, tolerating case, punctuation and a plural 's'"""
+        key = normalize_food_name(name)
+        position = self.by_name.get(key)
+        if position is None and key.endswith("s"):
+            position = self.by_name.get(key[:-1])
+        return position
+
+    @staticmethod
+    def understands(restriction: str) -> bool:
+        """Whether a restriction can be checked against allergen/category data"""
+        restriction = normalize_tag(restriction)
+        return restriction.startswith("no_") or restriction in DIET_EXCLUSIONS
+
+    def exclusion_mask(self, restriction: str) -> np.ndarray:
+        """Boolean mask of foods that violate a restriction ("vegan", "no_peanuts", ...)"""
+        restriction = normalize_tag(restriction)
+        mask = self._exclusion_masks.get(restriction)
+        if mask is None:
+            if restriction.startswith("no_"):
+                excluded = allergen_tags(restriction[3:])
+            else:
+                excluded = DIET_EXCLUSIONS.get(restriction, set())
+            mask = np.array([
+                bool(excluded & allergens) or category in excluded
+                for allergens, category in zip(self.allergens, self.categories)
+            ], dtype=bool)
+            self._exclusion_masks[restriction] = mask
+        return mask
+
+    def cultural_mask(self, culture: str) -> np.ndarray:
+        """Boolean mask of foods tagged with a cuisine/culture"""
+        culture = normalize_tag(culture)
+        mask = self._cultural_masks.get(culture)
+        if mask is None:
+            mask = np.array([culture in tags for tags in self.cultural_tags], dtype=bool)
+            self._cultural_masks[culture] = mask
+        return mask
+
+    def compatible_mask(self, restrictions: Iterable[str]) -> np.ndarray:
+        """Foods that satisfy every restriction"""
+        mask = np.ones(len(self), dtype=bool)
+        for restriction in restrictions:
+            mask &= ~self.exclusion_mask(restriction)
+        return mask
+
+food_catalog = FoodCatalog()
@@ -0,0 +1,260 @@
+import asyncio
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal
+from .food_catalog import FoodCatalog, NUTRIENT_KEYS, food_catalog, normalize_food_name
+from .tags import normalize_tag
+
+# Normalized names only contain [a-z0-9 ]; "\n" separates names when trigrams are built in bulk
+ALPHABET = " abcdefghijklmnopqrstuvwxyz0123456789\n"
+SEPARATOR = len(ALPHABET) - 1
+_CODES = np.full(256, SEPARATOR, dtype=np.int64)
+_CODES[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(len(ALPHABET))
+TRIGRAMS = len(ALPHABET) ** 3
+
+# Sorts after every character a normalized name can contain
+PREFIX_END = "{"
+
+# Catalog columns the index reads results from; kept per build so a catalog
+# reload cannot shift positions under an index that is still serving
+SNAPSHOT_COLUMNS = ("ids", "codes", "names", "categories", "allergens", "nutrients", "by_code")
+
+MAX_PREFIX_SCAN = 2048      # sorted-prefix entries examined per query term
+MAX_DELTA = 1000            # foods appended since the last build before the index is rebuilt
+MIN_FUZZY_SCORE = 0.6       # share of query trigrams a typo match must contain
+COMMON_TRIGRAM_SHARE = 0.2  # trigrams in more than this share of foods carry little signal for typos
+
+def _encode(text: str) -> np.ndarray:
+    return _CODES[np.frombuffer(text.encode("ascii", "ignore"), dtype=np.uint8)]
+
+def _trigrams(codes: np.ndarray) -> np.ndarray:
+    """Trigram code of every 3-character window, -1 where a window spans a separator"""
+    if len(codes) < 3:
+        return np.zeros(0, dtype=np.int64)
+    windows = (codes[:-2] * len(ALPHABET) + codes[1:-1]) * len(ALPHABET) + codes[2:]
+    spans = (codes[:-2] == SEPARATOR) | (codes[1:-1] == SEPARATOR) | (codes[2:] == SEPARATOR)
+    return np.where(spans, -1, windows)
+
+class FoodSearchIndex:
+    """Typeahead search over the food catalog.
+
+    Prefix matches come from a sorted array of (word, name length, position)
+    entries, so each query term is two bisections and a bounded scan. Typos
+    are matched through a trigram inverted index held as CSR arrays
+    (trigram -> catalog positions) and counted in one vectorized pass.
+    Foods appended to the catalog since the last build sit in a small delta
+    that is prefix-matched linearly until it reaches MAX_DELTA; catalog
+    reloads rebuild the index in a worker thread while the previous build
+    keeps serving.
+    """
+
+    def __init__(self, catalog: FoodCatalog):
+        self.catalog = catalog
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.__dict__.update(self._build({key: getattr(catalog, key) for key in SNAPSHOT_COLUMNS}, -1))
+
+    @staticmethod
+    def _build(columns: Dict[str, Any], version: int) -> Dict[str, Any]:
+        normalized = [normalize_food_name(name) for name in columns["names"]]
+        count = len(normalized)
+        words, leading, lengths, owners = [], [], [], []
+        for position, name in enumerate(normalized):
+            split = name.split()
+            words += split
+            leading += [True] + [False] * (len(split) - 1)
+            lengths += [len(name)] * len(split)
+            owners += [position] * len(split)
+        # Sorted by word; within a word, names that start with it and shorter names first
+        leading = np.array(leading, dtype=bool)
+        lengths = np.array(lengths, dtype=np.int32)
+        owners = np.array(owners, dtype=np.int64)
+        words = np.array(words, dtype=str)
+        order = np.lexsort((owners, lengths, ~leading, words))
+
+        # Trigrams of " name " for every food in one pass, deduplicated per food
+        codes = _encode("\n".join(f" {name} " for name in normalized))
+        windows = _trigrams(codes)
+        valid = windows >= 0
+        stride = max(count, 1)
+        window_owners = np.cumsum(codes == SEPARATOR)[:len(windows)]
+        pairs = np.sort(windows[valid] * stride + window_owners[valid])
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))] if len(pairs) else pairs
+        positions = pairs % stride
+        return {
+            "columns": columns,
+            "built_version": version,
+            "size": count,
+            "normalized": normalized,
+            "category_array": np.array(columns["categories"], dtype=str),
+            "prefix_keys": words[order].tolist(),
+            "prefix_leading": leading[order],
+            "prefix_lengths": lengths[order],
+            "prefix_positions": owners[order],
+            "trigram_offsets": np.searchsorted(pairs // stride, np.arange(TRIGRAMS + 1)),
+            "trigram_positions": positions,
+            "trigram_counts": np.bincount(positions, minlength=count),
+        }
+
+    def _needs_rebuild(self) -> bool:
+        return self.built_version != self.catalog.version or len(self.catalog) - self.size > MAX_DELTA
+
+    def _sync_delta(self):
+        """Adopt rows the catalog appended since the build (positions are stable within a version)"""
+        if self.built_version == self.catalog.version and len(self.catalog) > len(self.normalized):
+            self.normalized = self.normalized + [
+                normalize_food_name(name) for name in self.catalog.names[len(self.normalized):]
+            ]
+            self.columns = {key: getattr(self.catalog, key) for key in SNAPSHOT_COLUMNS}
+
+    async def _rebuild(self):
+        async with self._lock:
+            if self._needs_rebuild():
+                columns = {key: getattr(self.catalog, key) for key in SNAPSHOT_COLUMNS}
+                state = await asyncio.to_thread(self._build, columns, self.catalog.version)
+                self.__dict__.update(state)
+            self._sync_delta()
+
+    async def _refresh(self):
+        async with AsyncSessionLocal() as db:
+            await self.catalog.ensure_loaded(db)
+        await self._rebuild()
+
+    async def ensure_ready(self, db: AsyncSession) -> "FoodSearchIndex":
+        """Build on first use; afterwards catalog refreshes and rebuilds run in the background"""
+        if self.built_version < 0:
+            await self.catalog.ensure_loaded(db)
+            await self._rebuild()
+        elif not self.catalog.is_current() or self._needs_rebuild():
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh())
+        self._sync_delta()
+        return self
+
+    def _prefix_range(self, term: str) -> Tuple[int, int]:
+        start = bisect.bisect_left(self.prefix_keys, term)
+        return start, bisect.bisect_left(self.prefix_keys, term + PREFIX_END, start)
+
+    def _allowed(self, position: int, category: Optional[str], excluded: set) -> bool:
+        return (
+            (not category or self.columns["categories"][position] == category)
+            and not (excluded & self.columns["allergens"][position])
+        )
+
+    def _prefix_matches(self, terms: List[str], phrase: str, category: Optional[str], excluded: set, limit: int) -> List[int]:
+        # The term with the fewest entries drives the scan, best-ranked entries first
+        ranges = [self._prefix_range(term) for term in terms]
+        start, end = min(ranges, key=lambda bounds: bounds[1] - bounds[0])
+        end = min(end, start + MAX_PREFIX_SCAN)
+        order = start + np.lexsort((self.prefix_lengths[start:end], ~self.prefix_leading[start:end]))
+        positions = self.prefix_positions[order]
+        if category:
+            positions = positions[self.category_array[positions] == category]
+        candidates = positions.tolist() + list(range(self.size, len(self.normalized)))
+
+        # Every term must start some word of the name: " term" within " name"
+        needles = [f" {term}" for term in terms]
+        matches = []
+        seen = set()
+        for position in candidates:
+            if position in seen:
+                continue
+            seen.add(position)
+            name = f" {self.normalized[position]}"
+            if all(needle in name for needle in needles) and self._allowed(position, category, excluded):
+                matches.append(position)
+                if len(matches) == limit:
+                    break
+        # Names starting with the whole query first, then shorter (more generic) names
+        matches.sort(key=lambda position: (not self.normalized[position].startswith(phrase), len(self.normalized[position])))
+        return matches
+
+    def _fuzzy_matches(self, phrase: str, category: Optional[str], excluded: set, limit: int, skip: set) -> List[int]:
+        # No trailing pad: the last word of a typeahead query is usually incomplete
+        query = set(_trigrams(_encode(f" {phrase}")).tolist()) - {-1}
+        if not query or not self.size:
+            return []
+        postings = [
+            self.trigram_positions[self.trigram_offsets[code]:self.trigram_offsets[code + 1]]
+            for code in query
+        ]
+        # Drop very common trigrams unless they make up most of the query
+        selective = [posting for posting in postings if len(posting) <= COMMON_TRIGRAM_SHARE * self.size]
+        if len(selective) >= len(postings) / 2:
+            postings = selective
+
+        # Score is the share of query trigrams found in the name, so long
+        # descriptive names are not penalised; shorter names break ties
+        shared = np.bincount(np.concatenate(postings), minlength=self.size)
+        hits = np.flatnonzero(shared >= max(1, int(np.ceil(MIN_FUZZY_SCORE * len(postings)))))
+        if category:
+            hits = hits[self.category_array[hits] == category]
+        rank = self.trigram_counts[hits] - shared[hits] * TRIGRAMS
+        # Only the best few need ordering; widen the window when filters reject too many
+        wanted = (limit + len(skip)) * 4
+        while True:
+            top = np.argpartition(rank, wanted - 1)[:wanted] if wanted < len(hits) else np.arange(len(hits))
+            matches = []
+            for position in hits[top[np.argsort(rank[top], kind="stable")]].tolist():
+                if position not in skip and self._allowed(position, category, excluded):
+                    matches.append(position)
+                    if len(matches) == limit:
+                        return matches
+            if wanted >= len(hits):
+                return matches
+            wanted *= 8
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        category: Optional[str] = None,
+        exclude_allergens: Iterable[str] = ()
+    ) -> List[Dict[str, Any]]:
+        """Foods whose name words start with every query term, topped up with typo-tolerant matches"""
+        phrase = normalize_food_name(query)
+        terms = phrase.split()
+        if not terms:
+            return []
+        category = normalize_tag(category) if category else None
+        excluded = {normalize_tag(allergen) for allergen in exclude_allergens}
+
+        prefix = self._prefix_matches(terms, phrase, category, excluded, limit)
+        fuzzy = []
+        if len(prefix) < limit:
+            fuzzy = self._fuzzy_matches(phrase, category, excluded, limit - len(prefix), set(prefix))
+        return [self.describe(position, "prefix") for position in prefix] + [self.describe(position, "fuzzy") for position in fuzzy]
+
+    def lookup(self, food_code: str) -> Optional[Dict[str, Any]]:
+        """O(1) lookup by USDA food code"""
+        position = self.columns["by_code"].get(food_code)
+        return None if position is None else self.describe(position)
+
+    def describe(self, position: int, match: Optional[str] = None) -> Dict[str, Any]:
+        columns = self.columns
+        result = {
+            "id": columns["ids"][position],
+            "food_code": columns["codes"][position],
+            "food_name": columns["names"][position],
+            "category": columns["categories"][position] or None,
+            "allergens": sorted(columns["allergens"][position]),
+            "nutrients_per_100g": dict(zip(NUTRIENT_KEYS, np.round(columns["nutrients"][position], 1).tolist())),
+        }
+        if match:
+            result["match"] = match
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "foods": len(self.normalized),
+            "indexed": self.size,
+            "delta": len(self.normalized) - self.size,
+            "prefix_entries": len(self.prefix_keys),
+            "catalog_version": self.built_version
+        }
+
+food_search_index = FoodSearchIndex(food_catalog)
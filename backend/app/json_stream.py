@@ -0,0 +1,149 @@
+import json
+import re
+from typing import Any, Iterator, List, Optional, TextIO
+
+_decoder = json.JSONDecoder()
+
+class JSONArrayItemExtractor:
+    """Incrementally pull completed items out of one array in a streamed JSON document.
+
+    Feed it text chunks as they arrive (e.g. LLM tokens); every object or
+    array element of the top-level ``key`` array is returned by ``feed`` as
+    soon as its closing bracket is seen. Text before the root object, such as
+    a model preamble, is ignored. Only the text of the item currently being
+    read is kept, so memory stays bounded by the largest item.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key_chars: List[str] = []
+        self._last_string: Optional[str] = None
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None  # depth inside the target array, once entered
+        self._finished = False
+        self._item: List[str] = []  # chunks of the item being read
+        self._item_start: Optional[int] = None
+
+    @property
+    def finished(self) -> bool:
+        """True once the target array has been closed"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        items = []
+        if self._finished:
+            return items
+
+        for position, char in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = "".join(self._key_chars)
+                elif self._depth == 1:
+                    self._key_chars.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._key_chars = []
+            elif char == ":" and self._depth == 1:
+                self._last_key = self._last_string
+            elif char in "{[":
+                if self._array_depth is None and char == "[" and self._depth == 1 and self._last_key == self.key:
+                    self._array_depth = 2
+                elif self._array_depth is not None and self._depth == self._array_depth:
+                    self._item_start = position
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if self._depth == self._array_depth and self._item_start is not None:
+                        self._item.append(chunk[self._item_start:position + 1])
+                        self._item_start = None
+                        try:
+                            items.append(json.loads("".join(self._item)))
+                        except ValueError:
+                            pass
+                        self._item = []
+                    elif self._depth == self._array_depth - 1:
+                        self._finished = True
+                        return items
+            elif char == "," and self._depth == 1:
+                self._last_key = None
+
+        # Carry the unfinished item over to the next chunk
+        if self._item_start is not None:
+            self._item.append(chunk[self._item_start:])
+            self._item_start = 0
+
+        return items
+
+# Characters that may follow a complete array item
+_ITEM_END = " \t\r\n,]"
+
+def _scalar_complete(item: Any, buffer: str, end: int) -> bool:
+    """Whether a decoded item cannot still be growing at the end of the buffer.
+
+    Objects, arrays and strings end with their own closing character. A
+    number is only known to be complete once a delimiter follows it: "1."
+    decodes as 1 when "5" is still to come.
+    """
+    return isinstance(item, (dict, list, str)) or (end < len(buffer) and buffer[end] in _ITEM_END)
+
+def iter_json_array(handle: TextIO, key: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """Items of the ``key`` array of a large JSON file, decoded one at a time.
+
+    For files rather than token streams: each item is decoded by the C JSON
+    decoder straight from a sliding buffer, so memory stays around one chunk
+    and throughput is far above the character-level extractor. The array is
+    found by the first ``"key": [`` in the document.
+    """
+    pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ""
+    position = None
+    while position is None:
+        chunk = handle.read(chunk_size)
+        if not chunk:
+            return
+        buffer += chunk
+        match = pattern.search(buffer)
+        if match:
+            position = match.end()
+        else:
+            # Keep a tail in case the key straddles two chunks
+            buffer = buffer[-(len(key) + 64):]
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            if position == len(buffer):
+                raise ValueError("buffer exhausted")
+            item, end = _decoder.raw_decode(buffer, position)
+            if not _scalar_complete(item, buffer, end):
+                raise ValueError("item may be truncated")
+        except ValueError:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                if position == len(buffer):
+                    return
+                item, end = _decoder.raw_decode(buffer, position)
+                if end < len(buffer) and not _scalar_complete(item, buffer, end):
+                    raise json.JSONDecodeError("Unexpected character after array item", buffer, end)
+            else:
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+        yield item
+        position = end
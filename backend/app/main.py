@@ -2,13 +2,19 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
+import asyncio
 
-from .config import CORS_ORIGINS, ENVIRONMENT
-from .database import engine, Base
-from .routers import auth, nutrition, fitness, progress, education, trainers
+from .config import CORS_ORIGINS, ENVIRONMENT, PASSWORD_HASH_TARGET_MS, PASSWORD_HASH_ROUNDS
+from .database import async_engine, AsyncSessionLocal
+from .food_search import food_search_index
+from .exercise_library import exercise_library
+from .embeddings import content_vector_index
+from .view_counter import view_counter
+from .password_hashing import password_hasher
+from .plan_jobs import plan_job_queue
+from .routers import auth, nutrition, fitness, progress, education, trainers, admin
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Database schema is managed by Alembic: run `alembic upgrade head` from backend/
 
 # Create FastAPI app
 app = FastAPI(
@@ -35,6 +41,28 @@ app.include_router(fitness.router, prefix="/api/v1")
 app.include_router(progress.router, prefix="/api/v1")
 app.include_router(education.router, prefix="/api/v1")
 app.include_router(trainers.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
+
+@app.on_event("startup")
+async def startup():
+    if PASSWORD_HASH_ROUNDS > 0 or PASSWORD_HASH_TARGET_MS > 0:
+        await asyncio.to_thread(password_hasher.calibrate, PASSWORD_HASH_TARGET_MS)
+    plan_job_queue.start()
+    await plan_job_queue.recover()
+    view_counter.start()
+    # Build the food search, exercise and content embedding indexes before serving requests
+    async with AsyncSessionLocal() as db:
+        await food_search_index.ensure_ready(db)
+        await exercise_library.ensure_loaded(db)
+        await content_vector_index.ensure_ready(db)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await plan_job_queue.stop()
+    # Write back buffered view counts before the engine goes away
+    await view_counter.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,192 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .food_catalog import FoodCatalog, NUTRIENT_KEYS
+
+ACTIVITY_FACTORS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "lightly_active": 1.375,
+    "moderate": 1.55,
+    "moderately_active": 1.55,
+    "active": 1.725,
+    "very_active": 1.9,
+}
+
+# Share of calories from protein / carbs / fat by primary goal
+MACRO_SPLITS = {
+    "weight_loss": (0.30, 0.40, 0.30),
+    "muscle_gain": (0.30, 0.45, 0.25),
+    "maintenance": (0.25, 0.50, 0.25),
+}
+CALORIE_ADJUSTMENTS = {"weight_loss": -500, "muscle_gain": 300}
+KCAL_PER_GRAM = np.array([4.0, 4.0, 9.0])  # protein, carbs, fat
+
+# Meal type -> share of daily calories and the food groups each meal is built from
+MEAL_LAYOUTS = {
+    3: [("breakfast", 0.25), ("lunch", 0.35), ("dinner", 0.40)],
+    4: [("breakfast", 0.25), ("lunch", 0.30), ("snack", 0.10), ("dinner", 0.35)],
+    5: [("breakfast", 0.20), ("snack", 0.10), ("lunch", 0.30), ("snack", 0.10), ("dinner", 0.30)],
+}
+MEAL_GROUPS = {
+    "breakfast": ("carbs", "protein", "produce"),
+    "lunch": ("protein", "carbs", "produce", "fat"),
+    "dinner": ("protein", "carbs", "produce", "fat"),
+    "snack": ("produce", "protein"),
+}
+
+MIN_PORTION = 15.0   # grams
+MAX_PORTION = 400.0  # grams
+
+def daily_targets(user_profile: Dict[str, Any], request_data: Dict[str, Any]) -> np.ndarray:
+    """Daily calories, protein, carbs, fat and fibre (g) for the profile, in NUTRIENT_KEYS order"""
+    goal = (user_profile.get("primary_goal") or "maintenance").lower()
+    calories = request_data.get("calorie_target")
+    if not calories:
+        weight = user_profile.get("weight") or 70
+        height = user_profile.get("height") or 170
+        age = user_profile.get("age") or 35
+        # Mifflin-St Jeor resting energy, scaled by activity
+        bmr = 10 * weight + 6.25 * height - 5 * age + (5 if (user_profile.get("gender") or "").lower() == "male" else -161)
+        factor = ACTIVITY_FACTORS.get((user_profile.get("activity_level") or "").lower(), 1.375)
+        calories = max(bmr * factor + CALORIE_ADJUSTMENTS.get(goal, 0), 1200)
+
+    split = np.array(MACRO_SPLITS.get(goal, MACRO_SPLITS["maintenance"]))
+    macros = calories * split / KCAL_PER_GRAM
+    fiber = 14 * calories / 1000  # 14g per 1000 kcal
+    return np.array([calories, *macros, fiber])
+
+def _food_groups(nutrients: np.ndarray) -> np.ndarray:
+    """Label each food protein/carbs/fat by its dominant energy source, or produce for light, fibrous foods"""
+    energy = nutrients[:, 1:4] * KCAL_PER_GRAM
+    groups = np.array(["protein", "carbs", "fat"])[np.argmax(energy, axis=1)]
+    produce = (nutrients[:, 0] < 100) & (nutrients[:, 4] >= 1.5)
+    return np.where(produce, "produce", groups)
+
+def _restrictions(user_profile: Dict[str, Any], catalog: FoodCatalog) -> List[str]:
+    restrictions = [f"no_{allergen}" for allergen in user_profile.get("allergies") or []]
+    restrictions += [diet for diet in user_profile.get("dietary_preferences") or [] if catalog.understands(diet)]
+    return restrictions
+
+def solve_portions(nutrients: np.ndarray, targets: np.ndarray, weights: np.ndarray, iterations: int = 50) -> np.ndarray:
+    """Bounded least squares for a batch of meals.
+
+    ``nutrients`` is (meals, foods, nutrients) per gram and ``targets`` is
+    (meals, nutrients). Minimises the weighted squared error of the meal
+    totals with portions kept within [MIN_PORTION, MAX_PORTION]: a ridge
+    solution of the normal equations, refined by projected gradient steps.
+    """
+    A = np.transpose(nutrients, (0, 2, 1)) * weights[None, :, None]  # (meals, nutrients, foods)
+    b = targets * weights[None, :]
+    AtA = A.transpose(0, 2, 1) @ A
+    Atb = (A.transpose(0, 2, 1) @ b[..., None])[..., 0]
+    ridge = 1e-6 * np.trace(AtA, axis1=1, axis2=2)[:, None, None] * np.eye(AtA.shape[-1])
+    portions = np.clip(np.linalg.solve(AtA + ridge, Atb[..., None])[..., 0], MIN_PORTION, MAX_PORTION)
+
+    # Step size from the largest eigenvalue keeps the projected iteration stable
+    step = 1.0 / np.maximum(np.linalg.eigvalsh(AtA)[:, -1], 1e-12)
+    for _ in range(iterations):
+        gradient = (AtA @ portions[..., None])[..., 0] - Atb
+        portions = np.clip(portions - step[:, None] * gradient, MIN_PORTION, MAX_PORTION)
+    return portions
+
+def optimize_meal_plan(
+    catalog: FoodCatalog,
+    user_profile: Dict[str, Any],
+    request_data: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Build a multi-day plan in the AIService ``daily_plans`` shape, or None if the catalog is too small.
+
+    Foods are drawn per meal from protein/carb/produce/fat groups of the
+    catalog foods compatible with the profile's allergies and diets, rotated
+    across days with a seed derived from the inputs (same inputs, same plan).
+    Portions for every meal of every day are solved in one batch.
+    """
+    if not len(catalog):
+        return None
+
+    compatible = catalog.compatible_mask(_restrictions(user_profile, catalog))
+    compatible &= catalog.nutrients[:, 0] > 0
+    groups = _food_groups(catalog.nutrients)
+    pools = {group: np.flatnonzero(compatible & (groups == group)) for group in ("protein", "carbs", "fat", "produce")}
+    if any(len(pool) == 0 for pool in pools.values()):
+        return None
+
+    days = int(request_data.get("duration_days") or 7)
+    layout = MEAL_LAYOUTS.get(int(request_data.get("meal_frequency") or 3), MEAL_LAYOUTS[3])
+    targets = daily_targets(user_profile, request_data)
+
+    seed_source = json.dumps({"profile": user_profile, "request": request_data}, sort_keys=True, default=str)
+    rng = np.random.default_rng(int(hashlib.sha256(seed_source.encode()).hexdigest()[:16], 16))
+    orders = {group: rng.permutation(pool) for group, pool in pools.items()}
+    cursors = {group: 0 for group in pools}
+
+    # Pick foods for every meal; meals with fewer groups are padded by repeating their first food
+    width = max(len(meal_groups) for meal_groups in MEAL_GROUPS.values())
+    selections, meal_targets, meal_index = [], [], []
+    for day in range(days):
+        for meal_type, share in layout:
+            picked = []
+            for group in MEAL_GROUPS[meal_type]:
+                order = orders[group]
+                picked.append(int(order[cursors[group] % len(order)]))
+                cursors[group] += 1
+            meal_index.append((day, meal_type, len(picked)))
+            selections.append(picked + [picked[0]] * (width - len(picked)))
+            meal_targets.append(targets * share)
+
+    selections = np.array(selections)
+    per_gram = catalog.nutrients[selections] / 100.0  # (meals, foods, nutrients)
+    active = np.array([[slot < count for slot in range(width)] for _, _, count in meal_index])
+    per_gram = per_gram * active[..., None]
+    # Calories and protein matter most; fibre least
+    weights = 1.0 / np.maximum(targets, 1.0) * np.array([3.0, 2.0, 1.0, 1.0, 0.5])
+    portions = solve_portions(per_gram, np.array(meal_targets), weights)
+    portions = np.round(portions / 5) * 5 * active
+
+    daily_plans = []
+    totals_by_day = np.zeros((days, len(NUTRIENT_KEYS)))
+    for meal, (day, meal_type, count) in enumerate(meal_index):
+        if not daily_plans or daily_plans[-1]["day"] != day + 1:
+            daily_plans.append({"day": day + 1, "meals": []})
+        items = []
+        meal_totals = np.zeros(len(NUTRIENT_KEYS))
+        for slot in range(count):
+            food = int(selections[meal, slot])
+            amounts = per_gram[meal, slot] * portions[meal, slot]
+            meal_totals += amounts
+            items.append({
+                "food_name": catalog.names[food],
+                "quantity": float(portions[meal, slot]),
+                "unit": "g",
+                "calories": round(float(amounts[0])),
+                "macros": {key: round(float(value), 1) for key, value in zip(NUTRIENT_KEYS[1:], amounts[1:])}
+            })
+        totals_by_day[day] += meal_totals
+        daily_plans[-1]["meals"].append({
+            "meal_type": meal_type,
+            "items": items,
+            "total_calories": round(float(meal_totals[0])),
+            "total_macros": {key: round(float(value), 1) for key, value in zip(NUTRIENT_KEYS[1:], meal_totals[1:])},
+            "preparation_time": 10 if meal_type == "snack" else 20,
+            "instructions": "Prepare " + ", ".join(f"{item['quantity']:g}g {item['food_name']}" for item in items)
+        })
+
+    for plan, totals in zip(daily_plans, totals_by_day):
+        plan["daily_totals"] = {key: round(float(value), 1) for key, value in zip(NUTRIENT_KEYS, totals)}
+
+    average = totals_by_day.mean(axis=0)
+    return {
+        "title": f"{days}-Day Balanced Nutrition Plan",
+        "description": f"Portions optimised for about {round(float(targets[0]))} kcal per day from the food database",
+        "daily_plans": daily_plans,
+        "nutritional_summary": {
+            "avg_daily_calories": round(float(average[0])),
+            "avg_daily_macros": {key: round(float(value), 1) for key, value in zip(NUTRIENT_KEYS[1:], average[1:])},
+            "key_nutrients": ["protein", "fiber"],
+            "health_benefits": ["Meets daily calorie and macro targets"]
+        }
+    }
@@ -1,10 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, JSON
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 
-Base = declarative_base()
+from .database import Base
 
 class User(Base):
     __tablename__ = "users"
@@ -107,9 +106,68 @@ class ProgressLog(Base):
     additional_data = Column(JSON)  # any extra structured data
     notes = Column(Text)
     logged_at = Column(DateTime(timezone=True), server_default=func.now())
+    client_ref = Column(String)  # client-generated id used to dedupe synced/bulk uploads
 
     user = relationship("User", back_populates="progress_logs")
 
+    __table_args__ = (
+        # Per-metric history (dashboard latest weight, milestones, metric filters)
+        Index("ix_progress_logs_user_metric_logged_at", user_id, metric_name, logged_at.desc()),
+        # Per-type history (workout/meal listings and counts)
+        Index("ix_progress_logs_user_type_logged_at", user_id, log_type, logged_at.desc()),
+        # Full timeline for a user, newest first
+        Index("ix_progress_logs_user_logged_at", user_id, logged_at.desc(), id.desc()),
+        # Workouts are counted on every dashboard load, so keep a small dedicated index
+        Index(
+            "ix_progress_logs_workouts_user_logged_at", user_id, logged_at.desc(),
+            postgresql_where=(log_type == "workout")
+        ),
+        # Idempotent re-sync: a client id can only be stored once per user
+        Index(
+            "uq_progress_logs_user_client_ref", user_id, client_ref,
+            unique=True, postgresql_where=client_ref.isnot(None)
+        ),
+    )
+
+class ProgressDailyRollup(Base):
+    __tablename__ = "progress_daily_rollups"
+
+    # One row per user, metric and calendar day, maintained on every progress write
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    metric_name = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0)
+    value_min = Column(Float)
+    value_max = Column(Float)
+    last_value = Column(Float)
+    last_logged_at = Column(DateTime(timezone=True))
+
+class PlanGenerationJob(Base):
+    __tablename__ = "plan_generation_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex, handed to the client for polling
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    plan_type = Column(String, nullable=False)  # nutrition, fitness
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, failed
+    profile_data = Column(JSON)  # profile snapshot taken when the job was requested
+    request_data = Column(JSON)
+    use_cache = Column(Boolean, default=True)
+    plan_id = Column(Integer)  # nutrition_plans.id or fitness_plans.id once completed
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_plan_generation_jobs_user_type_status", user_id, plan_type, status),
+        # One active job per user and plan type; repeated requests attach to it
+        Index(
+            "uq_plan_generation_jobs_user_type_active", user_id, plan_type,
+            unique=True, postgresql_where=status.in_(["queued", "running"])
+        ),
+    )
+
 class TrainerClient(Base):
     __tablename__ = "trainer_clients"
 
@@ -139,6 +197,14 @@ class EducationalContent(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class ContentTag(Base):
+    __tablename__ = "content_tags"
+
+    # One row per tag, maintained on every content write; taxonomy tags carry their category
+    tag = Column(String, primary_key=True)
+    category = Column(String, index=True)
+    content_count = Column(Integer, nullable=False, default=0, server_default="0")
+
 class FoodDatabase(Base):
     __tablename__ = "food_database"
 
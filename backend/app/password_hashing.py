@@ -0,0 +1,96 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from .auth import pwd_context
+from .config import (
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_TARGET_MS, PASSWORD_HASH_MIN_ROUNDS, PASSWORD_HASH_MAX_ROUNDS, PASSWORD_HASH_ROUNDS
+)
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so hashing never blocks the event loop.
+
+    bcrypt releases the GIL while it works, so threads give real parallelism.
+    Requests beyond ``max_pending`` in-flight operations fail fast with a 503
+    instead of queueing behind a login storm.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int, max_pending: int):
+        self.context = context
+        self.max_pending = max_pending
+        self.rounds: Optional[int] = None
+        # Cost before any tuning (passlib's default); the tuned cost never goes below it
+        self.baseline_rounds = context.handler("bcrypt").default_rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self.rejected = 0
+
+    async def _run(self, fn, *args):
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; also returns a new hash when the stored one uses an outdated cost"""
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def set_rounds(self, rounds: int) -> int:
+        """Hash new passwords with ``rounds`` and rehash weaker stored hashes on login.
+
+        Only lower costs are deprecated: hashes with a higher cost stay valid,
+        so workers that settle on different costs converge on the highest one
+        instead of rehashing each other's hashes back and forth.
+        """
+        rounds = max(rounds, self.baseline_rounds)
+        self.context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+        self.rounds = rounds
+        return rounds
+
+    def calibrate(self, target_ms: float = PASSWORD_HASH_TARGET_MS) -> int:
+        """Pick the highest bcrypt cost whose hash time stays within ``target_ms``.
+
+        Each extra round doubles the work, so one timed hash at the minimum
+        cost is enough to extrapolate. PASSWORD_HASH_ROUNDS, when set, is used
+        instead so every worker shares one cost.
+        """
+        if PASSWORD_HASH_ROUNDS > 0:
+            return self.set_rounds(PASSWORD_HASH_ROUNDS)
+
+        started = time.perf_counter()
+        self.context.handler("bcrypt").using(rounds=PASSWORD_HASH_MIN_ROUNDS).hash("calibration")
+        base_ms = (time.perf_counter() - started) * 1000
+
+        extra = int(math.floor(math.log2(target_ms / base_ms))) if base_ms < target_ms else 0
+        rounds = max(PASSWORD_HASH_MIN_ROUNDS, min(PASSWORD_HASH_MAX_ROUNDS, PASSWORD_HASH_MIN_ROUNDS + extra))
+        return self.set_rounds(rounds)
+
+    def stats(self):
+        return {
+            "rounds": self.rounds,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(pwd_context, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
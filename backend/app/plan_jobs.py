@@ -0,0 +1,313 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .ai_service import ai_service
+from .config import PLAN_JOB_BACKEND, PLAN_JOB_WORKERS, PLAN_JOB_TIMEOUT
+from .database import AsyncSessionLocal
+from .models import PlanGenerationJob, NutritionPlan, FitnessPlan
+from .food_catalog import food_catalog
+from .plan_validation import validate_nutrition_plan
+from .schemas import NutritionPlan as NutritionPlanSchema, FitnessPlan as FitnessPlanSchema
+
+PLAN_MODELS = {"nutrition": NutritionPlan, "fitness": FitnessPlan}
+PLAN_SCHEMAS = {"nutrition": NutritionPlanSchema, "fitness": FitnessPlanSchema}
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+def build_nutrition_plan(user_id: int, ai_plan: Dict[str, Any], request_data: Dict[str, Any]) -> NutritionPlan:
+    # Generated numbers are not trusted: recompute items and totals from the catalog before storing
+    ai_plan, _ = validate_nutrition_plan(food_catalog, ai_plan)
+    return NutritionPlan(
+        user_id=user_id,
+        title=ai_plan.get("title", "Personalized Nutrition Plan"),
+        description=ai_plan.get("description", "AI-generated nutrition plan"),
+        plan_data=ai_plan.get("daily_plans", []),
+        nutritional_summary=ai_plan.get("nutritional_summary", {}),
+        duration_days=request_data.get("duration_days", 7),
+        is_active=True
+    )
+
+def build_fitness_plan(user_id: int, ai_plan: Dict[str, Any], request_data: Dict[str, Any]) -> FitnessPlan:
+    return FitnessPlan(
+        user_id=user_id,
+        title=ai_plan.get("title", "Personalized Fitness Plan"),
+        description=ai_plan.get("description", "AI-generated fitness plan"),
+        plan_data=ai_plan.get("workout_sessions", []),
+        difficulty_level=request_data.get("current_fitness_level"),
+        duration_weeks=4,  # Default to 4 weeks
+        is_active=True
+    )
+
+async def _generate(plan_type: str, profile_data: Dict[str, Any], request_data: Dict[str, Any], use_cache: bool):
+    if plan_type == "nutrition":
+        ai_plan = await ai_service.generate_nutrition_plan(profile_data, request_data, use_cache=use_cache)
+        return ai_plan, build_nutrition_plan
+    ai_plan = await ai_service.generate_fitness_plan(profile_data, request_data, use_cache=use_cache)
+    return ai_plan, build_fitness_plan
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+async def stream_plan_events(
+    user_id: int,
+    plan_type: str,
+    profile_data: Dict[str, Any],
+    request_data: Dict[str, Any],
+    use_cache: bool = True
+) -> AsyncIterator[str]:
+    """Server-sent events for interactive plan generation.
+
+    Emits one "day" (nutrition) or "session" (fitness) event per completed
+    item while the LLM is still writing, then persists the plan and emits it
+    as the final "plan" event. Failures end the stream with an "error" event.
+    """
+    if plan_type == "nutrition":
+        events = ai_service.stream_nutrition_plan(profile_data, request_data, use_cache=use_cache)
+        build_plan = build_nutrition_plan
+    else:
+        events = ai_service.stream_fitness_plan(profile_data, request_data, use_cache=use_cache)
+        build_plan = build_fitness_plan
+
+    try:
+        ai_plan = None
+        async for event, data in events:
+            if event == "plan":
+                ai_plan = data
+            else:
+                yield _sse(event, data)
+
+        # The stream owns its session: the request-scoped one is closed once the response starts
+        async with AsyncSessionLocal() as db:
+            plan = build_plan(user_id, ai_plan, request_data)
+            db.add(plan)
+            await db.commit()
+            await db.refresh(plan)
+            yield _sse("plan", PLAN_SCHEMAS[plan_type].model_validate(plan))
+    except Exception as e:
+        yield _sse("error", {"detail": f"Failed to generate {plan_type} plan: {str(e)}"})
+
+async def create_plan_job(
+    db: AsyncSession,
+    user_id: int,
+    plan_type: str,
+    profile_data: Dict[str, Any],
+    request_data: Dict[str, Any],
+    use_cache: bool = True
+) -> PlanGenerationJob:
+    """Persist a queued job and hand it to the configured worker backend.
+
+    A user has at most one active job per plan type: a repeated request (a
+    double-click, a retry) attaches to the job already queued or running,
+    while a request with different parameters gets a 409 until it finishes.
+    """
+    existing = await _active_plan_job(db, user_id, plan_type)
+    if existing is not None:
+        return _attach(existing, request_data)
+
+    job = PlanGenerationJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        plan_type=plan_type,
+        status="queued",
+        profile_data=profile_data,
+        request_data=request_data,
+        use_cache=use_cache
+    )
+    db.add(job)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Lost the race against a concurrent request; the unique index kept one job
+        await db.rollback()
+        existing = await _active_plan_job(db, user_id, plan_type)
+        if existing is None:
+            raise
+        return _attach(existing, request_data)
+    await db.refresh(job)
+
+    await plan_job_queue.enqueue(job.id)
+    return job
+
+def _canonical_request(request_data: Dict[str, Any]) -> str:
+    return json.dumps(jsonable_encoder(request_data or {}), sort_keys=True)
+
+def _attach(job: PlanGenerationJob, request_data: Dict[str, Any]) -> PlanGenerationJob:
+    """The active job when it was queued for the same request; a 409 otherwise"""
+    if _canonical_request(job.request_data) != _canonical_request(request_data):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A {job.plan_type} plan with different parameters is already being generated (job {job.id}); retry once it finishes"
+        )
+    return job
+
+async def _active_plan_job(db: AsyncSession, user_id: int, plan_type: str) -> Optional[PlanGenerationJob]:
+    result = await db.execute(select(PlanGenerationJob).where(
+        PlanGenerationJob.user_id == user_id,
+        PlanGenerationJob.plan_type == plan_type,
+        PlanGenerationJob.status.in_(ACTIVE_JOB_STATUSES)
+    ))
+    return result.scalars().first()
+
+async def run_plan_job(job_id: str, session_factory: async_sessionmaker = AsyncSessionLocal):
+    """Generate and store the plan for one job.
+
+    No database session is held across the LLM call: the job is claimed and
+    read in one short transaction, and the result is written in another. Any
+    failure after the claim marks the job failed, so it never stays running
+    and blocks the user's next request for that plan type.
+    """
+    async with session_factory() as db:
+        # Atomic claim so a job recovered by several workers only runs once
+        claimed = await db.execute(
+            update(PlanGenerationJob)
+            .where(PlanGenerationJob.id == job_id, PlanGenerationJob.status == "queued")
+            .values(status="running", started_at=datetime.now(timezone.utc))
+        )
+        await db.commit()
+        if claimed.rowcount == 0:
+            return
+        job = await db.get(PlanGenerationJob, job_id)
+        user_id, plan_type = job.user_id, job.plan_type
+        profile_data, request_data, use_cache = job.profile_data, job.request_data, job.use_cache
+
+    try:
+        if plan_type == "nutrition":
+            async with session_factory() as db:
+                # The meal optimizer (engine or fallback) works from the in-memory catalog
+                await food_catalog.ensure_loaded(db)
+
+        ai_plan, build_plan = await asyncio.wait_for(
+            _generate(plan_type, profile_data, request_data, use_cache),
+            timeout=PLAN_JOB_TIMEOUT
+        )
+
+        async with session_factory() as db:
+            plan = build_plan(user_id, ai_plan, request_data)
+            db.add(plan)
+            await db.flush()
+            await db.execute(
+                update(PlanGenerationJob)
+                .where(PlanGenerationJob.id == job_id)
+                .values(status="completed", plan_id=plan.id, finished_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+    except Exception as e:
+        # Leaving the session context rolled back any partial write
+        reason = "Plan generation timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+        async with session_factory() as db:
+            await db.execute(
+                update(PlanGenerationJob)
+                .where(PlanGenerationJob.id == job_id)
+                .values(status="failed", error=f"Failed to generate {plan_type} plan: {reason}", finished_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+
+async def get_plan_job(db: AsyncSession, job_id: str, user_id: int, plan_type: str) -> Optional[Dict[str, Any]]:
+    """Job status for its owner, with the stored plan attached once completed"""
+    result = await db.execute(select(PlanGenerationJob).where(
+        PlanGenerationJob.id == job_id,
+        PlanGenerationJob.user_id == user_id,
+        PlanGenerationJob.plan_type == plan_type
+    ))
+    job = result.scalars().first()
+    if job is None:
+        return None
+
+    plan = None
+    if job.status == "completed" and job.plan_id is not None:
+        plan = await db.get(PLAN_MODELS[plan_type], job.plan_id)
+
+    return {
+        "id": job.id,
+        "plan_type": job.plan_type,
+        "status": job.status,
+        "plan_id": job.plan_id,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "plan": plan
+    }
+
+class PlanJobQueue:
+    """In-process asyncio worker pool for plan generation jobs.
+
+    The job table is the source of truth; the queue only carries ids. With
+    PLAN_JOB_BACKEND=celery, ids are sent to the Celery worker instead.
+    """
+
+    def __init__(self, workers: int, backend: str = "asyncio"):
+        self.workers = workers
+        self.backend = backend
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def enqueue(self, job_id: str):
+        if self.backend == "celery":
+            from .worker import generate_plan_task
+            await asyncio.to_thread(generate_plan_task.delay, job_id)
+            return
+        if self._queue is None:
+            self.start()
+        self._queue.put_nowait(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await run_plan_job(job_id)
+            except Exception:
+                # A broken job must not take the worker down with it
+                pass
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        if self.backend == "celery" or self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def recover(self):
+        """Requeue jobs left behind by a restart: queued ones and runs that outlived the timeout"""
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=PLAN_JOB_TIMEOUT)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(PlanGenerationJob)
+                .where(PlanGenerationJob.status == "running", PlanGenerationJob.started_at < stale_before)
+                .values(status="queued", started_at=None)
+            )
+            await db.commit()
+            result = await db.execute(
+                select(PlanGenerationJob.id)
+                .where(PlanGenerationJob.status == "queued")
+                .order_by(PlanGenerationJob.created_at)
+            )
+            job_ids = result.scalars().all()
+
+        for job_id in job_ids:
+            await self.enqueue(job_id)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0
+        }
+
+plan_job_queue = PlanJobQueue(PLAN_JOB_WORKERS, PLAN_JOB_BACKEND)
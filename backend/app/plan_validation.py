@@ -0,0 +1,117 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .food_catalog import FoodCatalog, NUTRIENT_KEYS
+
+# Units a catalog per-100g value can be scaled to (ml treated as g, as USDA does for most liquids)
+GRAM_UNITS = {"g": 1.0, "gram": 1.0, "grams": 1.0, "kg": 1000.0, "ml": 1.0, "l": 1000.0, "oz": 28.35}
+
+# A reported value is corrected when it is off by more than both tolerances
+RELATIVE_TOLERANCE = 0.10
+ABSOLUTE_TOLERANCE = np.array([10.0, 2.0, 2.0, 2.0, 1.0])  # kcal, g, g, g, g
+
+MAX_REPORTED_ISSUES = 50
+
+def _reported(values: Dict[str, Any], calories: Any) -> List[float]:
+    values = values if isinstance(values, dict) else {}
+    numbers = [calories] + [values.get(key) for key in NUTRIENT_KEYS[1:]]
+    return [float(number) if isinstance(number, (int, float)) else np.nan for number in numbers]
+
+def _round(vector: np.ndarray) -> Dict[str, float]:
+    return dict(zip(NUTRIENT_KEYS[1:], np.round(vector[1:], 1).tolist()))
+
+def _rounded_rows(matrix: np.ndarray) -> List[Tuple[int, Dict[str, float]]]:
+    """(calories, macros) per row, rounded in one vectorized call"""
+    calories = np.round(matrix[:, 0]).astype(np.int64).tolist()
+    macros = np.round(matrix[:, 1:], 1).tolist()
+    return [(kcal, dict(zip(NUTRIENT_KEYS[1:], values))) for kcal, values in zip(calories, macros)]
+
+def validate_nutrition_plan(catalog: FoodCatalog, plan: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Recompute the nutrition numbers of a generated plan from the food catalog.
+
+    Every item is resolved against the catalog in one pass; items with a
+    known food and a weight/volume unit get their calories and macros
+    recomputed from per-100g data, others keep the reported values. Meal,
+    day and summary totals are then rebuilt with vectorized sums, so they are
+    always consistent with the items. Corrects ``plan`` in place and returns
+    it with a report of what was resolved and changed.
+    """
+    rows = []  # (day, meal, item dict) for every item in the plan
+    meals = []  # (day, meal dict)
+    days = [day for day in plan.get("daily_plans") or [] if isinstance(day, dict)]
+    for day_index, day in enumerate(days):
+        for meal in day.get("meals") or []:
+            if not isinstance(meal, dict):
+                continue
+            meals.append((day_index, meal))
+            for item in meal.get("items") or []:
+                if isinstance(item, dict):
+                    rows.append((day_index, len(meals) - 1, item))
+
+    count = len(rows)
+    positions = np.array([catalog.find(str(item.get("food_name", ""))) if item.get("food_name") else None for _, _, item in rows], dtype=object)
+    factors = np.array([GRAM_UNITS.get(str(item.get("unit", "g")).lower().strip(), np.nan) for _, _, item in rows])
+    quantities = np.array([float(item["quantity"]) if isinstance(item.get("quantity"), (int, float)) else np.nan for _, _, item in rows])
+    reported = np.array([_reported(item.get("macros"), item.get("calories")) for _, _, item in rows]).reshape(count, len(NUTRIENT_KEYS))
+
+    resolved = np.array([position is not None for position in positions], dtype=bool) & ~np.isnan(factors) & ~np.isnan(quantities)
+    computed = np.where(np.isnan(reported), 0.0, reported)
+    if resolved.any():
+        indexes = positions[resolved].astype(np.int64)
+        computed[resolved] = catalog.nutrients[indexes] * (quantities[resolved] * factors[resolved] / 100.0)[:, None]
+
+    # Item-level discrepancies between what the model reported and the catalog
+    difference = np.abs(np.nan_to_num(reported, nan=np.inf) - computed)
+    off = resolved[:, None] & (difference > ABSOLUTE_TOLERANCE) & (difference > RELATIVE_TOLERANCE * np.abs(computed))
+
+    issues = []
+    for row, column in zip(*np.nonzero(off)):
+        if len(issues) >= MAX_REPORTED_ISSUES:
+            break
+        day_index, _, item = rows[row]
+        issues.append({
+            "day": days[day_index].get("day", day_index + 1),
+            "food_name": item.get("food_name"),
+            "field": NUTRIENT_KEYS[column],
+            "reported": None if np.isnan(reported[row, column]) else round(float(reported[row, column]), 1),
+            "computed": round(float(computed[row, column]), 1)
+        })
+
+    resolved_rows = np.flatnonzero(resolved)
+    for row, (calories, macros) in zip(resolved_rows.tolist(), _rounded_rows(computed[resolved_rows])):
+        _, _, item = rows[row]
+        item["calories"] = calories
+        item["macros"] = macros
+
+    # Roll items up to meals and days in one scatter-add each
+    meal_ids = np.array([meal for _, meal, _ in rows], dtype=np.int64)
+    meal_totals = np.zeros((len(meals), len(NUTRIENT_KEYS)))
+    np.add.at(meal_totals, meal_ids, computed)
+    day_ids = np.array([day for day, _ in meals], dtype=np.int64)
+    day_totals = np.zeros((len(days), len(NUTRIENT_KEYS)))
+    np.add.at(day_totals, day_ids, meal_totals)
+
+    for (_, meal), (calories, macros) in zip(meals, _rounded_rows(meal_totals)):
+        meal["total_calories"] = calories
+        meal["total_macros"] = macros
+    for day, (calories, macros) in zip(days, _rounded_rows(day_totals)):
+        day["daily_totals"] = {"calories": calories, **macros}
+
+    unresolved = sorted({str(item.get("food_name")) for (_, _, item), ok in zip(rows, resolved) if not ok})
+    report = {
+        "items": count,
+        "resolved": int(resolved.sum()),
+        "unresolved_foods": unresolved[:MAX_REPORTED_ISSUES],
+        "corrected_values": int(off.sum()),
+        "issues": issues
+    }
+
+    summary = plan.get("nutritional_summary") if isinstance(plan.get("nutritional_summary"), dict) else {}
+    if len(days):
+        average = day_totals.mean(axis=0)
+        summary["avg_daily_calories"] = round(float(average[0]))
+        summary["avg_daily_macros"] = _round(average)
+    summary["validation"] = {key: report[key] for key in ("items", "resolved", "corrected_values")}
+    plan["nutritional_summary"] = summary
+    return plan, report
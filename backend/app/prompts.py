@@ -0,0 +1,265 @@
+import json
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence
+
+from langchain.prompts import PromptTemplate
+
+from .config import PROMPT_TOKEN_BUDGET
+
+# Rough size of an English/JSON token for OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _drop_empty(value: Any) -> Any:
+    if isinstance(value, dict):
+        cleaned = {key: _drop_empty(item) for key, item in value.items()}
+        return {key: item for key, item in cleaned.items() if item not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [_drop_empty(item) for item in value if item not in (None, "", [], {})]
+    return value
+
+def compact_json(value: Any) -> str:
+    """JSON without whitespace, nulls or empty values - they cost tokens and tell the model nothing"""
+    return json.dumps(_drop_empty(value), separators=(",", ":"), default=str)
+
+def _compact_template(template: str) -> str:
+    # Indentation inside the prompt (including the JSON examples) is pure token overhead
+    return "\n".join(line.strip() for line in template.strip().splitlines() if line.strip())
+
+@dataclass
+class PromptSpec:
+    """A versioned prompt template, compiled once"""
+    name: str
+    version: int
+    template: str
+    # Inputs (given as lists of lines) that may be trimmed to fit the token budget; the last
+    # listed input is trimmed first, always dropping its final, least important line
+    optional_inputs: Sequence[str] = ()
+    prompt: PromptTemplate = field(init=False)
+
+    def __post_init__(self):
+        self.template = _compact_template(self.template)
+        self.prompt = PromptTemplate.from_template(self.template)
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+class PromptRegistry:
+    """Compiled prompt templates plus per-prompt token accounting"""
+
+    def __init__(self, token_budget: int = PROMPT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self._prompts: Dict[str, PromptSpec] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, version: int, template: str, optional_inputs: Sequence[str] = ()) -> PromptSpec:
+        spec = PromptSpec(name, version, template, optional_inputs)
+        self._prompts[name] = spec
+        return spec
+
+    def get(self, name: str) -> PromptSpec:
+        return self._prompts[name]
+
+    def __iter__(self):
+        return iter(self._prompts.values())
+
+    def render(self, name: str, inputs: Dict[str, Any], token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """Fit ``inputs`` to the token budget and record the prompt size.
+
+        Optional inputs are given as lists of lines and are trimmed from the
+        end, input by input, until the rendered prompt fits. Returns the final
+        input values, ready for the compiled template.
+        """
+        spec = self._prompts[name]
+        budget = token_budget or self.token_budget
+        lines = {key: list(inputs[key]) for key in spec.optional_inputs}
+        values = {**inputs, **{key: "\n".join(value) for key, value in lines.items()}}
+
+        tokens = estimate_tokens(spec.prompt.format(**values))
+        trimmed = False
+        for key in reversed(spec.optional_inputs):
+            while tokens > budget and lines[key]:
+                lines[key].pop()
+                values[key] = "\n".join(lines[key])
+                tokens = estimate_tokens(spec.prompt.format(**values))
+                trimmed = True
+
+        self._record(spec, tokens, trimmed)
+        return values
+
+    def _record(self, spec: PromptSpec, tokens: int, trimmed: bool):
+        with self._lock:
+            stats = self._stats.setdefault(spec.key, {"calls": 0, "prompt_tokens": 0, "max_prompt_tokens": 0, "last_prompt_tokens": 0, "trimmed": 0})
+            stats["calls"] += 1
+            stats["prompt_tokens"] += tokens
+            stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], tokens)
+            stats["last_prompt_tokens"] = tokens
+            stats["trimmed"] += int(trimmed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "token_budget": self.token_budget,
+                "prompts": {
+                    key: {**stats, "avg_prompt_tokens": stats["prompt_tokens"] / stats["calls"]}
+                    for key, stats in self._stats.items()
+                }
+            }
+
+prompt_registry = PromptRegistry()
+
+prompt_registry.register("nutrition_plan", 2, """
+    You are an expert nutritionist creating a personalized meal plan.
+
+    User Profile: {user_profile}
+    Requirements: {requirements}
+    Context: {context}
+
+    Create a detailed {duration_days}-day meal plan that:
+    1. Meets the user's caloric and macro needs
+    2. Respects dietary preferences and allergies
+    3. Incorporates cultural and regional food preferences
+    4. Follows evidence-based nutrition guidelines (USDA, NHS, WHO)
+    5. Provides practical meal preparation instructions
+
+    Return the response as a JSON object with the following structure:
+    {{
+        "title": "Plan title",
+        "description": "Plan description",
+        "daily_plans": [
+            {{
+                "day": 1,
+                "meals": [
+                    {{
+                        "meal_type": "breakfast|lunch|dinner|snack",
+                        "items": [
+                            {{
+                                "food_name": "Food name",
+                                "quantity": 100,
+                                "unit": "g|ml|piece",
+                                "calories": 200,
+                                "macros": {{"protein": 10, "carbs": 30, "fat": 8, "fiber": 5}}
+                            }}
+                        ],
+                        "total_calories": 200,
+                        "total_macros": {{"protein": 10, "carbs": 30, "fat": 8, "fiber": 5}},
+                        "preparation_time": 15,
+                        "instructions": "Cooking instructions"
+                    }}
+                ],
+                "daily_totals": {{"calories": 2000, "protein": 150, "carbs": 200, "fat": 80, "fiber": 25}}
+            }}
+        ],
+        "nutritional_summary": {{
+            "avg_daily_calories": 2000,
+            "avg_daily_macros": {{"protein": 150, "carbs": 200, "fat": 80, "fiber": 25}},
+            "key_nutrients": ["vitamin_c", "iron", "calcium"],
+            "health_benefits": ["Weight management", "Heart health"]
+        }}
+    }}
+""", optional_inputs=["context"])
+
+prompt_registry.register("fitness_plan", 2, """
+    You are an expert fitness trainer creating a personalized workout plan.
+
+    User Profile: {user_profile}
+    Requirements: {requirements}
+    Context: {context}
+
+    Create a detailed workout plan that:
+    1. Matches the user's fitness level and goals
+    2. Accommodates available equipment and time constraints
+    3. Considers any medical conditions or mobility issues
+    4. Follows evidence-based exercise principles (ACSM, WHO guidelines)
+    5. Includes progressive overload and recovery periods
+    6. Adapts to mood, fatigue, and injury status
+
+    Return the response as a JSON object with the following structure:
+    {{
+        "title": "Plan title",
+        "description": "Plan description",
+        "workout_sessions": [
+            {{
+                "day": 1,
+                "session_type": "strength|cardio|flexibility|recovery",
+                "exercises": [
+                    {{
+                        "name": "Exercise name",
+                        "sets": 3,
+                        "reps": 10,
+                        "duration": 30,
+                        "rest_time": 60,
+                        "weight": 10.0,
+                        "notes": "Form cues and tips",
+                        "modifications": ["easier version", "harder version"]
+                    }}
+                ],
+                "estimated_duration": 45,
+                "difficulty_level": "beginner|intermediate|advanced",
+                "warm_up": ["5 min light cardio", "dynamic stretching"],
+                "cool_down": ["static stretching", "breathing exercises"]
+            }}
+        ],
+        "weekly_structure": {{
+            "frequency": 3,
+            "rest_days": [3, 6, 7],
+            "progression_notes": "How to progress each week"
+        }}
+    }}
+""", optional_inputs=["context"])
+
+prompt_registry.register("ingredient_substitutions", 2, """
+    Suggest healthy ingredient substitutions for: {ingredient}
+
+    Dietary restrictions: {restrictions}
+    Cultural preferences: {cultural_preferences}
+
+    Provide 3-5 alternatives that:
+    1. Maintain similar nutritional value
+    2. Respect dietary restrictions
+    3. Align with cultural preferences
+    4. Are readily available
+
+    Return as JSON array:
+    [
+        {{
+            "substitute": "Alternative ingredient",
+            "reason": "Why it's a good substitute",
+            "nutritional_benefit": "Key nutritional advantage",
+            "cultural_note": "Cultural relevance if applicable"
+        }}
+    ]
+""")
+
+prompt_registry.register("educational_content", 2, """
+    Create educational content about: {topic}
+
+    Target audience: {audience}
+    Evidence sources: {sources}
+
+    Create comprehensive yet accessible content that:
+    1. Is scientifically accurate and evidence-based
+    2. Is appropriate for the target audience level
+    3. Includes practical actionable advice
+    4. References credible health organizations
+    5. Is culturally sensitive and inclusive
+
+    Return as JSON:
+    {{
+        "title": "Article title",
+        "summary": "Brief summary (2-3 sentences)",
+        "content": "Full article content with sections",
+        "key_takeaways": ["Point 1", "Point 2", "Point 3"],
+        "evidence_level": "high|medium|low",
+        "sources_cited": ["Source 1", "Source 2"],
+        "tags": ["tag1", "tag2", "tag3"],
+        "related_topics": ["topic1", "topic2"]
+    }}
+""")
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from .routers.progress import latest_metric_logs_query, latest_type_logs_query, type_log_count_query
+
+def progress_queries(user_id: int) -> Dict[str, Any]:
+    """The dashboard and milestones queries exactly as the progress router issues them"""
+    now = datetime.now()
+    return {
+        "dashboard.latest_weight": latest_metric_logs_query(user_id, "weight", 1),
+        "dashboard.monthly_workouts": type_log_count_query(user_id, "workout", now - timedelta(days=30)),
+        "milestones.recent_weights": latest_metric_logs_query(user_id, "weight", 10),
+        "milestones.workout_logs": latest_type_logs_query(user_id, "workout", 20),
+    }
+
+def _plan_scans(node: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Flatten an EXPLAIN (FORMAT JSON) plan into the scans it performs"""
+    scans = []
+    if node.get("Relation Name"):
+        scans.append({
+            "node_type": node["Node Type"],
+            "relation": node["Relation Name"],
+            "index": node.get("Index Name", "")
+        })
+    for child in node.get("Plans", []):
+        scans.extend(_plan_scans(child))
+    return scans
+
+def check_progress_query_plans(db: Session, user_id: int, force_index: bool = False) -> List[Dict[str, Any]]:
+    """EXPLAIN each progress query and report whether progress_logs is read through an index.
+
+    On a near-empty development database the planner legitimately prefers a
+    sequential scan; ``force_index`` disables seq scans for the check so it
+    verifies the indexes are usable regardless of table size.
+    """
+    report = []
+    try:
+        if force_index:
+            db.execute(text("SET LOCAL enable_seqscan = off"))
+
+        for name, query in progress_queries(user_id).items():
+            compiled = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+            plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+            scans = [scan for scan in _plan_scans(plan[0]["Plan"]) if scan["relation"] == "progress_logs"]
+            report.append({
+                "query": name,
+                "scans": scans,
+                "uses_index": bool(scans) and all(scan["node_type"] != "Seq Scan" for scan in scans)
+            })
+    finally:
+        db.rollback()
+
+    return report
@@ -0,0 +1,145 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import Date, case, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import BULK_INSERT_CHUNK_SIZE
+from .models import ProgressLog, ProgressDailyRollup
+
+rollup_table = ProgressDailyRollup.__table__
+
+def build_rollup_rows(logs: Iterable[ProgressLog]) -> List[Dict[str, Any]]:
+    """Collapse progress logs into one rollup delta per (user, metric, day)"""
+    rows: Dict[tuple, Dict[str, Any]] = {}
+
+    for log in logs:
+        if log.metric_value is None:
+            continue
+
+        value = float(log.metric_value)
+        # Logs without a timestamp yet get the server default, so bucket them on "today"
+        day = log.logged_at.date() if log.logged_at else None
+        key = (log.user_id, log.metric_name, day)
+        row = rows.get(key)
+
+        if row is None:
+            rows[key] = {
+                "user_id": log.user_id,
+                "metric_name": log.metric_name,
+                "day": day if day is not None else func.current_date(),
+                "count": 1,
+                "value_sum": value,
+                "value_min": value,
+                "value_max": value,
+                "last_value": value,
+                "last_logged_at": log.logged_at if log.logged_at else func.now()
+            }
+            continue
+
+        row["count"] += 1
+        row["value_sum"] += value
+        row["value_min"] = min(row["value_min"], value)
+        row["value_max"] = max(row["value_max"], value)
+        if log.logged_at is None or (isinstance(row["last_logged_at"], datetime) and log.logged_at >= row["last_logged_at"]):
+            row["last_value"] = value
+            row["last_logged_at"] = log.logged_at if log.logged_at else func.now()
+
+    return list(rows.values())
+
+def upsert_rollups_statement(rows: List[Dict[str, Any]]):
+    """INSERT .. ON CONFLICT statement that merges rollup deltas into existing days"""
+    stmt = insert(ProgressDailyRollup).values(rows)
+    excluded = stmt.excluded
+
+    return stmt.on_conflict_do_update(
+        index_elements=[rollup_table.c.user_id, rollup_table.c.metric_name, rollup_table.c.day],
+        set_={
+            "count": rollup_table.c.count + excluded.count,
+            "value_sum": rollup_table.c.value_sum + excluded.value_sum,
+            "value_min": func.least(rollup_table.c.value_min, excluded.value_min),
+            "value_max": func.greatest(rollup_table.c.value_max, excluded.value_max),
+            "last_value": case(
+                (excluded.last_logged_at >= rollup_table.c.last_logged_at, excluded.last_value),
+                else_=rollup_table.c.last_value
+            ),
+            "last_logged_at": func.greatest(rollup_table.c.last_logged_at, excluded.last_logged_at)
+        }
+    )
+
+async def apply_progress_logs(db: AsyncSession, logs: Iterable[ProgressLog]) -> None:
+    """Fold new progress logs into the daily rollups inside the caller's transaction"""
+    rows = build_rollup_rows(logs)
+    # Chunked like the raw insert: one statement per chunk stays under the driver's bind-parameter limit
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+        await db.execute(upsert_rollups_statement(rows[start:start + BULK_INSERT_CHUNK_SIZE]))
+
+async def fetch_rollup_series(db: AsyncSession, user_id: int, start_date: datetime, date_trunc: str):
+    """Per-metric period averages served from the rollups, ordered by metric then period"""
+    period_bucket = func.date_trunc(date_trunc, ProgressDailyRollup.day)
+    total_count = func.sum(ProgressDailyRollup.count)
+
+    result = await db.execute(select(
+        ProgressDailyRollup.metric_name,
+        period_bucket.label("period"),
+        (func.sum(ProgressDailyRollup.value_sum) / total_count).label("avg_value"),
+        total_count.label("count")
+    ).where(
+        ProgressDailyRollup.user_id == user_id,
+        ProgressDailyRollup.day >= start_date.date()
+    ).group_by(
+        ProgressDailyRollup.metric_name,
+        period_bucket
+    ).order_by(
+        ProgressDailyRollup.metric_name,
+        period_bucket
+    ))
+
+    return result.all()
+
+async def fetch_rollup_average(db: AsyncSession, user_id: int, metric_name: str, start_date: datetime) -> Optional[float]:
+    """Average metric value since ``start_date`` computed from the daily sums"""
+    return await db.scalar(select(
+        func.sum(ProgressDailyRollup.value_sum) / func.nullif(func.sum(ProgressDailyRollup.count), 0)
+    ).where(
+        ProgressDailyRollup.user_id == user_id,
+        ProgressDailyRollup.metric_name == metric_name,
+        ProgressDailyRollup.day >= start_date.date()
+    ))
+
+def backfill_rollups(db: Session, user_id: Optional[int] = None) -> int:
+    """Rebuild the rollups from raw progress logs (optionally for one user)"""
+    day = cast(ProgressLog.logged_at, Date)
+
+    source = select(
+        ProgressLog.user_id,
+        ProgressLog.metric_name,
+        day,
+        func.count(ProgressLog.metric_value),
+        func.sum(ProgressLog.metric_value),
+        func.min(ProgressLog.metric_value),
+        func.max(ProgressLog.metric_value),
+        array_agg(aggregate_order_by(ProgressLog.metric_value, ProgressLog.logged_at.desc()))[1],
+        func.max(ProgressLog.logged_at)
+    ).where(
+        ProgressLog.metric_value.isnot(None)
+    ).group_by(
+        ProgressLog.user_id,
+        ProgressLog.metric_name,
+        day
+    )
+
+    clear = delete(ProgressDailyRollup)
+    if user_id is not None:
+        source = source.where(ProgressLog.user_id == user_id)
+        clear = clear.where(ProgressDailyRollup.user_id == user_id)
+
+    db.execute(clear)
+    result = db.execute(insert(ProgressDailyRollup).from_select(
+        ["user_id", "metric_name", "day", "count", "value_sum", "value_min", "value_max", "last_value", "last_logged_at"],
+        source
+    ))
+    db.commit()
+
+    return result.rowcount
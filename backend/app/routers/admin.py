@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db
+from ..models import User
+from ..schemas import UserAdminUpdate, User as UserSchema
+from ..auth import require_admin_role, invalidate_user_auth, auth_cache_stats
+from ..cache import dashboard_cache
+from ..ai_service import ai_service
+from ..prompts import prompt_registry
+from ..food_search import food_search_index
+from ..search_index import education_search_index
+from ..embeddings import content_vector_index
+from ..view_counter import view_counter
+from ..usda_import import usda_import_job, resolve_import_source
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.put("/users/{user_id}", response_model=UserSchema)
+async def update_user_access(
+    user_id: int,
+    update: UserAdminUpdate,
+    current_user = Depends(require_admin_role),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Change a user's role or active status"""
+    
+    if update.role is not None and update.role not in ["user", "trainer", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid role. Must be 'user', 'trainer' or 'admin'"
+        )
+    
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    for field, value in update.dict(exclude_unset=True).items():
+        setattr(user, field, value)
+    
+    await db.commit()
+    await db.refresh(user)
+    
+    # Cached users and claims-only authorization must not outlive the change
+    await invalidate_user_auth(user.username)
+    
+    return user
+
+@router.get("/cache-stats")
+async def get_cache_stats(current_user = Depends(require_admin_role)):
+    """Hit/miss counters for the application caches"""
+    return {
+        "dashboard": dashboard_cache.stats(),
+        "auth": auth_cache_stats(),
+        "ai": ai_service.cache_stats(),
+        "food_search": food_search_index.stats(),
+        "education_search": education_search_index.stats(),
+        "content_embeddings": content_vector_index.stats(),
+        "view_counts": await view_counter.stats()
+    }
+
+@router.get("/prompt-stats")
+async def get_prompt_stats(current_user = Depends(require_admin_role)):
+    """Estimated prompt token usage per registered prompt version"""
+    return prompt_registry.stats()
+
+@router.post("/usda-import", status_code=status.HTTP_202_ACCEPTED)
+async def start_usda_import(
+    source: str = Query(..., description="CSV download directory or JSON file inside USDA_IMPORT_DIR"),
+    restart: bool = Query(False, description="Ignore the checkpoint of an interrupted import"),
+    current_user = Depends(require_admin_role)
+):
+    """Start importing a USDA FoodData Central download in the background"""
+    
+    try:
+        path = resolve_import_source(source)
+    except FileNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    try:
+        return usda_import_job.start(path, restart=restart)
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+@router.get("/usda-import")
+async def get_usda_import_status(current_user = Depends(require_admin_role)):
+    """Progress and throughput of the running or last USDA import"""
+    return usda_import_job.status
@@ -1,22 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import timedelta
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models import User, UserProfile
 from ..schemas import UserCreate, User as UserSchema, Token, UserProfileCreate, UserProfileUpdate, UserProfile as UserProfileSchema
-from ..auth import get_password_hash, verify_password, create_access_token, get_current_active_user
+from ..auth import create_access_token, get_current_active_user, user_token_claims
+from ..password_hashing import password_hasher
 from ..config import ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=UserSchema)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    db_user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.email == user.email) | (User.username == user.username)
-    ).first()
+    ))
+    db_user = result.scalars().first()
     
     if db_user:
         raise HTTPException(
@@ -25,7 +28,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -36,24 +39,33 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     # Create empty user profile
     user_profile = UserProfile(user_id=db_user.id)
     db.add(user_profile)
-    db.commit()
+    await db.commit()
     
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login_user(username: str, password: str, db: Session = Depends(get_db)):
+async def login_user(username: str, password: str, db: AsyncSession = Depends(get_async_db)):
     # Authenticate user
-    user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.username == username) | (User.email == username)
-    ).first()
+    ))
+    user = result.scalars().first()
     
-    if not user or not verify_password(password, user.hashed_password):
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    verified, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -66,10 +78,15 @@ async def login_user(username: str, password: str, db: Session = Depends(get_db)
             detail="Inactive user"
         )
     
+    # Stored hash uses an outdated bcrypt cost - upgrade it transparently
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=user_token_claims(user), expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
@@ -79,23 +96,25 @@ async def get_current_user_info(current_user: User = Depends(get_current_active_
     return current_user
 
 @router.get("/me/profile", response_model=UserProfileSchema)
-async def get_current_user_profile(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+async def get_current_user_profile(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    profile = result.scalars().first()
     if not profile:
         # Create empty profile if it doesn't exist
         profile = UserProfile(user_id=current_user.id)
         db.add(profile)
-        db.commit()
-        db.refresh(profile)
+        await db.commit()
+        await db.refresh(profile)
     return profile
 
 @router.put("/me/profile", response_model=UserProfileSchema)
 async def update_current_user_profile(
     profile_update: UserProfileUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    profile = result.scalars().first()
     
     if not profile:
         profile = UserProfile(user_id=current_user.id)
@@ -106,6 +125,6 @@ async def update_current_user_profile(
     for field, value in update_data.items():
         setattr(profile, field, value)
     
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
     return profile
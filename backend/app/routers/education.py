@@ -1,54 +1,76 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models import EducationalContent
-from ..schemas import EducationalContentCreate, EducationalContent as EducationalContentSchema
+from ..schemas import EducationalContentCreate, EducationalContent as EducationalContentSchema, EducationSearchRequest
 from ..auth import get_current_active_user, require_admin_role
 from ..ai_service import ai_service
+from ..search_index import education_search_index, highlight
+from ..embeddings import content_vector_index
+from ..cache import education_content_cache
+from ..view_counter import view_counter
+from ..content_tags import apply_tag_changes, fetch_tag_catalog
 
 router = APIRouter(prefix="/education", tags=["education"])
 
+async def _content_payload(db: AsyncSession, content_id: int, content_type: str) -> Optional[dict]:
+    """Serialized content of one type, served from the content cache when possible"""
+    key = f"{content_type}:{content_id}"
+    payload = await education_content_cache.get(key)
+    if payload is not None:
+        return payload
+    
+    result = await db.execute(select(EducationalContent).where(
+        EducationalContent.id == content_id,
+        EducationalContent.content_type == content_type
+    ))
+    content = result.scalars().first()
+    if not content:
+        return None
+    
+    payload = EducationalContentSchema.model_validate(content).model_dump(mode="json")
+    await education_content_cache.set(key, payload)
+    return payload
+
 @router.get("/articles", response_model=List[EducationalContentSchema])
 async def get_articles(
     tag: Optional[str] = Query(None, description="Filter by tag"),
     target_audience: Optional[str] = Query(None, description="Filter by target audience"),
     featured_only: bool = Query(False, description="Show only featured content"),
     limit: int = Query(20, le=100, description="Maximum number of articles to return"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Retrieve a list of AI-curated articles"""
     
-    query = db.query(EducationalContent).filter(
+    query = select(EducationalContent).where(
         EducationalContent.content_type == "article"
     )
     
     if tag:
-        query = query.filter(EducationalContent.tags.contains([tag]))
+        query = query.where(EducationalContent.tags.contains([tag]))
     
     if target_audience:
-        query = query.filter(EducationalContent.target_audience.contains([target_audience]))
+        query = query.where(EducationalContent.target_audience.contains([target_audience]))
     
     if featured_only:
-        query = query.filter(EducationalContent.is_featured == True)
+        query = query.where(EducationalContent.is_featured == True)
     
-    articles = query.order_by(
+    result = await db.execute(query.order_by(
         EducationalContent.is_featured.desc(),
         EducationalContent.view_count.desc(),
         EducationalContent.created_at.desc()
-    ).limit(limit).all()
+    ).limit(limit))
     
-    return articles
+    return result.scalars().all()
 
 @router.get("/articles/{article_id}", response_model=EducationalContentSchema)
-async def get_article(article_id: int, db: Session = Depends(get_db)):
+async def get_article(article_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific article's content"""
     
-    article = db.query(EducationalContent).filter(
-        EducationalContent.id == article_id,
-        EducationalContent.content_type == "article"
-    ).first()
+    article = await _content_payload(db, article_id, "article")
     
     if not article:
         raise HTTPException(
@@ -56,9 +78,8 @@ async def get_article(article_id: int, db: Session = Depends(get_db)):
             detail="Article not found"
         )
     
-    # Increment view count
-    article.view_count += 1
-    db.commit()
+    # Counted write-behind, so serving the article stays read-only
+    await view_counter.record(article_id)
     
     return article
 
@@ -68,39 +89,36 @@ async def get_videos(
     target_audience: Optional[str] = Query(None, description="Filter by target audience"),
     featured_only: bool = Query(False, description="Show only featured content"),
     limit: int = Query(20, le=100, description="Maximum number of videos to return"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Retrieve a list of short visual explainers"""
     
-    query = db.query(EducationalContent).filter(
+    query = select(EducationalContent).where(
         EducationalContent.content_type == "video"
     )
     
     if tag:
-        query = query.filter(EducationalContent.tags.contains([tag]))
+        query = query.where(EducationalContent.tags.contains([tag]))
     
     if target_audience:
-        query = query.filter(EducationalContent.target_audience.contains([target_audience]))
+        query = query.where(EducationalContent.target_audience.contains([target_audience]))
     
     if featured_only:
-        query = query.filter(EducationalContent.is_featured == True)
+        query = query.where(EducationalContent.is_featured == True)
     
-    videos = query.order_by(
+    result = await db.execute(query.order_by(
         EducationalContent.is_featured.desc(),
         EducationalContent.view_count.desc(),
         EducationalContent.created_at.desc()
-    ).limit(limit).all()
+    ).limit(limit))
     
-    return videos
+    return result.scalars().all()
 
 @router.get("/videos/{video_id}", response_model=EducationalContentSchema)
-async def get_video(video_id: int, db: Session = Depends(get_db)):
+async def get_video(video_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific video's details/link"""
     
-    video = db.query(EducationalContent).filter(
-        EducationalContent.id == video_id,
-        EducationalContent.content_type == "video"
-    ).first()
+    video = await _content_payload(db, video_id, "video")
     
     if not video:
         raise HTTPException(
@@ -108,83 +126,99 @@ async def get_video(video_id: int, db: Session = Depends(get_db)):
             detail="Video not found"
         )
     
-    # Increment view count
-    video.view_count += 1
-    db.commit()
+    # Counted write-behind, so serving the video stays read-only
+    await view_counter.record(video_id)
     
     return video
 
+async def _contents_in_order(db: AsyncSession, ranked: List[Tuple[int, float]], score_key: str) -> List[dict]:
+    """Rows for ranked (content id, score) pairs, fetched by primary key and kept in rank order"""
+    if not ranked:
+        return []
+    result = await db.execute(select(EducationalContent).where(
+        EducationalContent.id.in_([content_id for content_id, _ in ranked])
+    ))
+    rows = {content.id: content for content in result.scalars().all()}
+    return [
+        {**EducationalContentSchema.model_validate(rows[content_id]).model_dump(), score_key: score}
+        for content_id, score in ranked if content_id in rows
+    ]
+
 @router.post("/search")
 async def search_educational_content(
-    keywords: List[str],
-    content_type: Optional[str] = None,
-    target_audience: Optional[str] = None,
-    db: Session = Depends(get_db)
+    search: EducationSearchRequest,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Search educational content using keywords"""
+    """Search educational content using keywords, ranked by BM25"""
     
-    query = db.query(EducationalContent)
+    index = await education_search_index.ensure_ready(db)
+    total, page, terms = index.search(
+        " ".join(search.keywords), search.content_type, search.target_audience, search.offset, search.limit
+    )
     
-    if content_type:
-        query = query.filter(EducationalContent.content_type == content_type)
+    results = await _contents_in_order(db, page, "score")
+    for result in results:
+        result["highlights"] = {
+            "title": highlight(result["title"], terms),
+            "summary": highlight(result["summary"], terms)
+        }
     
-    if target_audience:
-        query = query.filter(EducationalContent.target_audience.contains([target_audience]))
+    return {
+        "query": search.keywords,
+        "results": results,
+        "total_found": total,
+        "offset": search.offset,
+        "limit": search.limit
+    }
+
+@router.get("/semantic-search")
+async def semantic_search(
+    q: str = Query(..., min_length=1, description="Free-text question or topic"),
+    content_type: Optional[str] = Query(None, description="Filter by content type"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Find content by meaning using the local embedding index"""
     
-    # Search in title, summary, and tags
-    search_results = []
+    index = await content_vector_index.ensure_ready(db)
+    results = await _contents_in_order(db, index.search(q, limit, content_type), "similarity")
     
-    for keyword in keywords:
-        keyword_lower = keyword.lower()
-        
-        # Search in title
-        title_matches = query.filter(
-            EducationalContent.title.ilike(f"%{keyword}%")
-        ).all()
-        
-        # Search in summary
-        summary_matches = query.filter(
-            EducationalContent.summary.ilike(f"%{keyword}%")
-        ).all()
-        
-        # Search in tags
-        tag_matches = query.filter(
-            EducationalContent.tags.contains([keyword_lower])
-        ).all()
-        
-        # Combine and deduplicate results
-        all_matches = title_matches + summary_matches + tag_matches
-        unique_matches = {content.id: content for content in all_matches}
-        search_results.extend(unique_matches.values())
-    
-    # Remove duplicates and sort by relevance (view count as proxy)
-    unique_results = {content.id: content for content in search_results}
-    sorted_results = sorted(
-        unique_results.values(),
-        key=lambda x: (x.is_featured, x.view_count, x.created_at),
-        reverse=True
-    )
+    return {"query": q, "results": results}
+
+@router.get("/content/{content_id}/related")
+async def get_related_content(
+    content_id: int,
+    content_type: Optional[str] = Query(None, description="Filter by content type"),
+    limit: int = Query(5, ge=1, le=20),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Content most similar to the given article or video"""
     
-    return {
-        "query": keywords,
-        "results": sorted_results[:20],  # Limit to 20 results
-        "total_found": len(sorted_results)
-    }
+    index = await content_vector_index.ensure_ready(db)
+    if content_id not in index.positions:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+    
+    results = await _contents_in_order(db, index.related(content_id, limit, content_type), "similarity")
+    return {"content_id": content_id, "related": results}
 
 @router.post("/curate-topic")
 async def curate_topic(
     topic: str,
     target_audience: List[str] = ["general"],
     sources: List[str] = ["NHS", "WHO", "USDA", "ACSM"],
+    refresh: bool = Query(False, description="Bypass the AI response cache"),
     current_user = Depends(require_admin_role),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Admin endpoint to trigger AI curation of articles/explainers on a specific topic"""
     
     try:
         # Generate AI-curated content
         curated_content = await ai_service.curate_educational_content(
-            topic, target_audience, sources
+            topic, target_audience, sources, use_cache=not refresh
         )
         
         # Save to database
@@ -200,33 +234,41 @@ async def curate_topic(
         )
         
         db.add(content)
-        db.commit()
-        db.refresh(content)
-        
-        return {
-            "message": "Content curated successfully",
-            "content_id": content.id,
-            "title": content.title
-        }
+        await apply_tag_changes(db, [], content.tags)
+        await db.commit()
         
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to curate content: {str(e)}"
         )
+    
+    # The content is saved; indexing is best-effort and catches up on the next load
+    await db.refresh(content)
+    education_search_index.invalidate()
+    await content_vector_index.add_content(db, content)
+    
+    return {
+        "message": "Content curated successfully",
+        "content_id": content.id,
+        "title": content.title
+    }
 
 @router.post("/content", response_model=EducationalContentSchema)
 async def create_educational_content(
     content: EducationalContentCreate,
     current_user = Depends(require_admin_role),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Admin endpoint to manually create educational content"""
     
     db_content = EducationalContent(**content.dict())
     db.add(db_content)
-    db.commit()
-    db.refresh(db_content)
+    await apply_tag_changes(db, [], db_content.tags)
+    await db.commit()
+    await db.refresh(db_content)
+    education_search_index.invalidate()
+    await content_vector_index.add_content(db, db_content)
     
     return db_content
 
@@ -235,13 +277,11 @@ async def toggle_featured_content(
     content_id: int,
     is_featured: bool,
     current_user = Depends(require_admin_role),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Admin endpoint to toggle featured status of content"""
     
-    content = db.query(EducationalContent).filter(
-        EducationalContent.id == content_id
-    ).first()
+    content = await db.get(EducationalContent, content_id)
     
     if not content:
         raise HTTPException(
@@ -250,14 +290,16 @@ async def toggle_featured_content(
         )
     
     content.is_featured = is_featured
-    db.commit()
+    await db.commit()
+    education_search_index.invalidate()
+    await education_content_cache.delete(f"{content.content_type}:{content_id}")
     
     return {"message": f"Content {'featured' if is_featured else 'unfeatured'} successfully"}
 
 @router.get("/recommendations")
 async def get_personalized_recommendations(
     current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get personalized educational content recommendations based on user profile"""
     
@@ -265,42 +307,25 @@ async def get_personalized_recommendations(
     # For now, return general recommendations
     
     recommendations = {
-        "featured_articles": db.query(EducationalContent).filter(
+        "featured_articles": (await db.execute(select(EducationalContent).where(
             EducationalContent.content_type == "article",
             EducationalContent.is_featured == True
-        ).limit(5).all(),
+        ).limit(5))).scalars().all(),
         
-        "popular_videos": db.query(EducationalContent).filter(
+        "popular_videos": (await db.execute(select(EducationalContent).where(
             EducationalContent.content_type == "video"
-        ).order_by(EducationalContent.view_count.desc()).limit(5).all(),
+        ).order_by(EducationalContent.view_count.desc()).limit(5))).scalars().all(),
         
-        "recent_additions": db.query(EducationalContent).order_by(
+        "recent_additions": (await db.execute(select(EducationalContent).order_by(
             EducationalContent.created_at.desc()
-        ).limit(5).all()
+        ).limit(5))).scalars().all()
     }
     
     return recommendations
 
 @router.get("/categories")
-async def get_content_categories(db: Session = Depends(get_db)):
+async def get_content_categories(db: AsyncSession = Depends(get_async_db)):
     """Get all available content categories/tags"""
     
-    # Get all unique tags from content
-    all_content = db.query(EducationalContent.tags).all()
-    
-    all_tags = set()
-    for content in all_content:
-        if content.tags:
-            all_tags.update(content.tags)
-    
-    categories = {
-        "nutrition": ["meal_planning", "macro_tracking", "cultural_nutrition", "special_diets"],
-        "fitness": ["strength_training", "cardio", "flexibility", "adaptive_exercise"],
-        "health": ["weight_management", "chronic_conditions", "mental_health", "sleep"],
-        "lifestyle": ["stress_management", "habit_formation", "motivation", "goal_setting"]
-    }
-    
-    return {
-        "categories": categories,
-        "all_tags": sorted(list(all_tags))
-    }
+    # Served from the content_tags catalog, which content writes keep current
+    return await fetch_tag_catalog(db)
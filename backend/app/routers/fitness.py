@@ -1,25 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from typing import List, Dict, Any, Optional
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models import User, UserProfile, FitnessPlan, ProgressLog
-from ..schemas import FitnessPlanRequest, FitnessPlan as FitnessPlanSchema
+from ..schemas import FitnessPlanRequest, FitnessPlan as FitnessPlanSchema, FitnessPlanJob
 from ..auth import get_current_active_user
-from ..ai_service import ai_service
+from ..rollups import apply_progress_logs
+from ..cache import dashboard_cache
+from ..plan_jobs import create_plan_job, get_plan_job, stream_plan_events
+from ..exercise_library import exercise_library, etag_matches
+from ..fitness_adapter import adapt_fitness_plan, summarize_adaptation
 
 router = APIRouter(prefix="/fitness", tags=["fitness"])
 
-@router.post("/generate-plan", response_model=FitnessPlanSchema)
+@router.post("/generate-plan", response_model=FitnessPlanJob, status_code=status.HTTP_202_ACCEPTED)
 async def generate_fitness_plan(
     request: FitnessPlanRequest,
+    refresh: bool = Query(False, description="Bypass the AI response cache"),
+    stream: bool = Query(False, description="Stream the plan as server-sent events instead of queueing a job"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Generate a personalized fitness plan using AI"""
+    """Queue generation of a personalized fitness plan using AI"""
     
     # Get user profile
-    user_profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    user_profile = result.scalars().first()
     if not user_profile:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -41,44 +51,48 @@ async def generate_fitness_plan(
         "workout_time_preference": user_profile.workout_time_preference
     }
     
-    # Generate AI fitness plan
-    try:
-        ai_plan = await ai_service.generate_fitness_plan(profile_data, request.dict())
-        
-        # Save plan to database
-        db_plan = FitnessPlan(
-            user_id=current_user.id,
-            title=ai_plan.get("title", "Personalized Fitness Plan"),
-            description=ai_plan.get("description", "AI-generated fitness plan"),
-            plan_data=ai_plan.get("workout_sessions", []),
-            difficulty_level=request.current_fitness_level,
-            duration_weeks=4,  # Default to 4 weeks
-            is_active=True
+    if stream:
+        return StreamingResponse(
+            stream_plan_events(current_user.id, "fitness", profile_data, request.dict(), use_cache=not refresh),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
-        
-        db.add(db_plan)
-        db.commit()
-        db.refresh(db_plan)
-        
-        return db_plan
-        
-    except Exception as e:
+    
+    # Queue the AI generation; the client polls the job until the plan is stored
+    job = await create_plan_job(
+        db, current_user.id, "fitness", profile_data, request.dict(), use_cache=not refresh
+    )
+    return await get_plan_job(db, job.id, current_user.id, "fitness")
+
+@router.get("/generate-plan/jobs/{job_id}", response_model=FitnessPlanJob)
+async def get_fitness_plan_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Poll a fitness plan generation job; includes the plan once completed"""
+    
+    job = await get_plan_job(db, job_id, current_user.id, "fitness")
+    if not job:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate fitness plan: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Plan generation job not found"
         )
+    
+    return job
 
 @router.get("/workout-plan/{plan_id}", response_model=FitnessPlanSchema)
 async def get_workout_plan(
     plan_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific fitness plan"""
-    plan = db.query(FitnessPlan).filter(
+    result = await db.execute(select(FitnessPlan).where(
         FitnessPlan.id == plan_id,
         FitnessPlan.user_id == current_user.id
-    ).first()
+    ))
+    plan = result.scalars().first()
     
     if not plan:
         raise HTTPException(
@@ -92,7 +106,7 @@ async def get_workout_plan(
 async def get_user_workout_plans(
     user_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all fitness plans for a user"""
     # Users can only access their own plans unless they're a trainer
@@ -102,17 +116,17 @@ async def get_user_workout_plans(
             detail="Access denied"
         )
     
-    plans = db.query(FitnessPlan).filter(
+    result = await db.execute(select(FitnessPlan).where(
         FitnessPlan.user_id == user_id
-    ).order_by(FitnessPlan.created_at.desc()).all()
+    ).order_by(FitnessPlan.created_at.desc()))
     
-    return plans
+    return result.scalars().all()
 
 @router.post("/log-workout")
 async def log_workout(
     workout_data: Dict[str, Any],
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Log a completed workout for progress tracking"""
     
@@ -129,7 +143,9 @@ async def log_workout(
         )
         
         db.add(progress_log)
-        db.commit()
+        await apply_progress_logs(db, [progress_log])
+        await db.commit()
+        await dashboard_cache.delete(current_user.id)
         
         return {"message": "Workout logged successfully", "log_id": progress_log.id}
         
@@ -144,15 +160,16 @@ async def generate_adaptive_plan(
     plan_id: int,
     adaptations: Dict[str, Any],  # mood, fatigue, injury, etc.
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Generate an adapted workout plan based on current conditions"""
+    """Adapt a stored workout plan to current mood, fatigue and injuries"""
     
     # Get original plan
-    original_plan = db.query(FitnessPlan).filter(
+    result = await db.execute(select(FitnessPlan).where(
         FitnessPlan.id == plan_id,
         FitnessPlan.user_id == current_user.id
-    ).first()
+    ))
+    original_plan = result.scalars().first()
     
     if not original_plan:
         raise HTTPException(
@@ -161,64 +178,51 @@ async def generate_adaptive_plan(
         )
     
     # Get user profile
-    user_profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    user_profile = result.scalars().first()
     
     profile_data = {
-        "age": user_profile.age,
-        "gender": user_profile.gender,
-        "fitness_level": user_profile.fitness_level,
-        "mobility_issues": user_profile.mobility_issues or [],
-        "equipment_access": user_profile.equipment_access or []
-    }
-    
-    # Create request with adaptations
-    adaptive_request = {
-        "fitness_goals": ["maintenance"],  # Conservative goal for adaptation
-        "current_fitness_level": user_profile.fitness_level or "beginner",
-        "available_equipment": user_profile.equipment_access or [],
-        "workout_frequency": 3,
-        "session_duration": 30,  # Shorter duration for adaptation
-        "mobility_considerations": user_profile.mobility_issues or [],
-        "mood_factor": adaptations.get("mood", "neutral"),
-        "fatigue_level": adaptations.get("fatigue_level", 5),
-        "injury_status": adaptations.get("injury_status", [])
+        "mobility_issues": (user_profile.mobility_issues if user_profile else None) or [],
+        "equipment_access": (user_profile.equipment_access if user_profile else None) or []
     }
     
+    # Rule-based adaptation against the exercise library; no plan regeneration
+    library = await exercise_library.ensure_loaded(db)
     try:
-        # Generate adapted plan
-        adapted_plan = await ai_service.generate_fitness_plan(profile_data, adaptive_request)
-        
-        return {
-            "message": "Adaptive plan generated successfully",
-            "adapted_workout": adapted_plan.get("workout_sessions", []),
-            "recommendations": "Plan adapted based on current conditions"
-        }
-        
-    except Exception as e:
+        adapted_sessions, report = adapt_fitness_plan(library, original_plan.plan_data or [], adaptations, profile_data)
+    except ValidationError as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate adaptive plan: {str(e)}"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Stored plan could not be adapted: {str(e)}"
         )
+    
+    return {
+        "message": "Adaptive plan generated successfully",
+        "adapted_workout": adapted_sessions,
+        "adaptations": report,
+        "recommendations": summarize_adaptation(report)
+    }
 
 @router.put("/workout-plan/{plan_id}/activate")
 async def activate_fitness_plan(
     plan_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Activate a fitness plan (deactivate others)"""
     
     # Deactivate all current plans
-    db.query(FitnessPlan).filter(
+    await db.execute(update(FitnessPlan).where(
         FitnessPlan.user_id == current_user.id,
         FitnessPlan.is_active == True
-    ).update({"is_active": False})
+    ).values(is_active=False))
     
     # Activate selected plan
-    plan = db.query(FitnessPlan).filter(
+    result = await db.execute(select(FitnessPlan).where(
         FitnessPlan.id == plan_id,
         FitnessPlan.user_id == current_user.id
-    ).first()
+    ))
+    plan = result.scalars().first()
     
     if not plan:
         raise HTTPException(
@@ -227,52 +231,31 @@ async def activate_fitness_plan(
         )
     
     plan.is_active = True
-    db.commit()
+    await db.commit()
     
     return {"message": "Fitness plan activated successfully"}
 
 @router.get("/exercise-library")
 async def get_exercise_library(
-    category: str = None,
-    equipment: str = None,
-    difficulty: str = None,
-    db: Session = Depends(get_db)
+    request: Request,
+    category: List[str] = Query([]),
+    equipment: List[str] = Query([], description="Exercises using any of these items"),
+    difficulty: List[str] = Query([]),
+    muscle_group: List[str] = Query([]),
+    available_equipment: Optional[List[str]] = Query(None, description="Only exercises needing nothing beyond these items"),
+    exclude_conditions: List[str] = Query([], description="Leave out exercises contraindicated for these conditions"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get exercises from the exercise database with optional filters"""
     
-    # This would typically query the ExerciseDatabase model
-    # For now, return a sample response
-    sample_exercises = [
-        {
-            "id": 1,
-            "name": "Push-ups",
-            "category": "strength",
-            "muscle_groups": ["chest", "triceps", "shoulders"],
-            "equipment_needed": ["none"],
-            "difficulty_level": "beginner",
-            "instructions": "Start in plank position, lower body to ground, push back up",
-            "modifications": ["Knee push-ups", "Incline push-ups"]
-        },
-        {
-            "id": 2,
-            "name": "Squats",
-            "category": "strength",
-            "muscle_groups": ["quadriceps", "glutes", "hamstrings"],
-            "equipment_needed": ["none"],
-            "difficulty_level": "beginner",
-            "instructions": "Stand with feet shoulder-width apart, lower into sitting position",
-            "modifications": ["Chair squats", "Jump squats"]
-        }
-    ]
-    
-    # Apply filters if provided
-    filtered_exercises = sample_exercises
+    library = await exercise_library.ensure_loaded(db)
     
-    if category:
-        filtered_exercises = [ex for ex in filtered_exercises if ex["category"] == category]
-    if equipment:
-        filtered_exercises = [ex for ex in filtered_exercises if equipment in ex["equipment_needed"]]
-    if difficulty:
-        filtered_exercises = [ex for ex in filtered_exercises if ex["difficulty_level"] == difficulty]
+    # The library hash is the validator: unchanged library, unchanged response for this URL
+    headers = {"ETag": library.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), library.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    return {"exercises": filtered_exercises}
+    bits = library.select(category, equipment, difficulty, muscle_group, available_equipment, exclude_conditions)
+    return Response(content=library.render_page(bits, offset, limit), media_type="application/json", headers=headers)
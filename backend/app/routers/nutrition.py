@@ -1,25 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models import User, UserProfile, NutritionPlan, ProgressLog
-from ..schemas import NutritionPlanRequest, NutritionPlan as NutritionPlanSchema, ProgressLogCreate
-from ..auth import get_current_active_user
+from ..schemas import NutritionPlanRequest, NutritionPlan as NutritionPlanSchema, NutritionPlanJob, ProgressLogCreate
+from ..auth import get_current_active_user, get_active_principal, TokenPrincipal
+from ..rollups import apply_progress_logs
+from ..cache import dashboard_cache
 from ..ai_service import ai_service
+from ..plan_jobs import create_plan_job, get_plan_job, stream_plan_events
+from ..food_catalog import food_catalog
+from ..substitutions import suggest_from_catalog
+from ..food_search import food_search_index
 
 router = APIRouter(prefix="/nutrition", tags=["nutrition"])
 
-@router.post("/generate-plan", response_model=NutritionPlanSchema)
+@router.post("/generate-plan", response_model=NutritionPlanJob, status_code=status.HTTP_202_ACCEPTED)
 async def generate_nutrition_plan(
     request: NutritionPlanRequest,
+    refresh: bool = Query(False, description="Bypass the AI response cache"),
+    stream: bool = Query(False, description="Stream the plan as server-sent events instead of queueing a job"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Generate a personalized nutrition plan using AI"""
+    """Queue generation of a personalized nutrition plan using AI"""
     
     # Get user profile
-    user_profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    user_profile = result.scalars().first()
     if not user_profile:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -43,44 +54,49 @@ async def generate_nutrition_plan(
         "cuisine_preferences": user_profile.cuisine_preferences or []
     }
     
-    # Generate AI nutrition plan
-    try:
-        ai_plan = await ai_service.generate_nutrition_plan(profile_data, request.dict())
-        
-        # Save plan to database
-        db_plan = NutritionPlan(
-            user_id=current_user.id,
-            title=ai_plan.get("title", "Personalized Nutrition Plan"),
-            description=ai_plan.get("description", "AI-generated nutrition plan"),
-            plan_data=ai_plan.get("daily_plans", []),
-            nutritional_summary=ai_plan.get("nutritional_summary", {}),
-            duration_days=request.duration_days,
-            is_active=True
+    if stream:
+        await food_catalog.ensure_loaded(db)
+        return StreamingResponse(
+            stream_plan_events(current_user.id, "nutrition", profile_data, request.dict(), use_cache=not refresh),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
-        
-        db.add(db_plan)
-        db.commit()
-        db.refresh(db_plan)
-        
-        return db_plan
-        
-    except Exception as e:
+    
+    # Queue the AI generation; the client polls the job until the plan is stored
+    job = await create_plan_job(
+        db, current_user.id, "nutrition", profile_data, request.dict(), use_cache=not refresh
+    )
+    return await get_plan_job(db, job.id, current_user.id, "nutrition")
+
+@router.get("/generate-plan/jobs/{job_id}", response_model=NutritionPlanJob)
+async def get_nutrition_plan_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Poll a nutrition plan generation job; includes the plan once completed"""
+    
+    job = await get_plan_job(db, job_id, current_user.id, "nutrition")
+    if not job:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate nutrition plan: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Plan generation job not found"
         )
+    
+    return job
 
 @router.get("/meal-plan/{plan_id}", response_model=NutritionPlanSchema)
 async def get_meal_plan(
     plan_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific nutrition plan"""
-    plan = db.query(NutritionPlan).filter(
+    result = await db.execute(select(NutritionPlan).where(
         NutritionPlan.id == plan_id,
         NutritionPlan.user_id == current_user.id
-    ).first()
+    ))
+    plan = result.scalars().first()
     
     if not plan:
         raise HTTPException(
@@ -94,7 +110,7 @@ async def get_meal_plan(
 async def get_user_meal_plans(
     user_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all nutrition plans for a user"""
     # Users can only access their own plans unless they're a trainer
@@ -104,17 +120,17 @@ async def get_user_meal_plans(
             detail="Access denied"
         )
     
-    plans = db.query(NutritionPlan).filter(
+    result = await db.execute(select(NutritionPlan).where(
         NutritionPlan.user_id == user_id
-    ).order_by(NutritionPlan.created_at.desc()).all()
+    ).order_by(NutritionPlan.created_at.desc()))
     
-    return plans
+    return result.scalars().all()
 
 @router.post("/log-meal")
 async def log_meal(
     meal_data: Dict[str, Any],
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Log a consumed meal for progress tracking"""
     
@@ -131,7 +147,9 @@ async def log_meal(
         )
         
         db.add(progress_log)
-        db.commit()
+        await apply_progress_logs(db, [progress_log])
+        await db.commit()
+        await dashboard_cache.delete(current_user.id)
         
         return {"message": "Meal logged successfully", "log_id": progress_log.id}
         
@@ -144,13 +162,15 @@ async def log_meal(
 @router.post("/suggest-substitutions")
 async def suggest_ingredient_substitutions(
     ingredient: str,
+    refresh: bool = Query(False, description="Bypass the AI response cache"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get AI-suggested ingredient substitutions"""
+    """Get ingredient substitutions from the food catalog, falling back to AI suggestions"""
     
     # Get user's dietary preferences
-    user_profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    result = await db.execute(select(UserProfile).where(UserProfile.user_id == current_user.id))
+    user_profile = result.scalars().first()
     
     dietary_restrictions = []
     cultural_preferences = "general"
@@ -161,11 +181,17 @@ async def suggest_ingredient_substitutions(
             dietary_restrictions.extend([f"no_{allergen}" for allergen in user_profile.allergies])
         cultural_preferences = user_profile.cultural_background or "general"
     
+    # Answer from the local catalog when it knows the ingredient and the restrictions
+    catalog = await food_catalog.ensure_loaded(db)
+    suggestions = suggest_from_catalog(catalog, ingredient, dietary_restrictions, cultural_preferences)
+    if suggestions:
+        return {"ingredient": ingredient, "substitutions": suggestions, "source": "catalog"}
+    
     try:
         suggestions = await ai_service.suggest_ingredient_substitutions(
-            ingredient, dietary_restrictions, cultural_preferences
+            ingredient, dietary_restrictions, cultural_preferences, use_cache=not refresh
         )
-        return {"ingredient": ingredient, "substitutions": suggestions}
+        return {"ingredient": ingredient, "substitutions": suggestions, "source": "ai"}
         
     except Exception as e:
         raise HTTPException(
@@ -173,25 +199,58 @@ async def suggest_ingredient_substitutions(
             detail=f"Failed to generate substitutions: {str(e)}"
         )
 
+@router.get("/foods/search")
+async def search_foods(
+    q: str = Query(..., min_length=1, max_length=100, description="Food name or its first letters"),
+    limit: int = Query(10, ge=1, le=50),
+    category: Optional[str] = Query(None, description="Only foods in this category"),
+    exclude_allergens: List[str] = Query([], description="Leave out foods containing these allergens"),
+    current_user: TokenPrincipal = Depends(get_active_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Typeahead food search by name prefix, tolerant of typos"""
+    
+    index = await food_search_index.ensure_ready(db)
+    return {"query": q, "results": index.search(q, limit, category, exclude_allergens)}
+
+@router.get("/foods/code/{food_code}")
+async def get_food_by_code(
+    food_code: str,
+    current_user: TokenPrincipal = Depends(get_active_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Look up a food by its USDA food code"""
+    
+    index = await food_search_index.ensure_ready(db)
+    food = index.lookup(food_code)
+    if not food:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Food not found"
+        )
+    
+    return food
+
 @router.put("/meal-plan/{plan_id}/activate")
 async def activate_nutrition_plan(
     plan_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Activate a nutrition plan (deactivate others)"""
     
     # Deactivate all current plans
-    db.query(NutritionPlan).filter(
+    await db.execute(update(NutritionPlan).where(
         NutritionPlan.user_id == current_user.id,
         NutritionPlan.is_active == True
-    ).update({"is_active": False})
+    ).values(is_active=False))
     
     # Activate selected plan
-    plan = db.query(NutritionPlan).filter(
+    result = await db.execute(select(NutritionPlan).where(
         NutritionPlan.id == plan_id,
         NutritionPlan.user_id == current_user.id
-    ).first()
+    ))
+    plan = result.scalars().first()
     
     if not plan:
         raise HTTPException(
@@ -200,6 +259,6 @@ async def activate_nutrition_plan(
         )
     
     plan.is_active = True
-    db.commit()
+    await db.commit()
     
     return {"message": "Nutrition plan activated successfully"}
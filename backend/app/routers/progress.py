@@ -1,21 +1,149 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from pydantic import ValidationError
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import base64
+import json
+import numpy as np
 
-from ..database import get_db
+from ..config import (
+    METRICS_PAGE_SIZE, METRICS_MAX_PAGE_SIZE, METRICS_STREAM_CHUNK_SIZE,
+    BULK_INGEST_MAX_ROWS, BULK_INSERT_CHUNK_SIZE
+)
+from ..database import get_async_db, AsyncSessionLocal
 from ..models import User, ProgressLog
-from ..schemas import ProgressLogCreate, ProgressLog as ProgressLogSchema, ProgressTrends
+from ..schemas import (
+    ProgressLogCreate, ProgressLog as ProgressLogSchema, ProgressTrends,
+    ProgressLogBulkItem, ProgressLogBulkResult
+)
 from ..auth import get_current_active_user
+from ..cache import dashboard_cache
+from ..rollups import apply_progress_logs, fetch_rollup_series, fetch_rollup_average
 
 router = APIRouter(prefix="/progress", tags=["progress"])
 
+# Query builders shared with the query-plan check (app.query_plans)
+def latest_metric_logs_query(user_id: int, metric_name: str, limit: int):
+    return select(ProgressLog).where(
+        ProgressLog.user_id == user_id,
+        ProgressLog.metric_name == metric_name
+    ).order_by(ProgressLog.logged_at.desc()).limit(limit)
+
+def latest_type_logs_query(user_id: int, log_type: str, limit: int):
+    return select(ProgressLog).where(
+        ProgressLog.user_id == user_id,
+        ProgressLog.log_type == log_type
+    ).order_by(ProgressLog.logged_at.desc()).limit(limit)
+
+def type_log_count_query(user_id: int, log_type: str, since: datetime):
+    return select(func.count(ProgressLog.id)).where(
+        ProgressLog.user_id == user_id,
+        ProgressLog.log_type == log_type,
+        ProgressLog.logged_at >= since
+    )
+
+def _encode_metrics_cursor(logged_at: datetime, log_id: int) -> str:
+    raw = f"{logged_at.isoformat()}|{log_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_metrics_cursor(cursor: str):
+    try:
+        logged_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(logged_at), int(log_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+async def _stream_metrics_ndjson(query):
+    """Yield rows as NDJSON in chunks read through a server-side cursor.
+
+    The stream owns its session: the request-scoped one is closed before the
+    response body is sent.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=METRICS_STREAM_CHUNK_SIZE))
+        async for partition in result.mappings().partitions():
+            yield "".join(json.dumps(dict(row), default=_json_default) + "\n" for row in partition)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _parse_bulk_payload(body: bytes, content_type: str) -> List[Any]:
+    """Decode a bulk upload sent either as a JSON array or as NDJSON"""
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        records = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Malformed payload: {str(e)}"
+        )
+    
+    if not isinstance(records, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON array of progress logs"
+        )
+    return records
+
+def _summarize_trends(rows, period: str) -> List[ProgressTrends]:
+    """Compute trend direction and percentage change for every series in one pass.
+
+    ``rows`` must be ordered by metric name, then period.
+    """
+    if not rows:
+        return []
+    
+    names = np.array([row.metric_name for row in rows], dtype=object)
+    values = np.array([float(row.avg_value) for row in rows])
+    
+    # Series boundaries are where the metric name changes
+    starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    first = values[starts]
+    last = values[ends - 1]
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        changes = np.where(
+            (ends - starts >= 2) & (first != 0),
+            (last - first) / first * 100,
+            0.0
+        )
+    directions = np.select([changes > 5, changes < -5], ["increasing", "decreasing"], "stable")
+    
+    return [
+        ProgressTrends(
+            metric_name=names[start],
+            trend_data=[
+                {
+                    "period": row.period.isoformat(),
+                    "value": float(row.avg_value),
+                    "count": row.count
+                }
+                for row in rows[start:end]
+            ],
+            trend_direction=str(direction),
+            percentage_change=float(change),
+            period=period
+        )
+        for start, end, direction, change in zip(starts, ends, directions, changes)
+    ]
+
 @router.post("/log-metric", response_model=ProgressLogSchema)
 async def log_metric(
     metric: ProgressLogCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Log any user metric (weight, macros, strength, mood, etc.)"""
     
@@ -31,8 +159,10 @@ async def log_metric(
         )
         
         db.add(progress_log)
-        db.commit()
-        db.refresh(progress_log)
+        await apply_progress_logs(db, [progress_log])
+        await db.commit()
+        await db.refresh(progress_log)
+        await dashboard_cache.delete(current_user.id)
         
         return progress_log
         
@@ -42,17 +172,113 @@ async def log_metric(
             detail=f"Failed to log metric: {str(e)}"
         )
 
+@router.post("/log-metrics/bulk", response_model=ProgressLogBulkResult)
+async def log_metrics_bulk(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ingest many progress logs at once (JSON array or NDJSON), deduplicated on client_ref"""
+    
+    records = _parse_bulk_payload(await request.body(), request.headers.get("content-type", ""))
+    
+    if len(records) > BULK_INGEST_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_INGEST_MAX_ROWS} records per request"
+        )
+    
+    # Validate every record up front, collecting per-row errors instead of failing the batch
+    now = datetime.now(timezone.utc)
+    rows = []
+    errors = []
+    duplicates = 0
+    seen_refs = set()
+    
+    for index, record in enumerate(records):
+        try:
+            item = ProgressLogBulkItem.model_validate(record)
+        except ValidationError as e:
+            errors.append({
+                "index": index,
+                "client_ref": record.get("client_ref") if isinstance(record, dict) else None,
+                "error": "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            })
+            continue
+        
+        if item.client_ref is not None:
+            if item.client_ref in seen_refs:
+                duplicates += 1
+                continue
+            seen_refs.add(item.client_ref)
+        
+        logged_at = item.logged_at or now
+        if logged_at.tzinfo is None:
+            logged_at = logged_at.replace(tzinfo=timezone.utc)
+        
+        rows.append({
+            "user_id": current_user.id,
+            "log_type": item.log_type,
+            "metric_name": item.metric_name,
+            "metric_value": item.metric_value,
+            "metric_unit": item.metric_unit,
+            "additional_data": item.additional_data,
+            "notes": item.notes,
+            "logged_at": logged_at,
+            "client_ref": item.client_ref
+        })
+    
+    try:
+        # Multi-row inserts in a single transaction; rows already stored under the same client_ref are skipped
+        inserted = []
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            stmt = insert(ProgressLog).values(rows[start:start + BULK_INSERT_CHUNK_SIZE]).on_conflict_do_nothing(
+                index_elements=[ProgressLog.user_id, ProgressLog.client_ref],
+                index_where=ProgressLog.client_ref.isnot(None)
+            ).returning(
+                ProgressLog.user_id,
+                ProgressLog.metric_name,
+                ProgressLog.metric_value,
+                ProgressLog.logged_at
+            )
+            result = await db.execute(stmt)
+            inserted.extend(result.all())
+        
+        await apply_progress_logs(db, inserted)
+        await db.commit()
+        
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to ingest metrics: {str(e)}"
+        )
+    
+    if inserted:
+        await dashboard_cache.delete(current_user.id)
+    
+    return {
+        "received": len(records),
+        "inserted": len(inserted),
+        "duplicates": duplicates + len(rows) - len(inserted),
+        "errors": errors
+    }
+
 @router.get("/user/{user_id}/metrics", response_model=List[ProgressLogSchema])
 async def get_user_metrics(
     user_id: int,
+    response: Response,
     log_type: Optional[str] = None,
     metric_name: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    limit: int = Query(METRICS_PAGE_SIZE, ge=1, le=METRICS_MAX_PAGE_SIZE, description="Page size"),
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$", description="json pages or a full ndjson stream"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Retrieve all logged metrics for a user with optional filters"""
+    """Retrieve logged metrics for a user, newest first, one keyset page at a time"""
     
     # Users can only access their own metrics unless they're a trainer
     if current_user.id != user_id and current_user.role not in ["trainer", "admin"]:
@@ -62,26 +288,42 @@ async def get_user_metrics(
         )
     
     # Build query
-    query = db.query(ProgressLog).filter(ProgressLog.user_id == user_id)
+    columns = ProgressLog.__table__.columns
+    query = select(*columns).where(ProgressLog.user_id == user_id)
     
     if log_type:
-        query = query.filter(ProgressLog.log_type == log_type)
+        query = query.where(ProgressLog.log_type == log_type)
     if metric_name:
-        query = query.filter(ProgressLog.metric_name == metric_name)
+        query = query.where(ProgressLog.metric_name == metric_name)
     if start_date:
-        query = query.filter(ProgressLog.logged_at >= start_date)
+        query = query.where(ProgressLog.logged_at >= start_date)
     if end_date:
-        query = query.filter(ProgressLog.logged_at <= end_date)
+        query = query.where(ProgressLog.logged_at <= end_date)
+    if cursor:
+        cursor_logged_at, cursor_id = _decode_metrics_cursor(cursor)
+        query = query.where(tuple_(ProgressLog.logged_at, ProgressLog.id) < tuple_(cursor_logged_at, cursor_id))
+    
+    query = query.order_by(ProgressLog.logged_at.desc(), ProgressLog.id.desc())
     
-    metrics = query.order_by(ProgressLog.logged_at.desc()).all()
-    return metrics
+    if response_format == "ndjson":
+        return StreamingResponse(_stream_metrics_ndjson(query), media_type="application/x-ndjson")
+    
+    # Fetch one extra row to learn whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.mappings().all()
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_metrics_cursor(rows[-1]["logged_at"], rows[-1]["id"])
+    
+    return rows
 
 @router.get("/user/{user_id}/trends", response_model=List[ProgressTrends])
 async def get_user_trends(
     user_id: int,
     period: str = "weekly",  # weekly, monthly, quarterly
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Calculate and return aggregated trends for various metrics"""
     
@@ -105,64 +347,10 @@ async def get_user_trends(
         date_trunc = "quarter"
     
     try:
-        # Get distinct metric names
-        metric_names = db.query(ProgressLog.metric_name).filter(
-            ProgressLog.user_id == user_id,
-            ProgressLog.logged_at >= start_date
-        ).distinct().all()
-        
-        trends = []
+        # Every (metric, period) series comes from the daily rollups in one query
+        rows = await fetch_rollup_series(db, user_id, start_date, date_trunc)
         
-        for (metric_name,) in metric_names:
-            # Get trend data for this metric
-            trend_data = db.query(
-                func.date_trunc(date_trunc, ProgressLog.logged_at).label('period'),
-                func.avg(ProgressLog.metric_value).label('avg_value'),
-                func.count(ProgressLog.metric_value).label('count')
-            ).filter(
-                ProgressLog.user_id == user_id,
-                ProgressLog.metric_name == metric_name,
-                ProgressLog.logged_at >= start_date
-            ).group_by(
-                func.date_trunc(date_trunc, ProgressLog.logged_at)
-            ).order_by(
-                func.date_trunc(date_trunc, ProgressLog.logged_at)
-            ).all()
-            
-            if trend_data:
-                # Calculate trend direction and percentage change
-                values = [float(row.avg_value) for row in trend_data]
-                if len(values) >= 2:
-                    percentage_change = ((values[-1] - values[0]) / values[0]) * 100
-                    if percentage_change > 5:
-                        trend_direction = "increasing"
-                    elif percentage_change < -5:
-                        trend_direction = "decreasing"
-                    else:
-                        trend_direction = "stable"
-                else:
-                    percentage_change = 0
-                    trend_direction = "stable"
-                
-                # Format trend data
-                formatted_trend_data = [
-                    {
-                        "period": row.period.isoformat(),
-                        "value": float(row.avg_value),
-                        "count": row.count
-                    }
-                    for row in trend_data
-                ]
-                
-                trends.append(ProgressTrends(
-                    metric_name=metric_name,
-                    trend_data=formatted_trend_data,
-                    trend_direction=trend_direction,
-                    percentage_change=percentage_change,
-                    period=period
-                ))
-        
-        return trends
+        return _summarize_trends(rows, period)
         
     except Exception as e:
         raise HTTPException(
@@ -175,7 +363,7 @@ async def update_user_goals(
     user_id: int,
     goals: Dict[str, Any],
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user's long-term goals"""
     
@@ -199,7 +387,9 @@ async def update_user_goals(
         )
         
         db.add(goal_log)
-        db.commit()
+        await apply_progress_logs(db, [goal_log])
+        await db.commit()
+        await dashboard_cache.delete(user_id)
         
         return {"message": "Goals updated successfully", "goals": goals}
         
@@ -213,7 +403,7 @@ async def update_user_goals(
 async def get_user_milestones(
     user_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Retrieve predefined or AI-generated milestones and user's progress towards them"""
     
@@ -226,16 +416,12 @@ async def get_user_milestones(
     
     try:
         # Get recent weight entries for weight-based milestones
-        recent_weights = db.query(ProgressLog).filter(
-            ProgressLog.user_id == user_id,
-            ProgressLog.metric_name == "weight"
-        ).order_by(ProgressLog.logged_at.desc()).limit(10).all()
+        result = await db.execute(latest_metric_logs_query(user_id, "weight", 10))
+        recent_weights = result.scalars().all()
         
         # Get workout logs for fitness milestones
-        workout_logs = db.query(ProgressLog).filter(
-            ProgressLog.user_id == user_id,
-            ProgressLog.log_type == "workout"
-        ).order_by(ProgressLog.logged_at.desc()).limit(20).all()
+        result = await db.execute(latest_type_logs_query(user_id, "workout", 20))
+        workout_logs = result.scalars().all()
         
         milestones = []
         
@@ -279,7 +465,7 @@ async def get_user_milestones(
 async def get_progress_dashboard(
     user_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get comprehensive progress dashboard data"""
     
@@ -290,15 +476,17 @@ async def get_progress_dashboard(
             detail="Access denied"
         )
     
+    cached = await dashboard_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
     try:
         # Get recent metrics summary
         recent_metrics = {}
         
         # Weight data
-        recent_weight = db.query(ProgressLog).filter(
-            ProgressLog.user_id == user_id,
-            ProgressLog.metric_name == "weight"
-        ).order_by(ProgressLog.logged_at.desc()).first()
+        result = await db.execute(latest_metric_logs_query(user_id, "weight", 1))
+        recent_weight = result.scalars().first()
         
         if recent_weight:
             recent_metrics["current_weight"] = {
@@ -309,30 +497,25 @@ async def get_progress_dashboard(
         
         # Workout summary (last 30 days)
         thirty_days_ago = datetime.now() - timedelta(days=30)
-        workout_count = db.query(ProgressLog).filter(
-            ProgressLog.user_id == user_id,
-            ProgressLog.log_type == "workout",
-            ProgressLog.logged_at >= thirty_days_ago
-        ).count()
+        workout_count = await db.scalar(type_log_count_query(user_id, "workout", thirty_days_ago))
         
         recent_metrics["monthly_workouts"] = workout_count
         
         # Average daily calories (last 7 days)
         seven_days_ago = datetime.now() - timedelta(days=7)
-        avg_calories = db.query(func.avg(ProgressLog.metric_value)).filter(
-            ProgressLog.user_id == user_id,
-            ProgressLog.metric_name == "calories_consumed",
-            ProgressLog.logged_at >= seven_days_ago
-        ).scalar()
+        avg_calories = await fetch_rollup_average(db, user_id, "calories_consumed", seven_days_ago)
         
         if avg_calories:
             recent_metrics["avg_daily_calories"] = float(avg_calories)
         
-        return {
+        dashboard = jsonable_encoder({
             "user_id": user_id,
             "summary": recent_metrics,
             "last_updated": datetime.now()
-        }
+        })
+        await dashboard_cache.set(user_id, dashboard)
+        
+        return dashboard
         
     except Exception as e:
         raise HTTPException(
@@ -1,29 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models import User, TrainerClient, NutritionPlan, FitnessPlan, ProgressLog
 from ..schemas import TrainerClientAssignment, TrainerClient as TrainerClientSchema, User as UserSchema
 from ..auth import get_current_active_user, require_trainer_role
+from ..rollups import apply_progress_logs
 
 router = APIRouter(prefix="/trainers", tags=["trainers"])
 
 @router.get("/my-clients", response_model=List[UserSchema])
 async def get_my_clients(
     current_trainer: User = Depends(require_trainer_role),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a list of clients assigned to the authenticated trainer"""
     
-    client_assignments = db.query(TrainerClient).filter(
+    result = await db.execute(select(TrainerClient).where(
         TrainerClient.trainer_id == current_trainer.id,
         TrainerClient.is_active == True
-    ).all()
+    ))
+    client_assignments = result.scalars().all()
     
     clients = []
     for assignment in client_assignments:
-        client = db.query(User).filter(User.id == assignment.client_id).first()
+        client = await db.get(User, assignment.client_id)
         if client:
             clients.append(client)
     
@@ -33,16 +36,17 @@ async def get_my_clients(
 async def get_client_progress(
     client_id: int,
     current_trainer: User = Depends(require_trainer_role),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get detailed progress data for a specific client"""
     
     # Verify trainer has access to this client
-    assignment = db.query(TrainerClient).filter(
+    result = await db.execute(select(TrainerClient).where(
         TrainerClient.trainer_id == current_trainer.id,
         TrainerClient.client_id == client_id,
         TrainerClient.is_active == True
-    ).first()
+    ))
+    assignment = result.scalars().first()
     
     if not assignment:
         raise HTTPException(
@@ -51,7 +55,7 @@ async def get_client_progress(
         )
     
     # Get client information
-    client = db.query(User).filter(User.id == client_id).first()
+    client = await db.get(User, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -59,20 +63,23 @@ async def get_client_progress(
         )
     
     # Get recent progress logs
-    recent_logs = db.query(ProgressLog).filter(
+    result = await db.execute(select(ProgressLog).where(
         ProgressLog.user_id == client_id
-    ).order_by(ProgressLog.logged_at.desc()).limit(50).all()
+    ).order_by(ProgressLog.logged_at.desc()).limit(50))
+    recent_logs = result.scalars().all()
     
     # Get active plans
-    active_nutrition_plan = db.query(NutritionPlan).filter(
+    result = await db.execute(select(NutritionPlan).where(
         NutritionPlan.user_id == client_id,
         NutritionPlan.is_active == True
-    ).first()
+    ))
+    active_nutrition_plan = result.scalars().first()
     
-    active_fitness_plan = db.query(FitnessPlan).filter(
+    result = await db.execute(select(FitnessPlan).where(
         FitnessPlan.user_id == client_id,
         FitnessPlan.is_active == True
-    ).first()
+    ))
+    active_fitness_plan = result.scalars().first()
     
     return {
         "client": {
@@ -92,16 +99,17 @@ async def assign_plan_to_client(
     client_id: int,
     plan_data: Dict[str, Any],
     current_trainer: User = Depends(require_trainer_role),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Assign a custom (or AI-generated) plan to a client"""
     
     # Verify trainer has access to this client
-    assignment = db.query(TrainerClient).filter(
+    result = await db.execute(select(TrainerClient).where(
         TrainerClient.trainer_id == current_trainer.id,
         TrainerClient.client_id == client_id,
         TrainerClient.is_active == True
-    ).first()
+    ))
+    assignment = result.scalars().first()
     
     if not assignment:
         raise HTTPException(
@@ -125,14 +133,14 @@ async def assign_plan_to_client(
             )
             
             # Deactivate other nutrition plans
-            db.query(NutritionPlan).filter(
+            await db.execute(update(NutritionPlan).where(
                 NutritionPlan.user_id == client_id,
                 NutritionPlan.is_active == True
-            ).update({"is_active": False})
+            ).values(is_active=False))
             
             db.add(nutrition_plan)
-            db.commit()
-            db.refresh(nutrition_plan)
+            await db.commit()
+            await db.refresh(nutrition_plan)
             
             return {"message": "Nutrition plan assigned successfully", "plan_id": nutrition_plan.id}
             
@@ -149,14 +157,14 @@ async def assign_plan_to_client(
             )
             
             # Deactivate other fitness plans
-            db.query(FitnessPlan).filter(
+            await db.execute(update(FitnessPlan).where(
                 FitnessPlan.user_id == client_id,
                 FitnessPlan.is_active == True
-            ).update({"is_active": False})
+            ).values(is_active=False))
             
             db.add(fitness_plan)
-            db.commit()
-            db.refresh(fitness_plan)
+            await db.commit()
+            await db.refresh(fitness_plan)
             
             return {"message": "Fitness plan assigned successfully", "plan_id": fitness_plan.id}
             
@@ -178,16 +186,17 @@ async def update_client_plan(
     plan_id: int,
     plan_updates: Dict[str, Any],
     current_trainer: User = Depends(require_trainer_role),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Modify an existing client plan"""
     
     # Verify trainer has access to this client
-    assignment = db.query(TrainerClient).filter(
+    result = await db.execute(select(TrainerClient).where(
         TrainerClient.trainer_id == current_trainer.id,
         TrainerClient.client_id == client_id,
         TrainerClient.is_active == True
-    ).first()
+    ))
+    assignment = result.scalars().first()
     
     if not assignment:
         raise HTTPException(
@@ -199,10 +208,11 @@ async def update_client_plan(
     
     try:
         if plan_type == "nutrition":
-            plan = db.query(NutritionPlan).filter(
+            result = await db.execute(select(NutritionPlan).where(
                 NutritionPlan.id == plan_id,
                 NutritionPlan.user_id == client_id
-            ).first()
+            ))
+            plan = result.scalars().first()
             
             if not plan:
                 raise HTTPException(
@@ -216,10 +226,11 @@ async def update_client_plan(
                     setattr(plan, field, value)
             
         elif plan_type == "fitness":
-            plan = db.query(FitnessPlan).filter(
+            result = await db.execute(select(FitnessPlan).where(
                 FitnessPlan.id == plan_id,
                 FitnessPlan.user_id == client_id
-            ).first()
+            ))
+            plan = result.scalars().first()
             
             if not plan:
                 raise HTTPException(
@@ -238,7 +249,7 @@ async def update_client_plan(
                 detail="Invalid plan type. Must be 'nutrition' or 'fitness'"
             )
         
-        db.commit()
+        await db.commit()
         return {"message": "Plan updated successfully"}
         
     except Exception as e:
@@ -251,7 +262,7 @@ async def update_client_plan(
 async def assign_client_to_trainer(
     assignment: TrainerClientAssignment,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Assign a client to a trainer (admin function or self-assignment)"""
     
@@ -263,10 +274,11 @@ async def assign_client_to_trainer(
         )
     
     # Verify trainer exists and has trainer role
-    trainer = db.query(User).filter(
+    result = await db.execute(select(User).where(
         User.id == assignment.trainer_id,
         User.role.in_(["trainer", "admin"])
-    ).first()
+    ))
+    trainer = result.scalars().first()
     
     if not trainer:
         raise HTTPException(
@@ -275,7 +287,7 @@ async def assign_client_to_trainer(
         )
     
     # Verify client exists
-    client = db.query(User).filter(User.id == assignment.client_id).first()
+    client = await db.get(User, assignment.client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -283,11 +295,12 @@ async def assign_client_to_trainer(
         )
     
     # Check if assignment already exists
-    existing_assignment = db.query(TrainerClient).filter(
+    result = await db.execute(select(TrainerClient).where(
         TrainerClient.trainer_id == assignment.trainer_id,
         TrainerClient.client_id == assignment.client_id,
         TrainerClient.is_active == True
-    ).first()
+    ))
+    existing_assignment = result.scalars().first()
     
     if existing_assignment:
         raise HTTPException(
@@ -304,8 +317,8 @@ async def assign_client_to_trainer(
     )
     
     db.add(new_assignment)
-    db.commit()
-    db.refresh(new_assignment)
+    await db.commit()
+    await db.refresh(new_assignment)
     
     return {"message": "Client assigned successfully", "assignment_id": new_assignment.id}
 
@@ -314,16 +327,17 @@ async def send_message_to_client(
     client_id: int,
     message: str,
     current_trainer: User = Depends(require_trainer_role),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Send messages to clients (basic implementation)"""
     
     # Verify trainer has access to this client
-    assignment = db.query(TrainerClient).filter(
+    result = await db.execute(select(TrainerClient).where(
         TrainerClient.trainer_id == current_trainer.id,
         TrainerClient.client_id == client_id,
         TrainerClient.is_active == True
-    ).first()
+    ))
+    assignment = result.scalars().first()
     
     if not assignment:
         raise HTTPException(
@@ -348,26 +362,28 @@ async def send_message_to_client(
     )
     
     db.add(message_log)
-    db.commit()
+    await apply_progress_logs(db, [message_log])
+    await db.commit()
     
     return {"message": "Message sent successfully"}
 
 @router.get("/available")
-async def get_available_trainers(db: Session = Depends(get_db)):
+async def get_available_trainers(db: AsyncSession = Depends(get_async_db)):
     """Get a list of available trainers for client assignment"""
     
-    trainers = db.query(User).filter(
+    result = await db.execute(select(User).where(
         User.role.in_(["trainer", "admin"]),
         User.is_active == True
-    ).all()
+    ))
+    trainers = result.scalars().all()
     
     trainer_info = []
     for trainer in trainers:
         # Count current clients
-        client_count = db.query(TrainerClient).filter(
+        client_count = await db.scalar(select(func.count(TrainerClient.id)).where(
             TrainerClient.trainer_id == trainer.id,
             TrainerClient.is_active == True
-        ).count()
+        ))
         
         trainer_info.append({
             "id": trainer.id,
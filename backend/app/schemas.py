@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -17,6 +17,10 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     phone: Optional[str] = None
 
+class UserAdminUpdate(BaseModel):
+    role: Optional[str] = None  # user, trainer, admin
+    is_active: Optional[bool] = None
+
 class User(UserBase):
     id: int
     is_active: bool
@@ -155,6 +159,26 @@ class FitnessPlan(BaseModel):
     class Config:
         from_attributes = True
 
+# Plan Generation Job Schemas
+class PlanJob(BaseModel):
+    id: str
+    plan_type: str
+    status: str  # queued, running, completed, failed
+    plan_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class NutritionPlanJob(PlanJob):
+    plan: Optional[NutritionPlan] = None
+
+class FitnessPlanJob(PlanJob):
+    plan: Optional[FitnessPlan] = None
+
 # Progress Schemas
 class ProgressLogCreate(BaseModel):
     log_type: str
@@ -178,6 +202,21 @@ class ProgressLog(BaseModel):
     class Config:
         from_attributes = True
 
+class ProgressLogBulkItem(ProgressLogCreate):
+    client_ref: Optional[str] = None  # client-generated id, duplicates are skipped
+    logged_at: Optional[datetime] = None  # when the sample was taken on the device
+
+class ProgressLogBulkError(BaseModel):
+    index: int
+    client_ref: Optional[str] = None
+    error: str
+
+class ProgressLogBulkResult(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+    errors: List[ProgressLogBulkError]
+
 class ProgressTrends(BaseModel):
     metric_name: str
     trend_data: List[Dict[str, Any]]
@@ -208,6 +247,13 @@ class EducationalContent(EducationalContentBase):
     class Config:
         from_attributes = True
 
+class EducationSearchRequest(BaseModel):
+    keywords: List[str]
+    content_type: Optional[str] = None
+    target_audience: Optional[str] = None
+    offset: int = Field(0, ge=0)
+    limit: int = Field(20, ge=1, le=100)
+
 # Trainer Schemas
 class TrainerClientAssignment(BaseModel):
     trainer_id: int
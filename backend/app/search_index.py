@@ -0,0 +1,216 @@
+import asyncio
+import html
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import EDUCATION_SEARCH_TTL
+from .database import AsyncSessionLocal
+from .models import EducationalContent
+
+WORD = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it", "of",
+    "on", "or", "that", "the", "this", "to", "was", "what", "when", "which", "with", "your", "you"
+}
+
+# Term frequency multipliers per field (a title hit is worth three body hits)
+FIELD_WEIGHTS = (("title", 3), ("tags", 2), ("summary", 2), ("content", 1))
+
+# Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SNIPPET_CHARS = 200
+
+def normalize_token(word: str) -> str:
+    """Lower-cased word with a light plural stem ("calories" -> "calory", "proteins" -> "protein")"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def tokenize(text: Any) -> List[str]:
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        text = " ".join(str(value) for value in text)
+    return [normalize_token(word) for word in WORD.findall(str(text).lower()) if word not in STOPWORDS]
+
+def highlight(text: Optional[str], terms: Iterable[str], width: int = SNIPPET_CHARS) -> Optional[str]:
+    """HTML-escaped snippet of ``text`` around the first match, with matches wrapped in <mark>"""
+    if not text:
+        return None
+    terms = set(terms)
+    matches = [match for match in WORD.finditer(text.lower()) if normalize_token(match.group()) in terms]
+    start = 0
+    if matches and len(text) > width:
+        start = max(0, min(matches[0].start() - width // 4, len(text) - width))
+    end = min(len(text), start + width)
+
+    parts = ["…" if start else ""]
+    cursor = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(html.escape(text[cursor:match.start()]))
+        parts.append(f"<mark>{html.escape(text[match.start():match.end()])}</mark>")
+        cursor = match.end()
+    parts.append(html.escape(text[cursor:end]))
+    parts.append("…" if end < len(text) else "")
+    return "".join(parts)
+
+class EducationSearchIndex:
+    """BM25 search over educational content from an in-process inverted index.
+
+    Title, tags, summary and body are tokenized once per build into CSR
+    postings (term -> content positions) that already hold each posting's
+    BM25 weight, so a query only gathers the postings of its distinct terms
+    and sums them with one bincount: cost follows the matching postings,
+    not the number of keywords or the size of the library. Content type
+    and audience filters are boolean masks over positions. The first search
+    builds the index; afterwards stale indexes (TTL or ``invalidate`` after
+    content changes) are rebuilt in the background while the old one serves.
+    """
+
+    def __init__(self, ttl: float = EDUCATION_SEARCH_TTL):
+        self.ttl = ttl
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.__dict__.update(self._build([]))
+
+    @staticmethod
+    def _build(rows: Iterable[Any]) -> Dict[str, Any]:
+        rows = list(rows)
+        count = len(rows)
+        vocabulary: Dict[str, int] = {}
+        term_ids: Dict[str, int] = {}  # raw word -> term id, -1 for stopwords
+        chunks, owners, field_weights = [], [], []
+        for position, row in enumerate(rows):
+            for field, weight in FIELD_WEIGHTS:
+                text = getattr(row, field)
+                if isinstance(text, (list, tuple)):
+                    text = " ".join(str(value) for value in text)
+                words = WORD.findall(str(text or "").lower())
+                if not words:
+                    continue
+                for word in set(words).difference(term_ids):
+                    term_ids[word] = -1 if word in STOPWORDS else vocabulary.setdefault(normalize_token(word), len(vocabulary))
+                chunks.append(np.fromiter(map(term_ids.__getitem__, words), dtype=np.int64, count=len(words)))
+                owners.append(position)
+                field_weights.append(weight)
+
+        # One sort of (term, position) keys turns the token stream into term-major postings
+        sizes = np.array([len(chunk) for chunk in chunks], dtype=np.int64)
+        tokens = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+        token_weights = np.repeat(np.array(field_weights, dtype=np.float32), sizes)
+        keys = tokens * max(count, 1) + np.repeat(np.array(owners, dtype=np.int64), sizes)
+        valid = tokens >= 0
+        keys, token_weights = keys[valid], token_weights[valid]
+        order = np.argsort(keys)
+        keys, token_weights = keys[order], token_weights[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.zeros(0, dtype=np.int64)
+        pair_keys = keys[starts]
+        pair_terms = (pair_keys // max(count, 1)).astype(np.int32)
+        pair_docs = (pair_keys % max(count, 1)).astype(np.int32)
+        pair_counts = np.add.reduceat(token_weights, starts) if len(starts) else token_weights
+        lengths = np.bincount(pair_docs, weights=pair_counts, minlength=count)
+
+        # Precomputed per-posting BM25 contribution
+        frequencies = np.bincount(pair_terms, minlength=len(vocabulary))
+        idf = np.log(1 + (count - frequencies + 0.5) / (frequencies + 0.5))
+        average = lengths.mean() if count else 1.0
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(average, 1e-9))
+        weights = idf[pair_terms] * pair_counts * (BM25_K1 + 1) / (pair_counts + norms[pair_docs]) if len(pair_terms) else pair_counts
+
+        audiences: Dict[str, np.ndarray] = {}
+        for position, row in enumerate(rows):
+            for audience in row.target_audience or []:
+                audiences.setdefault(str(audience).lower(), np.zeros(count, dtype=bool))[position] = True
+        return {
+            "ids": np.array([row.id for row in rows], dtype=np.int64),
+            "content_types": np.array([(row.content_type or "").lower() for row in rows], dtype=str),
+            "audiences": audiences,
+            "featured": np.array([bool(row.is_featured) for row in rows], dtype=bool),
+            "views": np.array([row.view_count or 0 for row in rows], dtype=np.int64),
+            "vocabulary": vocabulary,
+            "offsets": np.searchsorted(pair_terms, np.arange(len(vocabulary) + 1)),
+            "postings": pair_docs,
+            "weights": weights.astype(np.float32),
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load_rows(self, rows: Iterable[Any]):
+        self.__dict__.update(self._build(rows))
+        self.loaded_at = time.monotonic()
+
+    async def _reload(self, db: AsyncSession):
+        async with self._lock:
+            result = await db.execute(select(EducationalContent))
+            state = await asyncio.to_thread(self._build, result.scalars().all())
+            self.__dict__.update(state)
+            self.loaded_at = time.monotonic()
+
+    async def _refresh(self):
+        async with AsyncSessionLocal() as db:
+            await self._reload(db)
+
+    async def ensure_ready(self, db: AsyncSession) -> "EducationSearchIndex":
+        """Build on first use; afterwards stale indexes are rebuilt in the background"""
+        if self.loaded_at is None and self._refresh_task is None:
+            await self._reload(db)
+        elif self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh())
+        return self
+
+    def invalidate(self):
+        """Mark the index stale after content is created or edited"""
+        if self.loaded_at is not None:
+            self.loaded_at = -float("inf")
+
+    def search(
+        self,
+        query: Any,
+        content_type: Optional[str] = None,
+        target_audience: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20
+    ) -> Tuple[int, List[Tuple[int, float]], List[str]]:
+        """(total matches, [(content id, score)] for the page, query terms)"""
+        terms = list(dict.fromkeys(term for term in tokenize(query) if term in self.vocabulary))
+        if not terms:
+            return 0, [], list(dict.fromkeys(tokenize(query)))
+
+        slices = [slice(self.offsets[term], self.offsets[term + 1]) for term in map(self.vocabulary.get, terms)]
+        docs = np.concatenate([self.postings[part] for part in slices])
+        weights = np.concatenate([self.weights[part] for part in slices])
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+
+        keep = np.ones(len(candidates), dtype=bool)
+        if content_type:
+            keep &= self.content_types[candidates] == content_type.lower()
+        if target_audience:
+            mask = self.audiences.get(target_audience.lower())
+            keep &= mask[candidates] if mask is not None else False
+        candidates, scores = candidates[keep], scores[keep]
+
+        # Best score first; featured, then popular content breaks ties
+        order = np.lexsort((-self.views[candidates], ~self.featured[candidates], -np.round(scores, 6)))
+        page = order[offset:offset + limit]
+        return len(candidates), list(zip(self.ids[candidates[page]].tolist(), np.round(scores[page], 4).tolist())), terms
+
+    def stats(self) -> Dict[str, Any]:
+        return {"documents": len(self.ids), "terms": len(self.vocabulary), "postings": len(self.postings)}
+
+education_search_index = EducationSearchIndex()
@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .food_catalog import FoodCatalog, NUTRIENT_KEYS
+
+NUTRIENT_LABELS = {"protein": "protein", "carbs": "carbohydrate", "fat": "fat", "fiber": "fibre"}
+
+def _similarity(catalog: FoodCatalog, position: int) -> np.ndarray:
+    """Cosine similarity of every food's scaled nutrient profile to the food at ``position``"""
+    scaled = catalog.scaled_nutrients
+    target = scaled[position]
+    norms = np.linalg.norm(scaled, axis=1) * np.linalg.norm(target)
+    norms[norms == 0] = 1.0
+    return scaled @ target / norms
+
+def _nutritional_benefit(catalog: FoodCatalog, original: int, substitute: int) -> str:
+    """Describe the substitute's most notable per-100g improvement"""
+    # Fewer calories and less fat count as improvements; more protein, carbs and fibre do too
+    direction = np.array([-1.0 if key in ("calories", "fat") else 1.0 for key in NUTRIENT_KEYS])
+    change = (catalog.scaled_nutrients[substitute] - catalog.scaled_nutrients[original]) * direction
+    best = int(np.argmax(change))
+    if change[best] < 0.25:
+        return "Similar nutritional profile per 100g"
+    key = NUTRIENT_KEYS[best]
+    amount = abs(catalog.nutrients[substitute][best] - catalog.nutrients[original][best])
+    if key == "calories":
+        return f"{round(amount)} fewer calories per 100g"
+    return f"{amount:.1f}g {'less' if key == 'fat' else 'more'} {NUTRIENT_LABELS[key]} per 100g"
+
+def suggest_from_catalog(
+    catalog: FoodCatalog,
+    ingredient: str,
+    dietary_restrictions: List[str],
+    cultural_preferences: Optional[str] = None,
+    limit: int = 5
+) -> Optional[List[Dict[str, str]]]:
+    """Substitutions answered from the food catalog, or None when it cannot answer.
+
+    Curated ``substitutes`` of the ingredient come first, then the most
+    nutritionally similar compatible foods (same category and matching
+    cultural tags break near-ties). Returns suggestions in the same shape as
+    AIService.suggest_ingredient_substitutions.
+    """
+    position = catalog.find(ingredient)
+    # Restrictions the catalog has no data for (e.g. halal) are left to the LLM
+    if position is None or not all(catalog.understands(restriction) for restriction in dietary_restrictions):
+        return None
+
+    compatible = catalog.compatible_mask(dietary_restrictions)
+    compatible[position] = False
+    if not compatible.any():
+        return None
+
+    similarity = _similarity(catalog, position)
+    culture = cultural_preferences if cultural_preferences and cultural_preferences != "general" else None
+    category = catalog.categories[position]
+    in_culture = catalog.cultural_mask(culture) if culture else np.zeros(len(catalog), dtype=bool)
+
+    score = similarity.copy()
+    if category:
+        score += 0.1 * (catalog.category_codes == catalog.category_codes[position])
+    score += 0.05 * in_culture
+    score[~compatible] = -np.inf
+
+    curated = []
+    for name in catalog.substitutes[position]:
+        substitute = catalog.find(name)
+        if substitute is not None and compatible[substitute] and substitute not in curated:
+            curated.append(substitute)
+
+    # Only the best few candidates need sorting
+    wanted = min(limit + len(curated), int(compatible.sum()))
+    top = np.argpartition(-score, wanted - 1)[:wanted]
+    top = top[np.argsort(-score[top])]
+    ranked = (curated + [int(candidate) for candidate in top if candidate not in curated])[:limit]
+
+    suggestions = []
+    for substitute in ranked:
+        reason = (
+            f"Listed as a substitute for {catalog.names[position]}" if substitute in curated
+            else f"{round(float(similarity[substitute]) * 100)}% nutritional match"
+            + (f" in the same {category.replace('_', ' ')} category" if catalog.categories[substitute] == category and category else "")
+        )
+        suggestions.append({
+            "substitute": catalog.names[substitute],
+            "reason": reason,
+            "nutritional_benefit": _nutritional_benefit(catalog, position, substitute),
+            "cultural_note": (
+                f"Common in {culture} cuisine" if in_culture[substitute]
+                else "N/A"
+            )
+        })
+    return suggestions
@@ -0,0 +1,22 @@
+import re
+from typing import Any, List
+
+def normalize_tag(value: Any) -> str:
+    """Lower-case snake_case tag ("Lower Back" -> "lower_back")"""
+    return "_".join(re.sub(r"[^a-z0-9 ]+", " ", str(value).lower()).split())
+
+def normalize_tags(values: Any) -> List[str]:
+    """Tags from a JSON list, a comma separated string or a {tag: present} dict"""
+    if not values:
+        return []
+    if isinstance(values, dict):
+        values = [key for key, present in values.items() if present]
+    elif isinstance(values, str):
+        values = values.split(",")
+    return [normalize_tag(value) for value in values if str(value).strip()]
+
+def flatten_tags(data: Any) -> List[str]:
+    """Tags as ``normalize_tags``, also from a {"primary": [...], "secondary": [...]} dict"""
+    if isinstance(data, dict) and any(isinstance(value, (list, str)) for value in data.values()):
+        return [tag for value in data.values() for tag in flatten_tags(value)]
+    return normalize_tags(data)
@@ -0,0 +1,324 @@
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from .config import USDA_IMPORT_BATCH_SIZE, USDA_IMPORT_DIR
+from .database import SessionLocal
+from .food_catalog import food_catalog
+from .json_stream import iter_json_array
+from .models import FoodDatabase
+
+# FoodData Central nutrient ids -> nutritional_data keys (per 100g; macros in g, minerals/vitamins in mg)
+NUTRIENT_FIELDS = {
+    1008: "calories",  # Energy (kcal)
+    2047: "calories",  # Energy (Atwater general factors), when 1008 is missing
+    2048: "calories",  # Energy (Atwater specific factors)
+    1003: "protein",
+    1005: "carbs",
+    1004: "fat",
+    1079: "fiber",
+    2000: "sugar",
+    1258: "saturated_fat",
+    1253: "cholesterol_mg",
+    1093: "sodium_mg",
+    1092: "potassium_mg",
+    1087: "calcium_mg",
+    1089: "iron_mg",
+    1162: "vitamin_c_mg",
+}
+NUTRIENT_IDS = list(NUTRIENT_FIELDS)
+
+# CSV data types worth serving (sample, acquisition and experimental records are not foods)
+DEFAULT_DATA_TYPES = ("foundation_food", "sr_legacy_food", "survey_fndds_food", "branded_food")
+
+# Words in a food's name or ingredient list -> allergen/diet tags the food catalog filters on
+DIETARY_KEYWORDS = {
+    "milk": ["milk"], "buttermilk": ["milk"], "whey": ["milk"], "casein": ["milk"], "caseinate": ["milk"],
+    "cheese": ["milk"], "cream": ["milk"], "yogurt": ["milk"], "ghee": ["milk"], "lactose": ["milk", "lactose"],
+    "egg": ["eggs"], "albumen": ["eggs"],
+    "peanut": ["peanuts"],
+    "almond": ["tree_nuts"], "cashew": ["tree_nuts"], "walnut": ["tree_nuts"], "pecan": ["tree_nuts"],
+    "hazelnut": ["tree_nuts"], "pistachio": ["tree_nuts"], "macadamia": ["tree_nuts"],
+    "soy": ["soy"], "soybean": ["soy"], "tofu": ["soy"],
+    "wheat": ["wheat", "gluten"], "spelt": ["wheat", "gluten"], "barley": ["gluten"], "rye": ["gluten"],
+    "fish": ["fish"], "salmon": ["fish"], "tuna": ["fish"], "cod": ["fish"], "anchovy": ["fish"],
+    "shrimp": ["shellfish"], "crab": ["shellfish"], "lobster": ["shellfish"], "clam": ["shellfish"],
+    "oyster": ["shellfish"], "mussel": ["shellfish"], "scallop": ["shellfish"],
+    "sesame": ["sesame"],
+    "beef": ["meat"], "pork": ["meat"], "bacon": ["meat"], "ham": ["meat"], "lamb": ["meat"],
+    "veal": ["meat"], "venison": ["meat"], "sausage": ["meat"],
+    "chicken": ["poultry"], "turkey": ["poultry"], "duck": ["poultry"],
+    "gelatin": ["gelatin"], "honey": ["honey"],
+}
+# Plant milks are not dairy
+_DIETARY_PATTERN = re.compile(
+    r"(?<!coconut )(?<!almond )(?<!soy )(?<!oat )(?<!rice )\b("
+    + "|".join(sorted(DIETARY_KEYWORDS, key=len, reverse=True))
+    + r")(?:s|es)?\b"
+)
+
+UPSERT_COLUMNS = ("food_name", "category", "nutritional_data", "allergen_info", "source")
+
+JSON_CHUNK_SIZE = 1 << 20
+
+def dietary_tags(*texts: Optional[str]) -> List[str]:
+    """Allergen/diet tags for the words in ``texts`` (name, ingredient list)"""
+    tags = set()
+    for text in texts:
+        if text:
+            for word in _DIETARY_PATTERN.findall(text.lower()):
+                tags.update(DIETARY_KEYWORDS[word])
+    return sorted(tags)
+
+def nutritional_data(amounts: Dict[int, float]) -> Dict[str, float]:
+    """Map {nutrient id: amount} to nutritional_data, preferring measured energy over Atwater estimates"""
+    data: Dict[str, float] = {}
+    for nutrient_id in NUTRIENT_IDS:
+        amount = amounts.get(nutrient_id)
+        if amount is not None and not np.isnan(amount):
+            data.setdefault(NUTRIENT_FIELDS[nutrient_id], round(float(amount), 3))
+    return data
+
+def food_record(fdc_id: Any, name: str, category: Optional[str], amounts: Dict[int, float], ingredients: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "food_code": str(fdc_id),
+        "food_name": name.strip(),
+        "category": category or None,
+        "nutritional_data": nutritional_data(amounts),
+        "allergen_info": dietary_tags(name, ingredients),
+        "source": "USDA",
+    }
+
+@contextmanager
+def _open_csv(path: str) -> Iterator[Tuple[Iterator[List[str]], Dict[str, int]]]:
+    """A CSV reader that yields one row at a time, with the column positions of its header"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        reader = csv.reader(handle)
+        yield reader, {name: position for position, name in enumerate(next(reader, []))}
+
+def _csv_records(directory: str, data_types: Sequence[str]) -> Iterator[Dict[str, Any]]:
+    """Foods from an extracted FoodData Central CSV download.
+
+    food_nutrient.csv (tens of millions of rows) is streamed once into a
+    compact float32 matrix holding only the mapped nutrients of the wanted
+    foods; food.csv is then streamed again to emit records in file order.
+    """
+    wanted = set(data_types)
+    with _open_csv(os.path.join(directory, "food.csv")) as (reader, header):
+        positions = {
+            row[header["fdc_id"]]: position
+            for position, row in enumerate(row for row in reader if row[header["data_type"]] in wanted)
+        }
+
+    categories: Dict[str, str] = {}
+    path = os.path.join(directory, "food_category.csv")
+    if os.path.exists(path):
+        with _open_csv(path) as (reader, header):
+            categories = {row[header["id"]]: row[header["description"]] for row in reader}
+
+    # Branded foods carry their own category and the ingredient list
+    branded_categories: List[Optional[str]] = [None] * len(positions)
+    ingredients: List[Optional[str]] = [None] * len(positions)
+    path = os.path.join(directory, "branded_food.csv")
+    if "branded_food" in wanted and os.path.exists(path):
+        with _open_csv(path) as (reader, header):
+            for row in reader:
+                position = positions.get(row[header["fdc_id"]])
+                if position is not None:
+                    branded_categories[position] = row[header["branded_food_category"]] or None
+                    ingredients[position] = row[header["ingredients"]] or None
+
+    columns = {str(nutrient_id): column for column, nutrient_id in enumerate(NUTRIENT_IDS)}
+    amounts = np.full((len(positions), len(NUTRIENT_IDS)), np.nan, dtype=np.float32)
+    with _open_csv(os.path.join(directory, "food_nutrient.csv")) as (reader, header):
+        fdc_column, nutrient_column, amount_column = header["fdc_id"], header["nutrient_id"], header["amount"]
+        for row in reader:
+            column = columns.get(row[nutrient_column])
+            if column is not None and row[amount_column]:
+                position = positions.get(row[fdc_column])
+                if position is not None:
+                    amounts[position, column] = float(row[amount_column])
+
+    with _open_csv(os.path.join(directory, "food.csv")) as (reader, header):
+        for row in reader:
+            position = positions.get(row[header["fdc_id"]])
+            if position is None:
+                continue
+            yield food_record(
+                row[header["fdc_id"]],
+                row[header["description"]],
+                branded_categories[position] or categories.get(row[header["food_category_id"]]),
+                dict(zip(NUTRIENT_IDS, amounts[position].tolist())),
+                ingredients[position]
+            )
+
+def _json_array_key(path: str) -> str:
+    """The top-level array of a FoodData Central JSON download (FoundationFoods, BrandedFoods, ...)"""
+    with open(path, encoding="utf-8") as handle:
+        match = re.search(r'"(\w+Foods)"\s*:\s*\[', handle.read(65536))
+    if not match:
+        raise ValueError(f"{path} is not a FoodData Central JSON download")
+    return match.group(1)
+
+def _json_category(item: Dict[str, Any]) -> Optional[str]:
+    category = item.get("foodCategory") or item.get("wweiaFoodCategory") or item.get("brandedFoodCategory")
+    if isinstance(category, dict):
+        return category.get("description") or category.get("wweiaFoodCategoryDescription")
+    return category
+
+def _json_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Foods from a FoodData Central JSON download, decoded one food at a time"""
+    key = _json_array_key(path)
+    with open(path, encoding="utf-8") as handle:
+        for item in iter_json_array(handle, key, JSON_CHUNK_SIZE):
+            if not isinstance(item, dict) or "fdcId" not in item or not item.get("description"):
+                continue
+            amounts = {}
+            for entry in item.get("foodNutrients") or []:
+                nutrient_id = (entry.get("nutrient") or {}).get("id")
+                if nutrient_id in NUTRIENT_FIELDS and isinstance(entry.get("amount"), (int, float)):
+                    amounts[nutrient_id] = entry["amount"]
+            yield food_record(item["fdcId"], item["description"], _json_category(item), amounts, item.get("ingredients"))
+
+def _source_identity(source: str) -> Dict[str, Any]:
+    path = os.path.join(source, "food.csv") if os.path.isdir(source) else source
+    stat = os.stat(path)
+    return {"source": os.path.abspath(source), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+def checkpoint_path(source: str) -> str:
+    return source.rstrip("/\\") + ".checkpoint.json"
+
+def _read_checkpoint(source: str, identity: Dict[str, Any]) -> int:
+    """Rows already imported from this exact file by an interrupted run"""
+    try:
+        with open(checkpoint_path(source), encoding="utf-8") as handle:
+            checkpoint = json.load(handle)
+    except (OSError, ValueError):
+        return 0
+    if checkpoint.get("completed") or any(checkpoint.get(key) != value for key, value in identity.items()):
+        return 0
+    return int(checkpoint.get("rows", 0))
+
+def _write_checkpoint(source: str, checkpoint: Dict[str, Any]):
+    path = checkpoint_path(source)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as handle:
+        json.dump(checkpoint, handle)
+    os.replace(f"{path}.tmp", path)
+
+def upsert_foods(db: Session, records: List[Dict[str, Any]]):
+    """Insert foods, updating USDA-owned columns of existing rows with the same food_code"""
+    statement = insert(FoodDatabase)
+    statement = statement.on_conflict_do_update(
+        index_elements=[FoodDatabase.food_code],
+        set_={column: statement.excluded[column] for column in UPSERT_COLUMNS}
+    )
+    db.execute(statement, records)
+    db.commit()
+
+def _batches(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+def import_usda(
+    source: str,
+    session_factory: sessionmaker = SessionLocal,
+    batch_size: int = USDA_IMPORT_BATCH_SIZE,
+    data_types: Sequence[str] = DEFAULT_DATA_TYPES,
+    restart: bool = False,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """Stream a FoodData Central download into food_database.
+
+    ``source`` is an extracted CSV download directory or a JSON download
+    file. Foods are upserted on food_code (the FDC id) in batches of
+    ``batch_size``, each committed before the checkpoint next to the source
+    records it, so an interrupted import resumes after the last committed
+    batch. A completed or changed file is imported from the start, which is
+    how the monthly release is re-run.
+    """
+    identity = {**_source_identity(source), "data_types": list(data_types)}
+    resumed_from = 0 if restart else _read_checkpoint(source, identity)
+    records = _csv_records(source, data_types) if os.path.isdir(source) else _json_records(source)
+
+    rows = resumed_from
+    started = time.monotonic()
+
+    def status() -> Dict[str, Any]:
+        elapsed = time.monotonic() - started
+        return {
+            "source": source,
+            "rows": rows,
+            "resumed_from": resumed_from,
+            "seconds": round(elapsed, 1),
+            "rows_per_second": round((rows - resumed_from) / max(elapsed, 1e-9), 1)
+        }
+
+    db = session_factory()
+    try:
+        for batch in _batches(islice(records, resumed_from, None), batch_size):
+            upsert_foods(db, batch)
+            rows += len(batch)
+            _write_checkpoint(source, {**identity, "rows": rows, "completed": False})
+            if progress:
+                progress(status())
+    finally:
+        db.close()
+
+    _write_checkpoint(source, {**identity, "rows": rows, "completed": True})
+    return status()
+
+def resolve_import_source(name: str) -> str:
+    """Path of a download inside USDA_IMPORT_DIR; admin requests cannot reach other files"""
+    root = os.path.realpath(USDA_IMPORT_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or not os.path.exists(path):
+        raise FileNotFoundError(f"{name} not found in the USDA import directory")
+    return path
+
+class USDAImportJob:
+    """At most one admin-triggered import per process, run in a worker thread"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.status: Dict[str, Any] = {"state": "idle"}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, source: str, restart: bool = False) -> Dict[str, Any]:
+        if self.running:
+            raise RuntimeError("A USDA import is already running")
+        self.status = {"state": "running", "source": source, "rows": 0}
+        self._task = asyncio.create_task(self._run(source, restart))
+        return self.status
+
+    def _progress(self, status: Dict[str, Any]):
+        # Called from the import thread; replacing the dict is atomic
+        self.status = {"state": "running", **status}
+
+    async def _run(self, source: str, restart: bool):
+        try:
+            result = await asyncio.to_thread(import_usda, source, restart=restart, progress=self._progress)
+            self.status = {"state": "completed", **result}
+        except Exception as e:
+            self.status = {**self.status, "state": "failed", "error": str(e)}
+        finally:
+            # Updated rows only show up in the catalog after a full reload
+            food_catalog.invalidate()
+
+usda_import_job = USDAImportJob()
@@ -0,0 +1,168 @@
+import asyncio
+import uuid
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, func, update
+
+from .config import CACHE_BACKEND, REDIS_URL, VIEW_COUNT_FLUSH_INTERVAL
+from .database import AsyncSessionLocal
+from .models import EducationalContent
+
+class MemoryViewBuffer:
+    """Pending view increments held in this process"""
+
+    def __init__(self):
+        self._pending: Dict[int, int] = {}
+
+    async def increment(self, content_id: int):
+        self._pending[content_id] = self._pending.get(content_id, 0) + 1
+
+    async def take(self) -> Dict[int, int]:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    async def restore(self, increments: Dict[int, int]):
+        for content_id, count in increments.items():
+            self._pending[content_id] = self._pending.get(content_id, 0) + count
+
+    async def size(self) -> int:
+        return len(self._pending)
+
+class RedisViewBuffer:
+    """Pending view increments in a Redis hash shared by every API process.
+
+    A flush renames the hash to a private key before reading it, so each
+    increment is written back by exactly one process.
+    """
+
+    def __init__(self, key: str = "education:views", url: str = REDIS_URL, client=None):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+        self.key = key
+        self._client = client
+
+    async def increment(self, content_id: int):
+        await self._client.hincrby(self.key, content_id, 1)
+
+    async def take(self) -> Dict[int, int]:
+        claimed = f"{self.key}:flush:{uuid.uuid4().hex}"
+        try:
+            await self._client.rename(self.key, claimed)
+        except Exception:
+            # Nothing buffered (the hash does not exist)
+            return {}
+        pending = await self._client.hgetall(claimed)
+        await self._client.delete(claimed)
+        return {int(content_id): int(count) for content_id, count in pending.items()}
+
+    async def restore(self, increments: Dict[int, int]):
+        async with self._client.pipeline(transaction=False) as pipe:
+            for content_id, count in increments.items():
+                pipe.hincrby(self.key, content_id, count)
+            await pipe.execute()
+
+    async def size(self) -> int:
+        return await self._client.hlen(self.key)
+
+class ViewCounter:
+    """Write-behind view counts for educational content.
+
+    Views are buffered (in memory or Redis) instead of being written on each
+    request, and every ``interval`` seconds, and on shutdown, all buffered
+    counts go to the database in one UPDATE ... CASE statement. A failed
+    flush puts its increments back into the buffer for the next attempt.
+    """
+
+    def __init__(self, interval: float = VIEW_COUNT_FLUSH_INTERVAL, backend: str = CACHE_BACKEND):
+        self.interval = interval
+        self.backend = backend
+        self._buffer: Optional[Any] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.errors = 0
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            self._buffer = RedisViewBuffer() if self.backend == "redis" else MemoryViewBuffer()
+        return self._buffer
+
+    async def record(self, content_id: int):
+        try:
+            await self.buffer.increment(content_id)
+            self.recorded += 1
+        except Exception:
+            # A lost view count must never fail the page
+            self.errors += 1
+
+    async def flush(self) -> int:
+        """Write buffered increments to the database; returns the number of views written"""
+        async with self._flush_lock:
+            increments = await self.buffer.take()
+            if not increments:
+                return 0
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(EducationalContent)
+                        .where(EducationalContent.id.in_(list(increments)))
+                        .values(
+                            view_count=func.coalesce(EducationalContent.view_count, 0) + case(
+                                increments, value=EducationalContent.id, else_=0
+                            ),
+                            # A view is not an edit
+                            updated_at=EducationalContent.updated_at
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception:
+                self.errors += 1
+                await self.buffer.restore(increments)
+                raise
+            self.flushes += 1
+            self.flushed += sum(increments.values())
+            return sum(increments.values())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                # Increments were restored; try again next interval
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            pass
+
+    async def stats(self) -> Dict[str, Any]:
+        try:
+            pending = await self.buffer.size()
+        except Exception:
+            pending = None
+        return {
+            "backend": self.backend,
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "pending_items": pending
+        }
+
+view_counter = ViewCounter()
@@ -0,0 +1,29 @@
+import asyncio
+
+from celery import Celery
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from .config import REDIS_URL, ASYNC_DATABASE_URL, PLAN_JOB_TIMEOUT
+from .plan_jobs import run_plan_job
+
+# Run with: celery -A app.worker worker (and PLAN_JOB_BACKEND=celery on the API)
+celery_app = Celery("ai_health", broker=REDIS_URL)
+celery_app.conf.update(
+    task_acks_late=True,
+    task_time_limit=PLAN_JOB_TIMEOUT + 60,
+    worker_prefetch_multiplier=1
+)
+
+@celery_app.task(name="plan_jobs.generate_plan")
+def generate_plan_task(job_id: str):
+    asyncio.run(_run(job_id))
+
+async def _run(job_id: str):
+    # Every task gets a fresh event loop, so pooled asyncpg connections can't be reused across tasks
+    engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+    try:
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        await run_plan_job(job_id, session_factory=session_factory)
+    finally:
+        await engine.dispose()
@@ -108,6 +108,10 @@ class ApiClient {
     return this.request('POST', '/nutrition/generate-plan', planRequest);
   }
 
+  async getNutritionPlanJob(jobId: string) {
+    return this.request('GET', `/nutrition/generate-plan/jobs/${jobId}`);
+  }
+
   async getNutritionPlan(planId: number) {
     return this.request('GET', `/nutrition/meal-plan/${planId}`);
   }
@@ -128,6 +132,22 @@ class ApiClient {
     return this.request('PUT', `/nutrition/meal-plan/${planId}/activate`);
   }
 
+  async searchFoods(query: string, options: {
+    limit?: number;
+    category?: string;
+    excludeAllergens?: string[];
+  } = {}) {
+    // URLSearchParams repeats exclude_allergens the way the API expects
+    const params = new URLSearchParams({ q: query, limit: String(options.limit ?? 10) });
+    if (options.category) params.append('category', options.category);
+    (options.excludeAllergens || []).forEach((allergen) => params.append('exclude_allergens', allergen));
+    return this.request('GET', '/nutrition/foods/search', undefined, params);
+  }
+
+  async getFoodByCode(foodCode: string) {
+    return this.request('GET', `/nutrition/foods/code/${encodeURIComponent(foodCode)}`);
+  }
+
   // Fitness methods
   async generateFitnessPlan(planRequest: {
     fitness_goals: string[];
@@ -143,6 +163,10 @@ class ApiClient {
     return this.request('POST', '/fitness/generate-plan', planRequest);
   }
 
+  async getFitnessPlanJob(jobId: string) {
+    return this.request('GET', `/fitness/generate-plan/jobs/${jobId}`);
+  }
+
   async getFitnessPlan(planId: number) {
     return this.request('GET', `/fitness/workout-plan/${planId}`);
   }
@@ -167,6 +191,9 @@ class ApiClient {
     category?: string;
     equipment?: string;
     difficulty?: string;
+    muscle_group?: string;
+    offset?: number;
+    limit?: number;
   }) {
     return this.request('GET', '/fitness/exercise-library', null, filters);
   }
@@ -239,10 +266,26 @@ class ApiClient {
     keywords: string[];
     content_type?: string;
     target_audience?: string;
+    offset?: number;
+    limit?: number;
   }) {
     return this.request('POST', '/education/search', searchData);
   }
 
+  async semanticSearchEducationalContent(query: string, options: {
+    content_type?: string;
+    limit?: number;
+  } = {}) {
+    return this.request('GET', '/education/semantic-search', undefined, { q: query, ...options });
+  }
+
+  async getRelatedContent(contentId: number, options: {
+    content_type?: string;
+    limit?: number;
+  } = {}) {
+    return this.request('GET', `/education/content/${contentId}/related`, undefined, options);
+  }
+
   async getEducationRecommendations() {
     return this.request('GET', '/education/recommendations');
   }